@@ -0,0 +1,244 @@
+"""
+自适应超时模块
+按端点记录最近请求的响应延迟（收到响应头的耗时），由滚动百分位数推算连接超时和读取超时，并限制在上下限之内；
+样本保存到磁盘，下一次运行的第一批请求就能使用已调好的超时，而不是固定的 10/15/20/30 秒
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+
+# 是否启用自适应超时，关闭时使用各请求的默认超时
+DEFAULT_ADAPTIVE_TIMEOUTS = os.getenv("ADAPTIVE_TIMEOUTS", "1").lower() not in ("0", "false", "no")
+# 样本持久化文件，设置为空字符串时只保存在内存中
+DEFAULT_LATENCY_STATS_FILE = os.getenv("LATENCY_STATS_FILE", ".latency_stats.json") or None
+# 每个端点保留的样本数，以及开始自适应所需的最少样本数
+DEFAULT_LATENCY_WINDOW = int(os.getenv("LATENCY_WINDOW", "200"))
+DEFAULT_TIMEOUT_MIN_SAMPLES = int(os.getenv("TIMEOUT_MIN_SAMPLES", "10"))
+# 读取超时 = 延迟的 TIMEOUT_PERCENTILE 分位数 * TIMEOUT_FACTOR，限制在上下限之内（秒）
+DEFAULT_TIMEOUT_PERCENTILE = float(os.getenv("TIMEOUT_PERCENTILE", "0.99"))
+DEFAULT_TIMEOUT_FACTOR = float(os.getenv("TIMEOUT_FACTOR", "3"))
+DEFAULT_READ_TIMEOUT_MIN = float(os.getenv("READ_TIMEOUT_MIN", "3"))
+DEFAULT_READ_TIMEOUT_MAX = float(os.getenv("READ_TIMEOUT_MAX", "60"))
+# 连接超时按主机推算：延迟的低分位数近似网络往返时间，乘以 CONNECT_TIMEOUT_FACTOR（覆盖 TCP 和 TLS 握手）
+DEFAULT_CONNECT_TIMEOUT_MIN = float(os.getenv("CONNECT_TIMEOUT_MIN", "2"))
+DEFAULT_CONNECT_TIMEOUT_MAX = float(os.getenv("CONNECT_TIMEOUT_MAX", "10"))
+CONNECT_RTT_PERCENTILE = 0.1
+CONNECT_TIMEOUT_FACTOR = 10.0
+# 每积累多少个新样本自动保存一次
+SAVE_INTERVAL = 100
+
+
+def percentile(samples, fraction: float) -> float:
+    """样本的分位数（最近秩），samples 不能为空"""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class LatencyTracker:
+    """按端点统计延迟并推算超时，线程安全，可被多个客户端共享"""
+
+    def __init__(self, path: Optional[str] = DEFAULT_LATENCY_STATS_FILE, enabled: bool = DEFAULT_ADAPTIVE_TIMEOUTS,
+                 window: int = DEFAULT_LATENCY_WINDOW, min_samples: int = DEFAULT_TIMEOUT_MIN_SAMPLES,
+                 quantile: float = DEFAULT_TIMEOUT_PERCENTILE, factor: float = DEFAULT_TIMEOUT_FACTOR,
+                 read_min: float = DEFAULT_READ_TIMEOUT_MIN, read_max: float = DEFAULT_READ_TIMEOUT_MAX,
+                 connect_min: float = DEFAULT_CONNECT_TIMEOUT_MIN, connect_max: float = DEFAULT_CONNECT_TIMEOUT_MAX):
+        """
+        Args:
+            path: 样本持久化 JSON 文件路径，为 None 时不落盘
+            enabled: 为 False 时只统计延迟，超时使用调用方给出的默认值
+            window: 每个端点保留的最近样本数
+            min_samples: 样本数达到该值后才推算超时
+            quantile: 推算读取超时使用的分位数
+            factor: 读取超时相对该分位数的倍数
+            read_min: 读取超时下限（秒）
+            read_max: 读取超时上限（秒）
+            connect_min: 连接超时下限（秒）
+            connect_max: 连接超时上限（秒）
+        """
+        self.path = path
+        self.enabled = enabled
+        self.window = max(1, window)
+        self.min_samples = max(1, min_samples)
+        self.quantile = quantile
+        self.factor = factor
+        self.read_min = read_min
+        self.read_max = max(read_min, read_max)
+        self.connect_min = connect_min
+        self.connect_max = max(connect_min, connect_max)
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = {}
+        self._timeouts: Dict[str, int] = {}
+        self._unsaved = 0
+        self._load()
+
+    @staticmethod
+    def _key(url: str, endpoint_name: Optional[str]) -> str:
+        return f"{urlparse(url).netloc}|{endpoint_name or 'default'}"
+
+    # --- 持久化 ---
+
+    def _load(self):
+        """从磁盘加载样本，文件缺失或损坏时忽略"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for key, samples in data.get("endpoints", {}).items():
+                self._samples[key] = deque((float(s) for s in samples), maxlen=self.window)
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            print(f"读取延迟统计失败: {e}")
+
+    def save(self):
+        """把样本写入磁盘，先写临时文件再替换"""
+        with self._lock:
+            self._save_locked()
+
+    def _save_locked(self):
+        self._unsaved = 0
+        if not self.path:
+            return
+        data = {
+            "saved_at": time.time(),
+            "endpoints": {key: [round(s, 4) for s in samples] for key, samples in self._samples.items()},
+        }
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"保存延迟统计失败: {e}")
+
+    # --- 记录与推算 ---
+
+    def record(self, url: str, endpoint_name: Optional[str], latency: float):
+        """记录一次请求的延迟（秒）"""
+        key = self._key(url, endpoint_name)
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(latency)
+            self._unsaved += 1
+            if self._unsaved >= SAVE_INTERVAL:
+                self._save_locked()
+
+    def timeout(self, url: str, endpoint_name: Optional[str], default: float) -> Tuple[float, float]:
+        """
+        获取端点的 (连接超时, 读取超时)
+
+        Args:
+            url: 请求URL，用于区分主机
+            endpoint_name: 端点名称
+            default: 样本不足或未启用时使用的超时（秒）
+
+        Returns:
+            可直接传给 requests 的 timeout 元组
+        """
+        timeout = self._adaptive_timeout(self._key(url, endpoint_name))
+        return timeout if timeout is not None else (default, default)
+
+    def _adaptive_timeout(self, key: str) -> Optional[Tuple[float, float]]:
+        """由样本推算的超时，未启用或样本不足时返回 None"""
+        host = key.split("|", 1)[0]
+        with self._lock:
+            samples = list(self._samples.get(key, ()))
+            host_samples = [s for k, values in self._samples.items() if k.split("|", 1)[0] == host for s in values]
+        if not self.enabled or len(samples) < self.min_samples:
+            return None
+        read = min(self.read_max, max(self.read_min, percentile(samples, self.quantile) * self.factor))
+        connect = min(self.connect_max, max(self.connect_min,
+                                            percentile(host_samples, CONNECT_RTT_PERCENTILE) * CONNECT_TIMEOUT_FACTOR))
+        return connect, read
+
+    def send(self, url: str, endpoint_name: Optional[str], request: Callable[[Any], requests.Response],
+             default: float) -> requests.Response:
+        """
+        使用端点当前的超时发送一次请求，并记录延迟
+
+        读取超时也会作为一个样本记录，连续超时会抬高分位数，避免超时过短导致请求一直失败
+
+        Args:
+            url: 请求URL
+            endpoint_name: 端点名称
+            request: 接收 timeout 参数、发送一次请求并返回响应的函数
+            default: 样本不足时使用的超时（秒）
+        """
+        timeout = self.timeout(url, endpoint_name, default)
+        try:
+            response = request(timeout)
+        except requests.exceptions.ReadTimeout:
+            key = self._key(url, endpoint_name)
+            with self._lock:
+                self._timeouts[key] = self._timeouts.get(key, 0) + 1
+            self.record(url, endpoint_name, timeout[1])
+            raise
+        self.record(url, endpoint_name, response.elapsed.total_seconds())
+        return response
+
+    # --- 状态 ---
+
+    def stats(self) -> Dict[str, Any]:
+        """每个端点的样本数、延迟中位数和分位数、读取超时次数及当前超时"""
+        with self._lock:
+            all_samples = {key: list(samples) for key, samples in self._samples.items() if samples}
+            timeouts = dict(self._timeouts)
+        endpoints = {}
+        for key, samples in all_samples.items():
+            timeout = self._adaptive_timeout(key)
+            endpoints[key] = {
+                "samples": len(samples),
+                "p50": round(percentile(samples, 0.5), 4),
+                "p99": round(percentile(samples, self.quantile), 4),
+                "read_timeouts": timeouts.get(key, 0),
+                "timeout": tuple(round(t, 2) for t in timeout) if timeout is not None else None,
+            }
+        return {"enabled": self.enabled, "endpoints": endpoints}
+
+    def format_stats(self) -> str:
+        """生成一行可打印的统计信息"""
+        stats = self.stats()
+        parts = []
+        multiple_hosts = len({key.split("|", 1)[0] for key in stats["endpoints"]}) > 1
+        for key, values in sorted(stats["endpoints"].items()):
+            name = key.replace("|", "/") if multiple_hosts else key.split("|", 1)[1]
+            timeout = f"{values['timeout'][0]:.1f}/{values['timeout'][1]:.1f}s" if values["timeout"] else "默认"
+            parts.append(f"{name} {timeout}" + (f" (超时 {values['read_timeouts']} 次)" if values["read_timeouts"] else ""))
+        state = "" if stats["enabled"] else " (未启用)"
+        return f"自适应超时{state}: " + (", ".join(parts) if parts else "无样本")
+
+
+_default_tracker: Optional[LatencyTracker] = None
+_default_tracker_lock = threading.Lock()
+
+
+def get_default_latency_tracker() -> LatencyTracker:
+    """
+    获取全局延迟统计，首次调用时按环境变量配置创建（并加载上次运行保存的样本）
+
+    Returns:
+        LatencyTracker 实例
+    """
+    global _default_tracker
+    if _default_tracker is None:
+        with _default_tracker_lock:
+            if _default_tracker is None:
+                _default_tracker = LatencyTracker()
+    return _default_tracker
+
+
+def set_default_latency_tracker(tracker: Optional[LatencyTracker]):
+    """设置全局延迟统计，传入 None 时恢复按默认配置创建"""
+    global _default_tracker
+    _default_tracker = tracker
@@ -0,0 +1,68 @@
+"""
+题目答案并发获取模块
+按单元收集题目，使用有界线程池并发调用 get_question_answer，结果按题目ID返回，输出顺序由调用方的遍历顺序决定
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from rate_limiter import default_worker_count
+
+# 默认线程数（并发窗口上限，实际并发由限流器控制），可通过环境变量 ANSWER_WORKERS 或命令行 --answer-workers 限制
+DEFAULT_ANSWER_WORKERS = default_worker_count("ANSWER_WORKERS")
+
+
+def collect_unit_question_ids(coursepage_list: Iterable[Dict]) -> List[Any]:
+    """
+    收集一个单元内所有页面的题目ID（保持出现顺序，去重）
+
+    Args:
+        coursepage_list: 单元的 coursepageDTOList
+
+    Returns:
+        题目ID列表
+    """
+    question_ids = []
+    seen = set()
+    for coursepage in coursepage_list or []:
+        for q_data in coursepage.get("questionDTOList") or []:
+            question_id = q_data.get("questionid")
+            if question_id is None or question_id in seen:
+                continue
+            seen.add(question_id)
+            question_ids.append(question_id)
+    return question_ids
+
+
+def fetch_question_answers(question_ids: List[Any], parent_id: Any,
+                           fetch_answer: Callable[[Any, Any], Optional[Dict]],
+                           max_workers: int = DEFAULT_ANSWER_WORKERS) -> Dict[Any, Optional[Dict]]:
+    """
+    并发获取一组题目的答案
+
+    Args:
+        question_ids: 题目ID列表
+        parent_id: 父级ID（单元ID）
+        fetch_answer: 单题答案获取函数，签名同 get_question_answer(question_id, parent_id)
+        max_workers: 最大并发数，小于等于1时退化为串行
+
+    Returns:
+        题目ID到答案数据的映射
+    """
+    def _fetch(question_id):
+        try:
+            return fetch_answer(question_id, parent_id)
+        except Exception as e:
+            print(f"    获取题目 {question_id} 答案异常: {e}")
+            return None
+
+    if not question_ids:
+        return {}
+    workers = max(1, min(max_workers or 1, len(question_ids)))
+    if workers == 1:
+        return {question_id: _fetch(question_id) for question_id in question_ids}
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="answer") as executor:
+        # executor.map 保证结果顺序与输入一致
+        results = list(executor.map(_fetch, question_ids))
+    return dict(zip(question_ids, results))
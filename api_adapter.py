@@ -1,39 +1,99 @@
 """
 API适配器模块 - 处理新旧API之间的兼容性和转换
-该模块提供了一个适配器层，用于统一处理新旧API之间的差异，确保上层应用无需关心底层API的变化
+该模块提供了一个适配器层，用于统一处理新旧API之间的差异，确保上层应用无需关心底层API的变化；
+课程目录、章节内容、题目答案和用户信息按端点各自熔断和路由，某个端点失败不会让其他端点改用旧API
 """
 
 import os
 import json
-from typing import Dict, List, Optional, Any, Union
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Any, Tuple, Union
 from dgut_ulearning_api import DGUTUlearningAPI
 from ulearning_api import UlearningAPI
+from transport import DEFAULT_PREWARM_CONNECTIONS, get_default_transport, mount_pooled_adapter
+from circuit_breaker import CLOSED, CircuitBreaker
+
+# 可在新旧API之间路由的端点：名称 -> (日志用名称, 失败时是否立即尝试另一个API)
+# 答案请求量大，单题失败不立即换API（避免请求翻倍），由熔断器在新API持续失败时整体改走旧API
+ROUTED_ENDPOINTS = {
+    "course_directory": ("课程目录", True),
+    "chapter_content": ("章节内容", True),
+    "question_answer": ("题目答案", False),
+    "user_info": ("用户信息", True),
+}
+API_NAMES = {"new": "新API", "old": "旧API"}
+# 另一个API的平均延迟低于首选API的该比例时优先使用它
+FASTER_BACKEND_RATIO = 0.7
+
+# 对冲请求：首选API在延迟阈值（该端点近期延迟的 p95）内未返回时，同时向另一个API发送相同请求，先成功者胜出
+DEFAULT_API_HEDGING = os.getenv("API_HEDGING", "").lower() in ("1", "true", "yes")
+# 对冲请求数占请求数的比例上限，以及允许的突发对冲数
+HEDGE_MAX_RATIO = float(os.getenv("HEDGE_MAX_RATIO", "0.1"))
+HEDGE_BURST = 2.0
+# 延迟样本不足时使用的对冲延迟（秒），以及延迟阈值下限
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DELAY", "1.0"))
+HEDGE_MIN_DELAY = 0.05
+# 计算 p95 所需的最少样本数和保留的样本数
+HEDGE_MIN_SAMPLES = 20
+HEDGE_SAMPLE_SIZE = 200
+# 执行对冲请求的线程数
+HEDGE_WORKERS = 32
+
+
+def _new_routing_entry() -> Dict[str, int]:
+    return {"new": 0, "old": 0, "fallbacks": 0, "rejected": 0, "hedges": 0, "hedge_wins": 0, "hedges_capped": 0}
 
 
 class APIAdapter:
     """API适配器类，用于统一处理新旧API之间的差异"""
     
-    def __init__(self, api_version: str = "auto"):
+    def __init__(self, api_version: str = "auto", hedging: Optional[bool] = None):
         """
         初始化API适配器
         
         Args:
             api_version: API版本，可选值为 "auto"(自动检测), "old"(旧版), "new"(新版)
+            hedging: 是否启用新旧API之间的对冲请求，默认读取环境变量 API_HEDGING
         """
+        if api_version not in ("auto", "old", "new"):
+            raise ValueError(f"不支持的API版本: {api_version}")
         self.api_version = api_version
+        self.hedging = DEFAULT_API_HEDGING if hedging is None else hedging
         self.old_api = UlearningAPI()
         self.new_api = DGUTUlearningAPI(api_version="v2" if api_version == "new" else "auto")
-        self.current_api = None
+        # 首选API：自动检测或 switch_api() 的结果；各端点实际使用哪个API由熔断器按健康状况和延迟决定。
+        # auto 模式在首次使用时才检测（见 current_api），构造适配器不发送请求
+        self._current_api = None
+        # 并发获取答案时多个线程共享同一个适配器，切换API需要加锁
+        self._lock = threading.RLock()
+        # (端点, "new"/"old") -> 熔断器；端点 -> 路由统计
+        self._breakers: Dict[tuple, CircuitBreaker] = {}
+        self._routing: Dict[str, Dict[str, int]] = {}
+        # (端点, API) -> 最近成功请求的耗时；端点 -> 对冲额度
+        self._latencies: Dict[tuple, deque] = {}
+        self._hedge_tokens: Dict[str, float] = {}
+        self._hedge_executor: Optional[ThreadPoolExecutor] = None
         
-        # 自动检测并选择最佳API
-        if api_version == "auto":
-            self._detect_best_api()
-        elif api_version == "old":
-            self.current_api = self.old_api
+        if api_version == "old":
+            self._current_api = self.old_api
         elif api_version == "new":
-            self.current_api = self.new_api
-        else:
-            raise ValueError(f"不支持的API版本: {api_version}")
+            self._current_api = self.new_api
+    
+    @property
+    def current_api(self) -> Union[UlearningAPI, DGUTUlearningAPI]:
+        """首选API客户端，auto 模式下首次访问时自动检测"""
+        if self._current_api is None:
+            with self._lock:
+                if self._current_api is None:
+                    self._detect_best_api()
+        return self._current_api
+    
+    @current_api.setter
+    def current_api(self, api: Union[UlearningAPI, DGUTUlearningAPI]):
+        self._current_api = api
     
     def _detect_best_api(self):
         """自动检测并选择最佳API"""
@@ -43,6 +103,10 @@ class APIAdapter:
             if user_info and user_info.get("success"):
                 self.current_api = self.new_api
                 print("检测到新API可用，使用新API")
+            elif user_info and user_info.get("transient"):
+                # 超时、5xx 等暂时性失败（已重试）不能说明新API不可用
+                self.current_api = self.new_api
+                print("新API暂时无响应，仍使用新API")
             else:
                 self.current_api = self.old_api
                 print("新API不可用，回退到旧API")
@@ -50,6 +114,191 @@ class APIAdapter:
             print(f"检测新API失败: {e}，回退到旧API")
             self.current_api = self.old_api
     
+    @staticmethod
+    def _is_transient_failure(response: Optional[Dict]) -> bool:
+        """新API的失败是否为暂时性的（已按重试策略重试），此时不应回退到旧API"""
+        return bool(response) and bool(response.get("transient"))
+    
+    def _breaker(self, endpoint: str, backend: str) -> CircuitBreaker:
+        """获取（必要时创建）端点在某个API上的熔断器"""
+        key = (endpoint, backend)
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = self._breakers[key] = CircuitBreaker(f"{endpoint}/{backend}")
+            return breaker
+    
+    def _count(self, endpoint: str, field: str):
+        with self._lock:
+            routing = self._routing.setdefault(endpoint, _new_routing_entry())
+            routing[field] += 1
+    
+    def _route(self, endpoint: str) -> List[str]:
+        """
+        端点本次请求尝试API的顺序：首选API在前；两个API都健康且另一个明显更快时先用另一个
+        
+        Returns:
+            "new"/"old" 列表
+        """
+        if self.api_version == "old":
+            return ["old"]
+        preferred = self.get_current_api_type()
+        other = "old" if preferred == "new" else "new"
+        preferred_breaker, other_breaker = self._breaker(endpoint, preferred), self._breaker(endpoint, other)
+        preferred_latency, other_latency = preferred_breaker.latency, other_breaker.latency
+        if preferred_breaker.state == CLOSED and other_breaker.state == CLOSED \
+                and preferred_latency is not None and other_latency is not None \
+                and other_latency < preferred_latency * FASTER_BACKEND_RATIO:
+            return [other, preferred]
+        return [preferred, other]
+    
+    def _attempt(self, endpoint: str, backend: str, call: Callable[[], Optional[Dict]]) -> Dict:
+        """通过指定API请求一次，结果计入该API的熔断器"""
+        label = ROUTED_ENDPOINTS[endpoint][0]
+        breaker = self._breaker(endpoint, backend)
+        self._count(endpoint, backend)
+        start = time.perf_counter()
+        try:
+            response = self._convert_response_format(call(), backend)
+        except Exception as e:
+            print(f"{API_NAMES[backend]}获取{label}异常: {e}")
+            response = {"success": False, "message": str(e), "data": None}
+        if response.get("success"):
+            elapsed = time.perf_counter() - start
+            breaker.record_success(elapsed)
+            with self._lock:
+                samples = self._latencies.setdefault((endpoint, backend), deque(maxlen=HEDGE_SAMPLE_SIZE))
+                samples.append(elapsed)
+        else:
+            breaker.record_failure()
+        return response
+    
+    def _call_routed(self, endpoint: str, calls: Dict[str, Callable[[], Optional[Dict]]]) -> Dict:
+        """
+        按路由顺序请求：跳过熔断中的API；失败时（暂时性失败除外）按端点配置尝试下一个API；
+        启用对冲且两个API都可用时改为对冲请求
+        
+        Args:
+            endpoint: ROUTED_ENDPOINTS 中的端点名称
+            calls: {"new": 调用新API的函数, "old": 调用旧API的函数}
+            
+        Returns:
+            统一格式的响应
+        """
+        order = self._route(endpoint)
+        if self.hedging and len(order) > 1 and all(self._breaker(endpoint, backend).available() for backend in order):
+            response, tried = self._call_hedged(endpoint, order, calls)
+            if response is not None and (response.get("success") or len(tried) == len(order)):
+                return response
+            # 首选API在对冲延迟内就失败了（或刚被熔断）：按普通方式继续尝试另一个API
+            return self._call_in_order(endpoint, order[len(tried):], calls, response, tried[-1])
+        return self._call_in_order(endpoint, order, calls)
+    
+    def _call_in_order(self, endpoint: str, order: List[str], calls: Dict[str, Callable[[], Optional[Dict]]],
+                       response: Optional[Dict] = None, previous: Optional[str] = None) -> Dict:
+        """依次请求 order 中的API，response/previous 为之前失败的结果及其API"""
+        label, fallback = ROUTED_ENDPOINTS[endpoint]
+        for backend in order:
+            if not self._breaker(endpoint, backend).allow_request():
+                self._count(endpoint, "rejected")
+                continue
+            if response is not None:
+                # 暂时性失败已经重试过，换API只会增加负载
+                if not fallback or self._is_transient_failure(response):
+                    return response
+                print(f"{API_NAMES[previous]}获取{label}失败，尝试{API_NAMES[backend]}")
+                self._count(endpoint, "fallbacks")
+            response = self._attempt(endpoint, backend, calls[backend])
+            if response.get("success"):
+                return response
+            previous = backend
+        if response is None:
+            # 全部熔断：仍按顺序请求第一个API，而不是直接失败
+            response = self._attempt(endpoint, order[0], calls[order[0]])
+        return response
+    
+    def _call_hedged(self, endpoint: str, order: List[str],
+                     calls: Dict[str, Callable[[], Optional[Dict]]]) -> Tuple[Optional[Dict], List[str]]:
+        """
+        对冲请求：先请求首选API，超过延迟阈值仍未返回且对冲额度允许时再请求另一个API，返回先成功的结果
+        
+        落后的请求尚未开始时直接取消；已经发出的HTTP请求无法中止，其结果被丢弃（仍计入熔断器和延迟统计）。
+        
+        Returns:
+            (响应, 实际请求过的API列表)，首选API被熔断器拒绝时响应为 None
+        """
+        primary, secondary = order
+        if not self._breaker(endpoint, primary).allow_request():
+            self._count(endpoint, "rejected")
+            return None, [primary]
+        executor = self._get_hedge_executor()
+        futures = {executor.submit(self._attempt, endpoint, primary, calls[primary]): primary}
+        self._deposit_hedge_budget(endpoint)
+        done, _ = wait(futures, timeout=self._hedge_delay(endpoint, primary))
+        if not done:
+            if self._take_hedge_budget(endpoint) and self._breaker(endpoint, secondary).allow_request():
+                self._count(endpoint, "hedges")
+                futures[executor.submit(self._attempt, endpoint, secondary, calls[secondary])] = secondary
+            else:
+                self._count(endpoint, "hedges_capped")
+        tried = list(futures.values())
+        
+        response = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if result.get("success"):
+                    for loser in pending:
+                        loser.cancel()
+                    if futures[future] != primary:
+                        self._count(endpoint, "hedge_wins")
+                    return result, tried
+                if response is None or futures[future] == primary:
+                    response = result
+        return response, tried
+    
+    def _hedge_delay(self, endpoint: str, backend: str) -> float:
+        """对冲延迟阈值：该端点在该API上近期成功请求耗时的 p95，样本不足时使用默认值"""
+        with self._lock:
+            samples = sorted(self._latencies.get((endpoint, backend), ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        return max(HEDGE_MIN_DELAY, samples[int(0.95 * (len(samples) - 1))])
+    
+    def _deposit_hedge_budget(self, endpoint: str):
+        with self._lock:
+            tokens = self._hedge_tokens.get(endpoint, HEDGE_BURST)
+            self._hedge_tokens[endpoint] = min(HEDGE_BURST, tokens + HEDGE_MAX_RATIO)
+    
+    def _take_hedge_budget(self, endpoint: str) -> bool:
+        """取出一次对冲额度，保证对冲请求不超过请求数的 HEDGE_MAX_RATIO"""
+        with self._lock:
+            tokens = self._hedge_tokens.get(endpoint, HEDGE_BURST)
+            if tokens < 1:
+                return False
+            self._hedge_tokens[endpoint] = tokens - 1
+            return True
+    
+    def _get_hedge_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+            return self._hedge_executor
+    
+    def configure_connection_pool(self, max_workers: int):
+        """
+        按并发数调整新旧API会话的连接池大小，并在后台预先建立到新旧API主机的连接
+        
+        Args:
+            max_workers: 并发请求的最大线程数
+        """
+        for api in (self.old_api, self.new_api):
+            mount_pooled_adapter(api.session, max_workers)
+        get_default_transport().prewarm([self.old_api.base_url, self.new_api.base_url],
+                                        min(max_workers, DEFAULT_PREWARM_CONNECTIONS))
+    
     def _convert_response_format(self, response: Dict, api_type: str) -> Dict:
         """
         转换响应格式为统一格式
@@ -88,24 +337,10 @@ class APIAdapter:
         Returns:
             统一格式的课程目录数据
         """
-        if self.current_api == self.new_api:
-            try:
-                response = self.new_api.get_course_directory(course_id, class_id)
-                # 如果新API返回404或其他错误，自动切换到旧API
-                if not response or not response.get("success"):
-                    print("新API获取课程目录失败，自动切换到旧API")
-                    self.current_api = self.old_api
-                    response = self.old_api.get_course_directory(course_id, class_id)
-                    return self._convert_response_format(response, "old")
-                return self._convert_response_format(response, "new")
-            except Exception as e:
-                print(f"新API获取课程目录异常: {e}，自动切换到旧API")
-                self.current_api = self.old_api
-                response = self.old_api.get_course_directory(course_id, class_id)
-                return self._convert_response_format(response, "old")
-        else:
-            response = self.old_api.get_course_directory(course_id, class_id)
-            return self._convert_response_format(response, "old")
+        return self._call_routed("course_directory", {
+            "new": lambda: self.new_api.get_course_directory(course_id, class_id),
+            "old": lambda: self.old_api.get_course_directory(course_id, class_id),
+        })
     
     def get_whole_chapter_page_content(self, node_id: str) -> Optional[Dict]:
         """
@@ -117,24 +352,10 @@ class APIAdapter:
         Returns:
             统一格式的章节内容数据
         """
-        if self.current_api == self.new_api:
-            try:
-                response = self.new_api.get_whole_chapter_page_content(node_id)
-                # 如果新API返回404或其他错误，自动切换到旧API
-                if not response or not response.get("success"):
-                    print("新API获取章节内容失败，自动切换到旧API")
-                    self.current_api = self.old_api
-                    response = self.old_api.get_whole_chapter_page_content(node_id)
-                    return self._convert_response_format(response, "old")
-                return self._convert_response_format(response, "new")
-            except Exception as e:
-                print(f"新API获取章节内容异常: {e}，自动切换到旧API")
-                self.current_api = self.old_api
-                response = self.old_api.get_whole_chapter_page_content(node_id)
-                return self._convert_response_format(response, "old")
-        else:
-            response = self.old_api.get_whole_chapter_page_content(node_id)
-            return self._convert_response_format(response, "old")
+        return self._call_routed("chapter_content", {
+            "new": lambda: self.new_api.get_whole_chapter_page_content(node_id),
+            "old": lambda: self.old_api.get_whole_chapter_page_content(node_id),
+        })
     
     def get_question_answer(self, question_id: str, parent_id: str) -> Optional[Dict]:
         """
@@ -147,12 +368,10 @@ class APIAdapter:
         Returns:
             统一格式的题目答案数据
         """
-        if self.current_api == self.new_api:
-            response = self.new_api.get_question_answer(question_id, parent_id)
-            return self._convert_response_format(response, "new")
-        else:
-            response = self.old_api.get_question_answer(question_id, parent_id)
-            return self._convert_response_format(response, "old")
+        return self._call_routed("question_answer", {
+            "new": lambda: self.new_api.get_question_answer(question_id, parent_id),
+            "old": lambda: self.old_api.get_question_answer(question_id, parent_id),
+        })
     
     def get_user_info(self) -> Optional[Dict]:
         """
@@ -161,24 +380,10 @@ class APIAdapter:
         Returns:
             统一格式的用户信息数据
         """
-        if self.current_api == self.new_api:
-            try:
-                response = self.new_api.get_user_info()
-                # 如果新API返回404或其他错误，自动切换到旧API
-                if not response or not response.get("success"):
-                    print("新API获取用户信息失败，自动切换到旧API")
-                    self.current_api = self.old_api
-                    response = self.old_api.get_user_info()
-                    return self._convert_response_format(response, "old")
-                return self._convert_response_format(response, "new")
-            except Exception as e:
-                print(f"新API获取用户信息异常: {e}，自动切换到旧API")
-                self.current_api = self.old_api
-                response = self.old_api.get_user_info()
-                return self._convert_response_format(response, "old")
-        else:
-            response = self.old_api.get_user_info()
-            return self._convert_response_format(response, "old")
+        return self._call_routed("user_info", {
+            "new": lambda: self.new_api.get_user_info(),
+            "old": lambda: self.old_api.get_user_info(),
+        })
     
     def get_course_remaining(self, course_id: str, class_id: str) -> Optional[Dict]:
         """
@@ -268,56 +473,135 @@ class APIAdapter:
             api_version: API版本 ("old" 或 "new")
         """
         if api_version == "old":
-            self.current_api = self.old_api
+            with self._lock:
+                self.current_api = self.old_api
             print("已切换到旧API")
         elif api_version == "new":
-            self.current_api = self.new_api
+            with self._lock:
+                self.current_api = self.new_api
             print("已切换到新API")
         else:
             raise ValueError(f"不支持的API版本: {api_version}")
+    
+    def routing_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        各端点的路由统计和熔断器状态
+        
+        Returns:
+            端点 -> {"new", "old"（发往各API的请求数）, "fallbacks", "rejected", "hedges", "hedge_wins",
+                     "hedges_capped", "breakers": {API: 熔断器快照}}
+        """
+        with self._lock:
+            routing = {endpoint: dict(values) for endpoint, values in self._routing.items()}
+            breakers = list(self._breakers.items())
+        for (endpoint, backend), breaker in breakers:
+            entry = routing.setdefault(endpoint, _new_routing_entry())
+            entry.setdefault("breakers", {})[backend] = breaker.snapshot()
+        return routing
+    
+    def format_routing_stats(self) -> str:
+        """生成可打印的路由统计，每个端点一行"""
+        lines = []
+        for endpoint, values in self.routing_stats().items():
+            states = ", ".join(f"{API_NAMES[backend]} {snapshot['state']}"
+                               for backend, snapshot in sorted(values.get("breakers", {}).items()))
+            hedges = (f", 对冲 {values['hedges']} 次 (胜出 {values['hedge_wins']}, 超出限额 {values['hedges_capped']})"
+                      if values["hedges"] or values["hedges_capped"] else "")
+            lines.append(f"API路由 {endpoint}: 新API {values['new']} 次, 旧API {values['old']} 次, "
+                         f"回退 {values['fallbacks']} 次, 熔断跳过 {values['rejected']} 次{hedges}"
+                         + (f" ({states})" if states else ""))
+        return "\n".join(lines)
+
+
+def create_api_adapter(api_version: str = "auto", hedging: Optional[bool] = None,
+                       detect: bool = False) -> APIAdapter:
+    """
+    创建API适配器（供作为库使用时调用，不影响全局适配器）
+    
+    Args:
+        api_version: "auto"(自动检测), "old"(旧版), "new"(新版)
+        hedging: 是否启用对冲请求，默认读取环境变量 API_HEDGING
+        detect: 是否立即检测新旧API；默认在首次请求时检测
+        
+    Returns:
+        APIAdapter 实例
+    """
+    adapter = APIAdapter(api_version=api_version, hedging=hedging)
+    if detect:
+        adapter.get_current_api_type()
+    return adapter
+
+
+_default_adapter: Optional[APIAdapter] = None
+_default_adapter_lock = threading.Lock()
+
+
+def get_default_api_adapter() -> APIAdapter:
+    """
+    获取全局API适配器，首次调用时创建（导入模块时不创建、不发送请求）
+    
+    Returns:
+        APIAdapter 实例
+    """
+    global _default_adapter
+    if _default_adapter is None:
+        with _default_adapter_lock:
+            if _default_adapter is None:
+                _default_adapter = create_api_adapter()
+    return _default_adapter
+
+
+def set_default_api_adapter(adapter: Optional[APIAdapter]):
+    """设置全局API适配器，传入 None 时恢复为首次使用时按默认配置创建"""
+    global _default_adapter
+    _default_adapter = adapter
+
 
+def __getattr__(name: str):
+    # 兼容 `from api_adapter import api_adapter`：全局适配器改为首次访问时创建
+    if name == "api_adapter":
+        return get_default_api_adapter()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# 创建全局API适配器实例
-api_adapter = APIAdapter()
 
 # 向后兼容的函数接口
 def get_course_directory(course_id: str, class_id: str, headers: Dict = None) -> Optional[Dict]:
     """向后兼容的课程目录获取函数"""
-    response = api_adapter.get_course_directory(course_id, class_id)
+    response = get_default_api_adapter().get_course_directory(course_id, class_id)
     return response.get("data") if response and response.get("success") else response
 
 def get_whole_chapter_page_content(node_id: str, headers: Dict = None) -> Optional[Dict]:
     """向后兼容的章节内容获取函数"""
-    response = api_adapter.get_whole_chapter_page_content(node_id)
+    response = get_default_api_adapter().get_whole_chapter_page_content(node_id)
     return response.get("data") if response and response.get("success") else response
 
 def get_question_answer(question_id: str, parent_id: str, headers: Dict = None) -> Optional[Dict]:
     """向后兼容的题目答案获取函数"""
-    response = api_adapter.get_question_answer(question_id, parent_id)
+    response = get_default_api_adapter().get_question_answer(question_id, parent_id)
     return response.get("data") if response and response.get("success") else response
 
 def get_user_info(headers: Dict = None) -> Optional[Dict]:
     """向后兼容的用户信息获取函数"""
-    response = api_adapter.get_user_info()
+    response = get_default_api_adapter().get_user_info()
     return response.get("data") if response and response.get("success") else response
 
 def get_course_remaining(course_id: str, class_id: str, headers: Dict = None) -> Optional[Dict]:
     """向后兼容的课程剩余时间获取函数"""
-    response = api_adapter.get_course_remaining(course_id, class_id)
+    response = get_default_api_adapter().get_course_remaining(course_id, class_id)
     return response.get("data") if response and response.get("success") else response
 
 def get_study_record(course_id: str, class_id: str, headers: Dict = None) -> Optional[Dict]:
     """向后兼容的学习记录获取函数"""
-    response = api_adapter.get_study_record(course_id, class_id)
+    response = get_default_api_adapter().get_study_record(course_id, class_id)
     return response.get("data") if response and response.get("success") else response
 
 def send_study_heartbeat(course_id: str, class_id: str, node_id: str, 
                        current_time: int = None, headers: Dict = None) -> Optional[Dict]:
     """向后兼容的学习心跳发送函数"""
-    response = api_adapter.send_study_heartbeat(course_id, class_id, node_id, current_time)
+    response = get_default_api_adapter().send_study_heartbeat(course_id, class_id, node_id, current_time)
     return response.get("data") if response and response.get("success") else response
 
 def sync_personal_data(headers: Dict = None) -> Optional[Dict]:
     """向后兼容的个人数据同步函数"""
-    response = api_adapter.sync_personal_data()
+    response = get_default_api_adapter().sync_personal_data()
     return response.get("data") if response and response.get("success") else response
\ No newline at end of file
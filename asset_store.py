@@ -0,0 +1,228 @@
+"""
+图片资源存储模块
+在输出根目录下按内容 SHA-256 保存图片（每份内容只存一次），题目目录中的图片以硬链接指向存储中的对象（不支持时退回符号链接/复制），
+并记录每个URL的 ETag/Last-Modified，重复导出时使用条件请求，未变化的图片既不重复下载也不占用额外磁盘。
+多个进程（批量导出）可以共用同一个存储：保存索引时在文件锁内重新读取并合并，互不覆盖
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# 存储目录名（位于输出根目录下）
+ASSET_STORE_DIRNAME = ".assets"
+# 打开存储时清理超过该时间（秒）未修改的下载临时文件（中断的下载留下的）
+STALE_TEMP_SECONDS = 600
+
+
+class AssetStore:
+    """按内容寻址的图片存储，线程安全"""
+
+    def __init__(self, output_root: str):
+        """
+        打开（必要时创建）输出根目录下的资源存储
+
+        Args:
+            output_root: 输出根目录，例如 BASE_OUTPUT_DIR
+        """
+        self.root = os.path.join(output_root, ASSET_STORE_DIRNAME)
+        self.objects_dir = os.path.join(self.root, "objects")
+        self.tmp_dir = os.path.join(self.root, "tmp")
+        self.index_path = os.path.join(self.root, "index.json")
+        self.lock_path = os.path.join(self.root, "index.lock")
+        self._lock = threading.Lock()
+        self._index: Dict[str, Dict] = {}
+        # 本进程新记录的条目，保存时合并到磁盘上的索引
+        self._updated: Dict[str, Dict] = {}
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self._remove_stale_temp_files()
+        self._index = self._read_index()
+
+    def _read_index(self) -> Dict[str, Dict]:
+        """读取磁盘上的URL校验信息索引，文件缺失或损坏时返回空索引"""
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if isinstance(index, dict):
+                return index
+        except (OSError, ValueError) as e:
+            print(f"读取图片索引失败: {e}")
+        return {}
+
+    def _remove_stale_temp_files(self):
+        """删除中断的下载留下的临时文件（其他进程正在写入的临时文件不会过期）"""
+        cutoff = time.time() - STALE_TEMP_SECONDS
+        try:
+            names = os.listdir(self.tmp_dir)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self.tmp_dir, name)
+            try:
+                if name.endswith(".part") and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def save(self):
+        """
+        写入索引（仅在有变化时）：在文件锁内重新读取磁盘上的索引，合并本进程的新条目，
+        写入同目录下的独立临时文件再替换，多个进程同时保存不会互相覆盖
+        """
+        with self._lock:
+            if not self._updated:
+                return
+            try:
+                with _file_lock(self.lock_path):
+                    index = self._read_index()
+                    index.update(self._updated)
+                    fd, tmp_path = tempfile.mkstemp(prefix="index.", suffix=".tmp", dir=self.root)
+                    try:
+                        with os.fdopen(fd, "w", encoding="utf-8") as f:
+                            json.dump(index, f, ensure_ascii=False, indent=2)
+                        os.replace(tmp_path, self.index_path)
+                    except BaseException:
+                        if os.path.exists(tmp_path):
+                            os.remove(tmp_path)
+                        raise
+                self._index.update(index)
+                self._updated.clear()
+            except OSError as e:
+                print(f"保存图片索引失败: {e}")
+
+    def object_path(self, digest: str) -> str:
+        """内容摘要对应的对象文件路径"""
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def lookup(self, url: str) -> Optional[Dict]:
+        """
+        获取URL上次下载的记录（摘要及 ETag/Last-Modified），对象文件已丢失时返回 None
+
+        Returns:
+            {"sha256", "etag", "last_modified", "size"} 或 None
+        """
+        with self._lock:
+            entry = self._index.get(url)
+        if entry and os.path.exists(self.object_path(entry["sha256"])):
+            return entry
+        return None
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """根据已记录的校验信息生成条件请求头"""
+        entry = self.lookup(url)
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def new_temp_path(self) -> str:
+        """存储目录内的临时文件路径，与对象目录在同一文件系统，便于重命名"""
+        return os.path.join(self.tmp_dir, f"{uuid.uuid4().hex}.part")
+
+    def commit(self, tmp_path: str, url: Optional[str] = None, etag: Optional[str] = None,
+               last_modified: Optional[str] = None) -> str:
+        """
+        把下载完成的临时文件存入存储并记录URL的校验信息
+
+        Args:
+            tmp_path: new_temp_path() 返回的临时文件
+            url: 图片URL
+            etag: 响应的 ETag
+            last_modified: 响应的 Last-Modified
+
+        Returns:
+            对象文件路径
+        """
+        digest = _file_sha256(tmp_path)
+        object_path = self.object_path(digest)
+        if os.path.exists(object_path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            os.replace(tmp_path, object_path)
+        if url:
+            with self._lock:
+                self._index[url] = self._updated[url] = {
+                    "sha256": digest, "etag": etag, "last_modified": last_modified,
+                    "size": os.path.getsize(object_path)
+                }
+        return object_path
+
+    def link(self, object_path: str, dest_path: str):
+        """
+        在题目目录中创建指向对象的文件：优先硬链接，其次相对符号链接，最后复制
+
+        Args:
+            object_path: 对象文件路径
+            dest_path: 题目目录中的图片路径
+        """
+        directory, name = os.path.split(dest_path)
+        os.makedirs(directory or ".", exist_ok=True)
+        if os.path.exists(dest_path) and _same_file(object_path, dest_path):
+            return
+        tmp_path = os.path.join(directory, f".{name}.{uuid.uuid4().hex}.part")
+        try:
+            os.link(object_path, tmp_path)
+        except OSError:
+            try:
+                os.symlink(os.path.relpath(object_path, directory or "."), tmp_path)
+            except (OSError, NotImplementedError):
+                shutil.copyfile(object_path, tmp_path)
+        try:
+            os.replace(tmp_path, dest_path)
+        except OSError:
+            os.remove(tmp_path)
+            raise
+
+
+@contextlib.contextmanager
+def _file_lock(path: str):
+    """跨进程的排他文件锁（POSIX 使用 flock，Windows 使用 msvcrt.locking）"""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _file_sha256(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _same_file(a: str, b: str) -> bool:
+    try:
+        return os.path.samefile(a, b)
+    except OSError:
+        return False
@@ -0,0 +1,332 @@
+"""
+优学院异步API模块 - 基于 asyncio 的客户端
+提供与 APIAdapter 相同的端点（课程目录、章节内容、题目答案），保留 DGUT v2/v1 与旧版 /uaapi 路径回退，
+配合信号量在单个事件循环内并发抓取整门课程，适合同时导出多门课程
+"""
+
+import asyncio
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from dgut_ulearning_api import normalize_response
+from retry_policy import VERBOSE_REQUESTS
+
+try:
+    import aiohttp
+except ImportError:  # 可选依赖: pip install aiohttp 或 uv pip install ".[async]"
+    aiohttp = None
+
+# 加载环境变量
+load_dotenv()
+
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("ASYNC_MAX_CONCURRENCY", "32"))
+
+# 端点候选路由，按顺序尝试；kind 为 "dgut" 的路由按 code/success 字段判断结果，"legacy" 为旧版优学院接口
+ENDPOINT_ROUTES = {
+    "course_directory": [
+        ("dgut", "POST", "/api/v2/learnCourse/courseDirectory", 30),
+        ("dgut", "POST", "/learnCourse/courseDirectory", 30),
+        ("legacy", "GET", "/uaapi/course/{course_id}/directory?classId={class_id}", 15),
+        ("legacy", "GET", "/course/stu/{course_id}/directory?classId={class_id}", 15),
+    ],
+    "chapter_content": [
+        ("dgut", "POST", "/api/v2/learnCourse/getWholeChapterPageContent", 30),
+        ("dgut", "POST", "/learnCourse/getWholeChapterPageContent", 30),
+        ("legacy", "GET", "/uaapi/wholepage/chapter/stu/{node_id}", 20),
+        ("legacy", "GET", "/wholepage/chapter/stu/{node_id}", 20),
+    ],
+    "question_answer": [
+        ("dgut", "POST", "/api/v2/learnQuestion/getQuestionAnswer", 30),
+        ("dgut", "POST", "/learnQuestion/getQuestionAnswer", 30),
+        ("legacy", "GET", "/uaapi/questionAnswer/{question_id}?parentId={parent_id}", 10),
+        ("legacy", "GET", "/questionAnswer/{question_id}?parentId={parent_id}", 10),
+    ],
+}
+
+# api_version 对应的可用路由类型
+ROUTE_KINDS = {
+    "auto": ("dgut", "legacy"),
+    "new": ("dgut",),
+    "old": ("legacy",),
+}
+
+
+def _convert_legacy_response(response: Any) -> Dict:
+    """将旧版优学院接口响应转换为统一格式（与 APIAdapter 的旧API转换一致）"""
+    if not response:
+        return {"success": False, "message": "API请求失败", "data": None}
+    if isinstance(response, dict) and "data" in response:
+        return {"success": True, "message": "请求成功", "data": response["data"]}
+    return {"success": True, "message": "请求成功", "data": response}
+
+
+class AsyncUlearningClient:
+    """优学院异步API客户端，所有请求共享一个连接池并由信号量限制并发"""
+
+    def __init__(self, base_url: str = None, authorization_token: str = None,
+                 ua_authorization_token: str = None, api_version: str = "auto",
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        """
+        初始化异步客户端
+
+        Args:
+            base_url: API基础URL
+            authorization_token: 授权令牌
+            ua_authorization_token: UA授权令牌
+            api_version: API版本，可选值为 "auto"(自动回退), "new"(仅DGUT接口), "old"(仅旧版接口)
+            max_concurrency: 同时在途的最大请求数
+        """
+        if aiohttp is None:
+            raise ImportError("AsyncUlearningClient 需要 aiohttp，请先执行 pip install aiohttp")
+        if api_version not in ROUTE_KINDS:
+            raise ValueError(f"不支持的API版本: {api_version}")
+
+        self.base_url = (base_url or os.getenv("BASE_API_URL", "https://ua.ulearning.cn")).rstrip("/")
+        self.authorization_token = authorization_token or os.getenv("AUTHORIZATION_TOKEN")
+        self.ua_authorization_token = ua_authorization_token or os.getenv("UA_AUTHORIZATION_TOKEN", "18016158863D724D29B3334BD9853C36")
+        self.api_version = api_version
+        self.max_concurrency = max_concurrency
+        self.headers = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+            "Accept": "application/json, text/plain, */*",
+            "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
+            "authorization": self.authorization_token or "",
+            "ua-authorization": self.ua_authorization_token or "",
+            "Origin": self.base_url,
+            "Referer": f"{self.base_url}/"
+        }
+        self.session = None
+        self._semaphore = None
+        # 每个端点最近一次成功的路由序号，后续请求直接从该路由开始
+        self._preferred_route: Dict[str, int] = {}
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        """创建 aiohttp 会话（需在事件循环内调用）"""
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, limit_per_host=self.max_concurrency)
+            self.session = aiohttp.ClientSession(headers=self.headers, connector=connector)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def close(self):
+        """关闭会话"""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def _make_request(self, method: str, path: str, payload: Optional[Dict] = None,
+                            timeout: float = 15) -> Optional[Any]:
+        """
+        发送单个请求
+
+        Args:
+            method: HTTP方法
+            path: 请求路径（可含查询参数）
+            payload: POST 请求的 JSON 体
+            timeout: 超时时间（秒）
+
+        Returns:
+            解析后的JSON，失败返回 None
+        """
+        if self.session is None:
+            await self.open()
+        url = f"{self.base_url}{path}"
+        if VERBOSE_REQUESTS:
+            print(f"Making {method} request to: {url}")
+        client_timeout = aiohttp.ClientTimeout(total=timeout)
+        try:
+            async with self._semaphore:
+                if method == "GET":
+                    request = self.session.get(url, timeout=client_timeout)
+                else:
+                    request = self.session.post(url, json=payload or {}, timeout=client_timeout)
+                async with request as response:
+                    response.raise_for_status()
+                    text = await response.text()
+            try:
+                return json.loads(text)
+            except json.JSONDecodeError:
+                return {"data": text, "status_code": response.status}
+        except aiohttp.ClientResponseError as e:
+            print(f"HTTP Error: {e.status} {e.message} ({url})")
+            return None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"Request failed: {e!r} ({url})")
+            return None
+
+    async def _request_with_fallback(self, endpoint_name: str, path_params: Dict,
+                                     payload: Dict) -> Dict:
+        """
+        按路由顺序请求端点，直到获得成功响应
+
+        Args:
+            endpoint_name: 端点名称
+            path_params: 填充旧版路径的参数
+            payload: DGUT 接口的 JSON 体
+
+        Returns:
+            统一格式的响应数据
+        """
+        allowed_kinds = ROUTE_KINDS[self.api_version]
+        routes = [(idx, route) for idx, route in enumerate(ENDPOINT_ROUTES[endpoint_name])
+                  if route[0] in allowed_kinds]
+        preferred = self._preferred_route.get(endpoint_name)
+        if preferred is not None:
+            routes.sort(key=lambda item: item[0] != preferred)
+
+        result = {"success": False, "message": "API请求失败", "data": None}
+        for idx, (kind, method, path_template, timeout) in routes:
+            path = path_template.format(**path_params)
+            response = await self._make_request(method, path, payload if kind == "dgut" else None, timeout)
+            if kind == "dgut":
+                result = normalize_response(response)
+            else:
+                result = _convert_legacy_response(response)
+            if result.get("success"):
+                self._preferred_route[endpoint_name] = idx
+                return result
+        return result
+
+    async def get_course_directory(self, course_id: str, class_id: str) -> Dict:
+        """
+        获取课程目录
+
+        Args:
+            course_id: 课程ID
+            class_id: 班级ID
+
+        Returns:
+            统一格式的课程目录数据
+        """
+        return await self._request_with_fallback(
+            "course_directory",
+            {"course_id": course_id, "class_id": class_id},
+            {"courseId": course_id, "classId": class_id},
+        )
+
+    async def get_whole_chapter_page_content(self, node_id: str) -> Dict:
+        """
+        获取整个章节页面内容
+
+        Args:
+            node_id: 节点ID
+
+        Returns:
+            统一格式的章节内容数据
+        """
+        return await self._request_with_fallback(
+            "chapter_content", {"node_id": node_id}, {"nodeId": node_id}
+        )
+
+    async def get_question_answer(self, question_id: str, parent_id: str) -> Dict:
+        """
+        获取题目答案
+
+        Args:
+            question_id: 题目ID
+            parent_id: 父级ID
+
+        Returns:
+            统一格式的题目答案数据
+        """
+        return await self._request_with_fallback(
+            "question_answer",
+            {"question_id": question_id, "parent_id": parent_id},
+            {"questionId": question_id, "parentId": parent_id},
+        )
+
+
+def _iter_question_units(chapter_content: Optional[Dict]):
+    """遍历章节内 contentType == 7 的练习单元，产出 (parent_id, 题目ID列表)"""
+    for item_dto in (chapter_content or {}).get("wholepageItemDTOList", []) or []:
+        for wholepage_dto in item_dto.get("wholepageDTOList", []) or []:
+            if wholepage_dto.get("contentType") != 7:
+                continue
+            question_ids = []
+            for coursepage in wholepage_dto.get("coursepageDTOList", []) or []:
+                for q_data in coursepage.get("questionDTOList") or []:
+                    if q_data.get("questionid") is not None:
+                        question_ids.append(q_data.get("questionid"))
+            yield wholepage_dto.get("id"), question_ids
+
+
+async def _crawl_chapter(client: AsyncUlearningClient, chapter: Dict) -> Dict:
+    """抓取单个章节的内容及其全部题目答案"""
+    node_id = chapter.get("nodeid")
+    response = await client.get_whole_chapter_page_content(node_id)
+    content = response.get("data") if response.get("success") else None
+
+    keys: List[Tuple[Any, Any]] = []
+    for parent_id, question_ids in _iter_question_units(content):
+        keys.extend((parent_id, question_id) for question_id in question_ids)
+    keys = list(dict.fromkeys(keys))
+
+    answer_responses = await asyncio.gather(
+        *(client.get_question_answer(question_id, parent_id) for parent_id, question_id in keys)
+    )
+    answers = {
+        key: (response.get("data") if response.get("success") else None)
+        for key, response in zip(keys, answer_responses)
+    }
+    return {"chapter": chapter, "content": content, "answers": answers}
+
+
+async def crawl_course(client: AsyncUlearningClient, course_id: str, class_id: str,
+                       chapter_ids: Optional[Iterable[Any]] = None) -> Optional[Dict]:
+    """
+    在当前事件循环内抓取整门课程：目录、所选章节内容以及全部题目答案
+
+    Args:
+        client: 已打开的异步客户端
+        course_id: 课程ID
+        class_id: 班级ID
+        chapter_ids: 需要抓取的章节 nodeid，为空时抓取全部
+
+    Returns:
+        {"directory": 目录数据, "chapters": [{"chapter", "content", "answers"}]}，
+        其中 answers 以 (parent_id, question_id) 为键；目录获取失败返回 None
+    """
+    response = await client.get_course_directory(course_id, class_id)
+    directory_data = response.get("data") if response.get("success") else None
+    if not directory_data:
+        print(f"Failed to fetch course directory for course {course_id}.")
+        return None
+
+    wanted = {str(chapter_id) for chapter_id in chapter_ids} if chapter_ids else None
+    chapters = [
+        chapter for chapter in directory_data.get("chapters", []) or []
+        if chapter.get("nodeid") and (wanted is None or str(chapter.get("nodeid")) in wanted)
+    ]
+    crawled = await asyncio.gather(*(_crawl_chapter(client, chapter) for chapter in chapters))
+    return {"directory": directory_data, "chapters": list(crawled)}
+
+
+async def export_courses_async(courses: Iterable[Tuple[str, str]], **client_kwargs) -> List[Optional[Dict]]:
+    """
+    在同一个事件循环中并发抓取多门课程
+
+    Args:
+        courses: (course_id, class_id) 列表
+        **client_kwargs: 传给 AsyncUlearningClient 的参数
+
+    Returns:
+        与输入顺序一致的 crawl_course 结果列表
+    """
+    async with AsyncUlearningClient(**client_kwargs) as client:
+        return await asyncio.gather(
+            *(crawl_course(client, course_id, class_id) for course_id, class_id in courses)
+        )
+
+
+def export_course(course_id: str, class_id: str, **client_kwargs) -> Optional[Dict]:
+    """同步入口：运行事件循环抓取单门课程"""
+    return asyncio.run(export_courses_async([(course_id, class_id)], **client_kwargs))[0]
@@ -0,0 +1,277 @@
+"""
+批量导出模块
+按清单（CSV 或 JSON）导出多门课程：每门课程在独立的进程中运行，不会出现任何交互提示，
+输出写入各自的日志文件，全部完成后打印吞吐量和失败汇总
+
+用法:
+    python batch_export.py courses.csv --formats md,tex,json,shuati --workers 4
+
+清单字段（CSV 表头或 JSON 对象的键）:
+    course_id, class_id      必填
+    token                    授权令牌，缺省时使用 --token 或 .env 中的 AUTHORIZATION_TOKEN
+    ua_token                 UA 授权令牌，可选
+    chapters                 专题选择，如 "1,3,5"、"2-4"，缺省导出全部
+    formats                  该课程的导出格式（course_extractor.EXPORT_FORMATS），缺省使用 --formats
+    question_info            是否保存每道题的 question_info.txt（y/n），缺省使用 --question-info
+    name                     日志和汇总中显示的名称，可选
+"""
+
+import argparse
+import contextlib
+import csv
+import importlib
+import json
+import os
+import re
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from course_extractor import EXPORT_FORMATS, parse_formats
+
+# 默认导出格式（与分别运行两个导出脚本的结果相同），同一门课程的全部格式由一次遍历生成
+DEFAULT_BATCH_FORMATS = "md,tex,json,shuati"
+DEFAULT_BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+
+_TRUE_VALUES = ("1", "y", "yes", "true")
+
+
+
+def load_manifest(path: str) -> List[Dict[str, str]]:
+    """
+    读取课程清单
+
+    Args:
+        path: .csv 文件，或 .json 文件（对象列表，或 {"courses": [...]}）
+
+    Returns:
+        每门课程一个字典，键已转为小写
+    """
+    if path.lower().endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get("courses", [])
+        rows = [{str(key): "" if value is None else str(value) for key, value in row.items()} for row in data]
+    else:
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            rows = list(csv.DictReader(f))
+    return [{key.strip().lower(): (value or "").strip() for key, value in row.items() if key} for row in rows]
+
+
+def build_jobs(rows: List[Dict[str, str]], args) -> List[Dict[str, Any]]:
+    """
+    把清单行与命令行默认值合并为导出任务
+
+    课程输出目录只由 course_id 决定（course_<id>_<课程名>），同一课程出现多次（即使班级不同）时
+    多个进程会同时写入同一个目录和检查点日志，因此视为错误；同名任务会写入同一个日志，同样视为错误
+
+    Raises:
+        ValueError: 缺少必填字段，或课程/名称重复
+    """
+    jobs = []
+    course_lines: Dict[str, int] = {}
+    name_lines: Dict[str, int] = {}
+    for line, row in enumerate(rows, 1):
+        course_id = row.get("course_id") or row.get("courseid")
+        class_id = row.get("class_id") or row.get("classid")
+        token = row.get("token") or row.get("authorization_token") or args.token
+        if not course_id or not class_id or not token:
+            raise ValueError(f"清单第 {line} 行缺少 course_id、class_id 或 token")
+        if course_id in course_lines:
+            raise ValueError(f"清单第 {line} 行的课程 {course_id} 与第 {course_lines[course_id]} 行重复，"
+                             f"两者会写入同一个输出目录；同一课程的不同班级请分批导出")
+        course_lines[course_id] = line
+        name = row.get("name") or f"course_{course_id}_{class_id}"
+        log_name = os.path.basename(_log_path("", {"name": name}))
+        if log_name in name_lines:
+            raise ValueError(f"清单第 {line} 行的名称 {name!r} 与第 {name_lines[log_name]} 行使用同一个日志文件")
+        name_lines[log_name] = line
+        question_info = row.get("question_info")
+        jobs.append({
+            "name": name,
+            "course_id": course_id,
+            "class_id": class_id,
+            "token": token,
+            "ua_token": row.get("ua_token") or row.get("ua_authorization_token") or None,
+            "chapters": row.get("chapters") or args.chapters,
+            "formats": parse_formats(row.get("formats") or args.formats),
+            "question_info": question_info.lower() in _TRUE_VALUES if question_info else args.question_info,
+        })
+    return jobs
+
+
+def _log_path(log_dir: str, job: Dict[str, Any]) -> str:
+    return os.path.join(log_dir, re.sub(r'[<>:"/\\|?*\s]+', "_", job["name"]) + ".log")
+
+
+def run_course_export(job: Dict[str, Any], options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    在当前进程中导出一门课程（由进程池调用，每个进程只执行一个任务）
+
+    导出脚本在导入时读取 COURSE_ID 等环境变量，所以先设置环境变量再导入；所有输出写入课程日志
+
+    Returns:
+        {"name", "course_id", "class_id", "status": "ok"/"failed", "error", "questions", "formats", "seconds", "log",
+         "metrics"}
+    """
+    os.makedirs(options["log_dir"], exist_ok=True)
+    log_path = _log_path(options["log_dir"], job)
+    result = {"name": job["name"], "course_id": job["course_id"], "class_id": job["class_id"], "status": "failed",
+              "error": None, "questions": 0, "formats": {}, "seconds": 0.0, "log": log_path,
+              "metrics": None}
+    os.environ.update({
+        "COURSE_ID": job["course_id"],
+        "CLASS_ID": job["class_id"],
+        "AUTHORIZATION_TOKEN": job["token"],
+        "BASE_OUTPUT_DIR": options["output_dir"],
+    })
+    if job["ua_token"]:
+        os.environ["UA_AUTHORIZATION_TOKEN"] = job["ua_token"]
+    if options["cache_db"]:
+        os.environ["RESPONSE_CACHE_DB"] = options["cache_db"]
+
+    started = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8", buffering=1) as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            # 所有格式共用一次课程遍历：目录、专题、答案只请求一遍
+            print(f"=== {job['name']}: 导出 {', '.join(job['formats'])} ===")
+            exporter = importlib.import_module("ulearning_course_export")
+            summary = exporter.process_courseware_questions(
+                answer_workers=options["answer_workers"], resume=options["resume"],
+                pipeline_depth=options["pipeline_depth"], save_question_info=job["question_info"],
+                chapter_selection=job["chapters"] or "all", formats=job["formats"],
+                stream=options["stream"])
+            if summary is None:
+                raise RuntimeError("导出未完成，详见日志")
+            result["formats"] = {fmt: summary["questions"] for fmt in job["formats"]}
+            result["questions"] = summary["questions"]
+            result["status"] = "ok"
+        except Exception as e:
+            traceback.print_exc()
+            result["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            result["seconds"] = round(time.perf_counter() - started, 3)
+            result["metrics"] = _write_run_metrics(job, log_path, options)
+    return result
+
+
+def _write_run_metrics(job: Dict[str, Any], log_path: str, options: Dict[str, Any]) -> Optional[str]:
+    """把运行统计写入课程日志，请求指标写到日志旁边（<日志名>.metrics.json，可选 .prom），返回 JSON 报告路径"""
+    from run_metrics import report_run_stats
+
+    base_path = os.path.splitext(log_path)[0]
+    report_path = base_path + ".metrics.json"
+    written = report_run_stats({"script": "batch_export", "course_id": job["course_id"], "class_id": job["class_id"]},
+                               report_path, base_path + ".prom" if options["prometheus"] else None)
+    return report_path if report_path in written else None
+
+
+def format_summary(results: List[Dict[str, Any]], elapsed: float) -> str:
+    """生成批量导出的汇总：成功/失败数、题目吞吐量和失败课程的日志位置"""
+    succeeded = [result for result in results if result["status"] == "ok"]
+    failed = [result for result in results if result["status"] != "ok"]
+    questions = sum(result["questions"] for result in succeeded)
+    lines = [
+        f"批量导出完成: {len(succeeded)}/{len(results)} 门课程成功, 失败 {len(failed)} 门, 用时 {elapsed:.1f}s",
+        f"吞吐量: {questions} 道题, {questions / elapsed if elapsed > 0 else 0:.1f} 题/s, "
+        f"{len(results) / elapsed * 60 if elapsed > 0 else 0:.1f} 门课程/分钟",
+    ]
+    for result in failed:
+        lines.append(f"  失败 {result['name']} (课程 {result['course_id']}, 班级 {result['class_id']}): "
+                     f"{result['error']}，日志: {result['log']}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="按清单批量导出优学院课程（非交互，多进程）")
+    parser.add_argument("manifest", help="课程清单：CSV 文件或 JSON 文件")
+    parser.add_argument("--formats", default=DEFAULT_BATCH_FORMATS,
+                        help=f"导出格式，逗号分隔，可选 {', '.join(EXPORT_FORMATS)} (默认: {DEFAULT_BATCH_FORMATS})")
+    parser.add_argument("--chapters", default=None,
+                        help="默认的专题选择，如 1,3,5 或 2-4 (默认: 全部)")
+    parser.add_argument("--question-info", action="store_true",
+                        help="默认为每道题保存 question_info.txt")
+    parser.add_argument("--token", default=os.getenv("AUTHORIZATION_TOKEN"),
+                        help="清单中未给出 token 时使用的授权令牌 (默认: .env 中的 AUTHORIZATION_TOKEN)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_BATCH_WORKERS,
+                        help=f"同时导出的课程数（进程数） (默认: {DEFAULT_BATCH_WORKERS})")
+    parser.add_argument("--output-dir", default=os.getenv("BASE_OUTPUT_DIR", "ulearning_courseware_exports"),
+                        help="输出根目录 (默认: .env 中的 BASE_OUTPUT_DIR 或 ulearning_courseware_exports)")
+    parser.add_argument("--log-dir", default=None,
+                        help="每门课程的日志目录 (默认: <输出根目录>/batch_logs)")
+    parser.add_argument("--summary-json", default=None,
+                        help="把每门课程的结果和汇总写入该 JSON 文件")
+    parser.add_argument("--answer-workers", type=int, default=None,
+                        help="每门课程并发获取答案的线程数 (默认与单课程导出相同)")
+    parser.add_argument("--pipeline-depth", type=int, default=None,
+                        help="每门课程后台提前获取的章节/单元数 (默认与单课程导出相同)")
+    parser.add_argument("--cache-db", default=os.getenv("RESPONSE_CACHE_DB"),
+                        help="所有课程共用的 SQLite 响应缓存文件")
+    parser.add_argument("--stream", action="store_true",
+                        help="JSON 导出逐题写出，不在内存中保留整门课程")
+    parser.add_argument("--resume", action="store_true",
+                        help="从各课程输出目录中的检查点日志继续上次中断的导出")
+    parser.add_argument("--prometheus", action="store_true",
+                        help="除每门课程的 <日志名>.metrics.json 外，再写出 Prometheus 文本格式的 <日志名>.prom")
+    args = parser.parse_args(argv)
+
+    try:
+        args.formats = ",".join(parse_formats(args.formats))
+        jobs = build_jobs(load_manifest(args.manifest), args)
+    except (OSError, ValueError) as e:
+        print(f"错误：{e}")
+        return 2
+    if not jobs:
+        print("清单中没有课程。")
+        return 0
+
+    from answer_fetcher import DEFAULT_ANSWER_WORKERS
+    from pipeline import DEFAULT_PIPELINE_DEPTH
+    options = {
+        "output_dir": args.output_dir,
+        "log_dir": args.log_dir or os.path.join(args.output_dir, "batch_logs"),
+        "answer_workers": args.answer_workers if args.answer_workers is not None else DEFAULT_ANSWER_WORKERS,
+        "pipeline_depth": args.pipeline_depth if args.pipeline_depth is not None else DEFAULT_PIPELINE_DEPTH,
+        "cache_db": args.cache_db,
+        "stream": args.stream,
+        "resume": args.resume,
+        "prometheus": args.prometheus,
+    }
+    workers = max(1, min(args.workers, len(jobs)))
+    print(f"批量导出 {len(jobs)} 门课程, {workers} 个进程, 日志目录: {options['log_dir']}")
+
+    results = []
+    started = time.perf_counter()
+    # 每个进程只导出一门课程：导出脚本的配置和全局客户端在导入时按该课程的环境变量创建
+    with ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=1) as executor:
+        futures = {executor.submit(run_course_export, job, options): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # 子进程意外退出等，run_course_export 自身的异常已在进程内处理
+                result = {"name": job["name"], "course_id": job["course_id"], "class_id": job["class_id"],
+                          "status": "failed", "error": f"{type(e).__name__}: {e}", "questions": 0, "formats": {},
+                          "seconds": 0.0, "log": _log_path(options["log_dir"], job), "metrics": None}
+            results.append(result)
+            status = f"{result['questions']} 道题" if result["status"] == "ok" else f"失败 ({result['error']})"
+            print(f"[{len(results)}/{len(jobs)}] {result['name']}: {status}, {result['seconds']:.1f}s")
+    elapsed = time.perf_counter() - started
+
+    print(format_summary(results, elapsed))
+    if args.summary_json:
+        with open(args.summary_json, "w", encoding="utf-8") as f:
+            json.dump({"elapsed": round(elapsed, 3), "courses": results}, f, ensure_ascii=False, indent=2)
+    return 0 if all(result["status"] == "ok" for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
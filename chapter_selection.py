@@ -0,0 +1,42 @@
+"""
+专题选择模块
+解析 "1,3,5"、"2-4"、"all" 形式的专题选择，交互式导出和批量导出共用同一套规则
+"""
+
+from typing import Any, Dict, List, Optional
+
+
+def select_chapters(chapters: List[Dict[str, Any]], selection: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    按选择字符串从课程目录的专题列表中选出要导出的专题
+
+    Args:
+        chapters: 课程目录中的专题列表
+        selection: 逗号分隔的序号（从 1 开始）或序号范围（如 2-4），"all" 或空字符串表示全部
+
+    Returns:
+        选中的专题列表，按输入顺序排列
+
+    Raises:
+        ValueError: 输入无效或序号超出范围，异常信息可直接展示给用户
+    """
+    selection = (selection or "").strip().lower()
+    if not selection or selection == "all":
+        return list(chapters)
+
+    selected = []
+    for part in selection.split(","):
+        part = part.strip()
+        try:
+            if "-" in part:
+                start, end = (int(value.strip()) for value in part.split("-", 1))
+                indices = range(start, end + 1)
+            else:
+                indices = [int(part)]
+        except ValueError:
+            raise ValueError("输入无效，请输入数字序号或 'all'。") from None
+        for index in indices:
+            if not 1 <= index <= len(chapters):
+                raise ValueError(f"错误：序号 {index} 无效。")
+            selected.append(chapters[index - 1])
+    return selected
@@ -0,0 +1,165 @@
+"""
+导出检查点模块
+在课程输出目录中维护只追加的 JSONL 日志，记录每道已处理题目的规范化结果以及单元/专题的完成状态，
+中断后使用 --resume 重新运行即可跳过已完成的部分，并从日志重建汇总输出
+"""
+
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+
+class CheckpointJournal:
+    """只追加的导出检查点日志"""
+
+    def __init__(self, course_output_dir: str, name: str, resume: bool = False):
+        """
+        打开检查点日志
+
+        Args:
+            course_output_dir: 课程输出目录
+            name: 日志名称，不同导出脚本使用不同名称（如 "md_tex"、"json"）
+            resume: 为 True 时加载已有日志继续追加；否则清空重新开始
+        """
+        self.path = os.path.join(course_output_dir, f".{name}_journal.jsonl")
+        self._lock = threading.Lock()
+        self._records: List[Dict[str, Any]] = []
+        self._questions: Dict[tuple, Dict[str, Any]] = {}
+        self._units_started = set()
+        self._units_done = set()
+        self._chapters_done = set()
+
+        os.makedirs(course_output_dir, exist_ok=True)
+        if resume:
+            self._load()
+            if self._records:
+                print(f"从检查点恢复: 已完成 {len(self._chapters_done)} 个专题, {len(self._questions)} 道题目 ({self.path})")
+        self._file = open(self.path, "a" if resume else "w", encoding="utf-8")
+
+    def _load(self):
+        """读取已有日志，忽略中断时写了一半的最后一行"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self._index(record)
+
+    def _index(self, record: Dict[str, Any]):
+        """将记录加入内存索引"""
+        self._records.append(record)
+        record_type = record.get("type")
+        chapter_id = record.get("chapter")
+        unit_id = record.get("unit")
+        if record_type == "question":
+            self._questions.setdefault((chapter_id, unit_id, record.get("question")), record["result"])
+        elif record_type == "unit":
+            self._units_started.add((chapter_id, unit_id))
+        elif record_type == "unit_done":
+            self._units_done.add((chapter_id, unit_id))
+        elif record_type == "chapter_done":
+            self._chapters_done.add(chapter_id)
+
+    def _append(self, record: Dict[str, Any]):
+        """追加一条记录并立即刷新到磁盘"""
+        with self._lock:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+            self._index(record)
+
+    def start_unit(self, chapter_id: Any, unit_id: Any, title: str):
+        """记录单元开始（同一单元只记录一次）"""
+        chapter_id, unit_id = str(chapter_id), str(unit_id)
+        if (chapter_id, unit_id) not in self._units_started:
+            self._append({"type": "unit", "chapter": chapter_id, "unit": unit_id, "title": title})
+
+    def record_question(self, chapter_id: Any, unit_id: Any, question_id: Any, result: Dict[str, Any]):
+        """记录一道题目的规范化结果"""
+        self._append({
+            "type": "question", "chapter": str(chapter_id), "unit": str(unit_id),
+            "question": str(question_id), "result": result
+        })
+
+    def mark_unit_done(self, chapter_id: Any, unit_id: Any):
+        """标记单元完成"""
+        chapter_id, unit_id = str(chapter_id), str(unit_id)
+        if (chapter_id, unit_id) not in self._units_done:
+            self._append({"type": "unit_done", "chapter": chapter_id, "unit": unit_id})
+
+    def mark_chapter_done(self, chapter_id: Any):
+        """标记专题完成"""
+        chapter_id = str(chapter_id)
+        if chapter_id not in self._chapters_done:
+            self._append({"type": "chapter_done", "chapter": chapter_id})
+
+    def get_question(self, chapter_id: Any, unit_id: Any, question_id: Any) -> Optional[Dict[str, Any]]:
+        """获取已记录的题目结果，未记录返回 None"""
+        return self._questions.get((str(chapter_id), str(unit_id), str(question_id)))
+
+    def is_unit_done(self, chapter_id: Any, unit_id: Any) -> bool:
+        return (str(chapter_id), str(unit_id)) in self._units_done
+
+    def is_chapter_done(self, chapter_id: Any) -> bool:
+        return str(chapter_id) in self._chapters_done
+
+    def chapter_records(self, chapter_id: Any) -> List[Dict[str, Any]]:
+        """按写入顺序返回某个专题的单元和题目记录，用于重放已完成的专题"""
+        chapter_id = str(chapter_id)
+        seen_questions = set()
+        records = []
+        for record in self._records:
+            if record.get("chapter") != chapter_id or record.get("type") not in ("unit", "question"):
+                continue
+            if record["type"] == "question":
+                key = (record.get("unit"), record.get("question"))
+                if key in seen_questions:
+                    continue
+                seen_questions.add(key)
+            records.append(record)
+        return records
+
+    def close(self):
+        """关闭日志文件"""
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+class NullJournal:
+    """不落盘的检查点日志：接口与 CheckpointJournal 相同，不记录任何内容，用于只在内存中遍历课程"""
+
+    path = None
+
+    def start_unit(self, chapter_id: Any, unit_id: Any, title: str):
+        pass
+
+    def record_question(self, chapter_id: Any, unit_id: Any, question_id: Any, result: Dict[str, Any]):
+        pass
+
+    def mark_unit_done(self, chapter_id: Any, unit_id: Any):
+        pass
+
+    def mark_chapter_done(self, chapter_id: Any):
+        pass
+
+    def get_question(self, chapter_id: Any, unit_id: Any, question_id: Any) -> Optional[Dict[str, Any]]:
+        return None
+
+    def is_unit_done(self, chapter_id: Any, unit_id: Any) -> bool:
+        return False
+
+    def is_chapter_done(self, chapter_id: Any) -> bool:
+        return False
+
+    def chapter_records(self, chapter_id: Any) -> List[Dict[str, Any]]:
+        return []
+
+    def close(self):
+        pass
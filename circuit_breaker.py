@@ -0,0 +1,143 @@
+"""
+熔断器模块
+按最近若干次请求的错误率判断后端是否健康：错误率超过阈值时熔断（open），冷却期内不再把请求发往该后端；
+冷却结束后进入半开（half-open）状态，只放行一个探测请求，成功则恢复（closed），失败则重新熔断
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+# 统计错误率的最近请求数
+DEFAULT_BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "20"))
+# 熔断的错误率阈值
+DEFAULT_BREAKER_ERROR_RATE = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))
+# 窗口内至少有多少次请求才计算错误率
+DEFAULT_BREAKER_MIN_REQUESTS = int(os.getenv("BREAKER_MIN_REQUESTS", "5"))
+# 熔断后的冷却时间（秒），之后放行一个探测请求
+DEFAULT_BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "30"))
+
+# 熔断器状态
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# 延迟的指数移动平均系数
+_LATENCY_ALPHA = 0.2
+
+
+class CircuitBreaker:
+    """单个后端（或端点）的熔断器，线程安全"""
+
+    def __init__(self, name: str, window: int = DEFAULT_BREAKER_WINDOW, error_rate: float = DEFAULT_BREAKER_ERROR_RATE,
+                 min_requests: int = DEFAULT_BREAKER_MIN_REQUESTS, cooldown: float = DEFAULT_BREAKER_COOLDOWN,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            name: 名称，用于日志
+            window: 统计错误率的最近请求数
+            error_rate: 熔断的错误率阈值
+            min_requests: 窗口内请求数达到该值后才可能熔断
+            cooldown: 熔断后的冷却时间（秒）
+            clock: 时钟函数
+        """
+        self.name = name
+        self.error_rate_threshold = error_rate
+        self.min_requests = max(1, min_requests)
+        self.cooldown = cooldown
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=max(1, window))
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._latency: Optional[float] = None
+        self._stats = {"successes": 0, "failures": 0, "opened": 0, "rejected": 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        """冷却结束的熔断状态视为半开（调用方持有锁）"""
+        if self._state == OPEN and self._clock() - self._opened_at >= self.cooldown:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def available(self) -> bool:
+        """当前是否会放行请求（不占用半开状态的探测名额）"""
+        with self._lock:
+            state = self._current_state()
+            return state == CLOSED or (state == HALF_OPEN and not self._probe_in_flight)
+
+    def allow_request(self) -> bool:
+        """是否放行一次请求；半开状态下只放行一个探测请求"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self._stats["rejected"] += 1
+            return False
+
+    def record_success(self, latency: Optional[float] = None):
+        """记录一次成功（latency 为耗时秒数）"""
+        with self._lock:
+            self._stats["successes"] += 1
+            if latency is not None:
+                self._latency = latency if self._latency is None else \
+                    self._latency + (latency - self._latency) * _LATENCY_ALPHA
+            if self._current_state() == HALF_OPEN:
+                print(f"  熔断器 {self.name}: 探测成功，恢复")
+                self._state = CLOSED
+                self._probe_in_flight = False
+                self._outcomes.clear()
+            self._outcomes.append(True)
+
+    def record_failure(self):
+        """记录一次失败"""
+        with self._lock:
+            self._stats["failures"] += 1
+            state = self._current_state()
+            if state == HALF_OPEN:
+                self._open("探测失败")
+                return
+            self._outcomes.append(False)
+            if state == CLOSED and len(self._outcomes) >= self.min_requests \
+                    and self._error_rate() >= self.error_rate_threshold:
+                self._open(f"错误率 {self._error_rate():.0%}")
+
+    def _open(self, reason: str):
+        self._state = OPEN
+        self._opened_at = self._clock()
+        self._probe_in_flight = False
+        self._stats["opened"] += 1
+        print(f"  熔断器 {self.name}: 熔断 {self.cooldown:.0f}s ({reason})")
+
+    def _error_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return sum(1 for ok in self._outcomes if not ok) / len(self._outcomes)
+
+    @property
+    def latency(self) -> Optional[float]:
+        """成功请求耗时的移动平均（秒），尚无样本时为 None"""
+        with self._lock:
+            return self._latency
+
+    def snapshot(self) -> Dict[str, Any]:
+        """状态、最近错误率、平均延迟及累计次数"""
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot.update({
+                "state": self._current_state(),
+                "error_rate": round(self._error_rate(), 3),
+                "latency": round(self._latency, 4) if self._latency is not None else None,
+            })
+        return snapshot
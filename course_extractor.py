@@ -0,0 +1,735 @@
+"""
+课程抽取引擎
+只遍历一次课程（目录 → 专题 → 题目单元 → 题目 → 答案），把每道题规范化后分发给选中的导出目标：
+Markdown、TeX、question_info.txt、完整 JSON 和刷题 JSON。所有格式共用同一轮网络请求、同一组预取流水线和同一个检查点日志，
+一次运行即可得到全部格式，而不必为每种格式各爬一遍课程。
+iter_course_questions() 以生成器形式逐题产出同样的结果，不写文件，供其他程序直接使用
+"""
+
+import json
+import os
+import re
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from answer_fetcher import DEFAULT_ANSWER_WORKERS, collect_unit_question_ids, fetch_question_answers
+from chapter_selection import select_chapters
+from checkpoint import CheckpointJournal, NullJournal
+from export_sinks import JsonArraySink, JsonLinesSink, MarkdownSink, TexSink, render_question_info
+from pipeline import DEFAULT_PIPELINE_DEPTH, PipelineStats, SpeculativeFetcher, prefetch
+from question_ir import QuestionRecord, build_question_record
+from shuati_format import build_platform_entry, build_shuati_entry, generate_json_output
+
+# 题目的两种规范化形式：RECORD（QuestionRecord）供 Markdown/TeX/question_info.txt 使用，PLATFORM 为刷题平台完整条目
+RECORD = "record"
+PLATFORM = "platform"
+
+# 等待用户选择专题时推测性预取的专题数（目录中的前 N 个），以及是否同时预取这些专题的答案
+DEFAULT_SPECULATIVE_CHAPTERS = int(os.getenv("SPECULATIVE_CHAPTERS", "4"))
+DEFAULT_SPECULATIVE_ANSWERS = os.getenv("SPECULATIVE_ANSWERS", "0").lower() in ("1", "true", "yes")
+
+# 检查点日志名称；只需一种形式时沿用原来两个脚本的日志名和格式，可以继续旧版本中断的导出
+_JOURNAL_NAMES = {(RECORD,): "md_tex", (PLATFORM,): "json", (RECORD, PLATFORM): "md_tex_json"}
+
+
+def sanitize_filename(filename):
+    if filename is None: filename = "untitled"
+    filename = str(filename)
+    filename = re.sub(r'[<>:"/\\|?*]', '_', filename)
+    filename = re.sub(r'\s+', '_', filename)
+    filename = re.sub(r'_+', '_', filename)
+    filename = filename.strip('_')
+    return filename[:100]
+
+
+def _question_units(chapter_content: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """专题内容中的题目单元（contentType == 7）"""
+    return [
+        wholepage_dto
+        for item_dto in chapter_content.get("wholepageItemDTOList", [])
+        for wholepage_dto in item_dto.get("wholepageDTOList", [])
+        if wholepage_dto.get("contentType") == 7  # Question set
+    ]
+
+
+# --- 导出目标 ---
+
+class ExportSink:
+    """
+    导出目标基类，按需覆盖各个回调
+
+    form 决定 question() 收到的题目形式（RECORD 或 PLATFORM）；context 含课程/专题/单元信息
+    （course_output_dir, course_name_raw, chapter_title_raw, unit_title_raw, parent_id 等）。
+    """
+
+    form = RECORD
+
+    def start(self, course: Dict[str, Any]):
+        """第一个专题之前调用，course 为 CourseExtractor.open_course() 的返回值"""
+
+    def chapter(self, title: str):
+        pass
+
+    def unit(self, title: str):
+        pass
+
+    def question(self, question: Any, context: Dict[str, Any]):
+        pass
+
+    def end_chapter(self, question_count: int, last: bool):
+        """一个专题处理完毕；question_count 为该专题的题目数，last 表示是否为最后一个选中的专题"""
+
+    def close(self):
+        """导出成功结束"""
+
+    def abort(self):
+        """异常退出时调用，保留已写入的部分"""
+
+
+class _AggregateExport(ExportSink):
+    """汇总文件 <课程名>_课件题目.<扩展名>，包装 export_sinks 中的 MarkdownSink / TexSink"""
+
+    sink_class = None
+    extension = ""
+    label = ""
+
+    def __init__(self):
+        self.path = None
+        self._sink = None
+
+    def start(self, course):
+        self.path = os.path.join(course["output_dir"], f"{course['sanitized_name']}_课件题目.{self.extension}")
+        self._sink = self.sink_class(self.path, course["name"])
+
+    def chapter(self, title):
+        self._sink.chapter(title)
+
+    def unit(self, title):
+        self._sink.unit(title)
+
+    def question(self, record, context):
+        self._sink.question(record, context["course_output_dir"])
+
+    def end_chapter(self, question_count, last):
+        if question_count == 0 and last:
+            self._sink.note(f"在选定专题中未找到练习题。\n\n")
+        self._sink.flush()
+
+    def close(self):
+        self._sink.close()
+        print(f"Aggregated {self.label} file saved to: {self.path}")
+
+    def abort(self):
+        if self._sink is not None:
+            self._sink.abort()
+
+
+class MarkdownExport(_AggregateExport):
+    sink_class = MarkdownSink
+    extension = "md"
+    label = "Markdown"
+
+
+class TexExport(_AggregateExport):
+    sink_class = TexSink
+    extension = "tex"
+    label = "TeX"
+
+
+class QuestionInfoExport(ExportSink):
+    """在每道题目的目录中写入 question_info.txt"""
+
+    def question(self, record, context):
+        question_folder = os.path.join(context["course_output_dir"], record.folder)
+        os.makedirs(question_folder, exist_ok=True)
+        with open(os.path.join(question_folder, "question_info.txt"), 'w', encoding='utf-8') as f_info:
+            f_info.write(render_question_info(record, context))
+
+
+class _JsonExport(ExportSink):
+    """
+    JSON 导出：默认收集全部条目，结束时用 generate_json_output 写出；
+    stream=True 时每道题立即写出，不在内存中保留整门课程的数据
+    """
+
+    form = PLATFORM
+    suffix = ""
+    stream_extension = "json"
+
+    def __init__(self, stream: bool = False, compact: bool = False):
+        self.stream = stream
+        self.compact = compact
+        self._course = None
+        self._entries = []
+        self._sink = None
+
+    def start(self, course):
+        self._course = course
+        if self.stream:
+            self._sink = self._open_stream(os.path.join(course["output_dir"], self._filename(self.stream_extension)))
+
+    def _filename(self, extension: str) -> str:
+        return f"{self._course['sanitized_name']}_questions_{self.suffix}.{extension}"
+
+    def _open_stream(self, path):
+        raise NotImplementedError
+
+    def _entry(self, platform_entry):
+        return platform_entry
+
+    def question(self, platform_entry, context):
+        entry = self._entry(platform_entry)
+        if entry is None:
+            return
+        if self.stream:
+            self._sink.write(entry)
+        else:
+            self._entries.append(entry)
+
+    def end_chapter(self, question_count, last):
+        if self._sink is not None:
+            self._sink.flush()
+
+    def close(self):
+        if self.stream:
+            self._sink.close()
+            print(f"Successfully generated JSON file: {self._sink.path}")
+        else:
+            generate_json_output(self._entries, self._course["output_dir"], self._filename("json"),
+                                 is_complete_json=self.suffix == "complete", compact=self.compact)
+
+    def abort(self):
+        if self._sink is not None:
+            self._sink.abort()
+
+
+class CompleteJsonExport(_JsonExport):
+    """含元数据和原始数据的完整题目列表 *_questions_complete.json（流式模式为 *_questions_complete.jsonl）"""
+
+    suffix = "complete"
+    stream_extension = "jsonl"
+
+    def _open_stream(self, path):
+        return JsonLinesSink(path)
+
+
+class ShuatiJsonExport(_JsonExport):
+    """刷题软件使用的精简题目列表 *_questions_shuati.json，不支持的题型不导出"""
+
+    suffix = "shuati"
+
+    def _open_stream(self, path):
+        return JsonArraySink(path, compact=self.compact)
+
+    def _entry(self, platform_entry):
+        return build_shuati_entry(platform_entry)
+
+
+# 导出格式名称及说明，create_sinks() 按此顺序创建导出目标
+EXPORT_FORMATS = {
+    "md": "Markdown 汇总文件",
+    "tex": "TeX 汇总文件",
+    "info": "每道题目的 question_info.txt",
+    "json": "完整 JSON (*_questions_complete.json)",
+    "shuati": "刷题 JSON (*_questions_shuati.json)",
+}
+
+
+def parse_formats(value: str) -> List[str]:
+    """
+    解析 "md,tex,json" 形式的导出格式列表
+
+    Raises:
+        ValueError: 含未知格式或为空
+    """
+    formats = [fmt for fmt in re.split(r"[\s,;|]+", (value or "").strip().lower()) if fmt]
+    unknown = [fmt for fmt in formats if fmt not in EXPORT_FORMATS]
+    if unknown:
+        raise ValueError(f"未知的导出格式: {', '.join(unknown)}（可选: {', '.join(EXPORT_FORMATS)}）")
+    if not formats:
+        raise ValueError(f"未指定导出格式（可选: {', '.join(EXPORT_FORMATS)}）")
+    return list(dict.fromkeys(formats))
+
+
+def create_sinks(formats: Iterable[str], stream: bool = False, compact: bool = False) -> List[ExportSink]:
+    """
+    按格式名称创建导出目标
+
+    Args:
+        formats: EXPORT_FORMATS 中的格式名称
+        stream: JSON 导出逐题写出
+        compact: JSON 导出不缩进
+    """
+    factories = {
+        "md": MarkdownExport,
+        "tex": TexExport,
+        "info": QuestionInfoExport,
+        "json": lambda: CompleteJsonExport(stream=stream, compact=compact),
+        "shuati": lambda: ShuatiJsonExport(stream=stream, compact=compact),
+    }
+    formats = set(formats)
+    return [factory() for name, factory in factories.items() if name in formats]
+
+
+# --- 抽取引擎 ---
+
+class CourseExtractor:
+    """
+    单次遍历课程并把每道题分发给全部导出目标
+
+    用法：open_course() 获取课程目录并创建输出目录，调用方据此选择专题，再调用 run(chapters, sinks)；
+    不写文件时用 load_course() 和 iter_events()（见 iter_course_questions()）。等待用户选择期间可调用
+    start_speculative_fetch() 提前获取专题内容，选择确定后未选中的专题被取消；用完后调用 close()。
+    每个单元的答案在预取线程中并发获取，题目按所需形式各解析一次；新解析的题目写入检查点日志，
+    中断后以 resume=True 重新运行时，已完成的专题直接从日志恢复，不再发送请求。
+    """
+
+    def __init__(self, get_course_directory: Callable, get_whole_chapter_page_content: Callable,
+                 get_question_answer: Callable, base_output_dir: Optional[str] = None,
+                 answer_workers: int = DEFAULT_ANSWER_WORKERS, pipeline_depth: int = DEFAULT_PIPELINE_DEPTH,
+                 resume: bool = False, verbose: bool = True):
+        """
+        Args:
+            get_course_directory: 获取课程目录的函数 (course_id, class_id)
+            get_whole_chapter_page_content: 获取专题内容的函数 (chapter_node_id)
+            get_question_answer: 获取题目答案的函数 (question_id, parent_id)
+            base_output_dir: 导出根目录，课程输出到其中的 course_<ID>_<课程名> 目录；只遍历不写文件时可为 None
+            answer_workers: 每个单元并发获取答案的线程数
+            pipeline_depth: 后台提前获取的专题/单元数
+            resume: 是否从检查点日志继续上次中断的导出
+            verbose: 是否打印遍历进度
+        """
+        self._get_course_directory = get_course_directory
+        self._get_whole_chapter_page_content = get_whole_chapter_page_content
+        self._get_question_answer = get_question_answer
+        self.base_output_dir = base_output_dir
+        self.answer_workers = answer_workers
+        self.pipeline_depth = pipeline_depth
+        self.resume = resume
+        self.verbose = verbose
+        self.course = None
+        self.questions_exported = 0
+        self.speculative = None
+        self._speculative_answers = {}
+        self.stats = PipelineStats(("chapter_fetch", "answer_fetch", "resolve", "image_wait", "render"))
+
+    def _log(self, message: str):
+        if self.verbose:
+            print(message)
+
+    def load_course(self, course_id: Any, class_id: Any) -> Optional[Dict[str, Any]]:
+        """
+        获取课程目录，不创建任何文件
+
+        Returns:
+            {"id", "class_id", "name", "sanitized_name", "output_dir", "chapters"}，output_dir 在未设置
+            base_output_dir 时为 None；目录获取失败时返回 None
+        """
+        directory_data = self._get_course_directory(course_id, class_id)
+        if not directory_data:
+            return None
+        course_name_raw = directory_data.get("coursename", f"UnknownCourse_{course_id}")
+        course_name_sanitized = sanitize_filename(course_name_raw)
+        course_output_dir = None
+        if self.base_output_dir is not None:
+            course_output_dir = os.path.join(self.base_output_dir, f"course_{course_id}_{course_name_sanitized}")
+        self.course = {
+            "id": course_id, "class_id": class_id, "name": course_name_raw, "sanitized_name": course_name_sanitized,
+            "output_dir": course_output_dir, "chapters": directory_data.get("chapters", []),
+        }
+        return self.course
+
+    def open_course(self, course_id: Any, class_id: Any) -> Optional[Dict[str, Any]]:
+        """
+        获取课程目录并创建课程输出目录
+
+        Returns:
+            同 load_course()；目录获取失败或没有专题时打印原因并返回 None
+        """
+        course = self.load_course(course_id, class_id)
+        if course is None:
+            print("Failed to fetch course directory. Exiting.")
+            return None
+        os.makedirs(course["output_dir"], exist_ok=True)
+        print(f"Processing course: {course['name']}")
+        if not course["chapters"]:
+            print("No chapters found in course directory.")
+            return None
+        return course
+
+    def start_speculative_fetch(self, max_chapters: int = DEFAULT_SPECULATIVE_CHAPTERS,
+                                answers: bool = DEFAULT_SPECULATIVE_ANSWERS):
+        """
+        在后台获取目录中前 max_chapters 个专题的内容（answers=True 时连同各单元的答案），
+        供随后的 run()/iter_events() 直接使用；用户思考的时间可以掩盖大部分网络延迟。
+        开始遍历时未选中的专题被取消或丢弃。需在 load_course()/open_course() 之后调用
+        """
+        chapters = [chapter for chapter in self.course["chapters"] if chapter.get("nodeid")][:max(0, max_chapters)]
+        if not chapters:
+            return
+
+        def fetch(chapter):
+            chapter_content = self._get_whole_chapter_page_content(chapter["nodeid"])
+            unit_answers = {}
+            if answers and chapter_content:
+                for wholepage_dto in _question_units(chapter_content):
+                    parent_id = wholepage_dto.get("id")
+                    question_ids = collect_unit_question_ids(wholepage_dto.get("coursepageDTOList", []))
+                    unit_answers[parent_id] = fetch_question_answers(question_ids, parent_id, self._get_question_answer,
+                                                                     self.answer_workers)
+            return chapter_content and (chapter_content, unit_answers)
+
+        self.speculative = SpeculativeFetcher(chapters, fetch, key=lambda chapter: chapter["nodeid"],
+                                              stats=self.stats.stage("speculative"))
+
+    def close(self):
+        """停止推测性预取，丢弃未使用的结果"""
+        if self.speculative is not None:
+            self.speculative.close()
+        self._speculative_answers.clear()
+
+    def run(self, chapters: List[Dict[str, Any]], sinks: List[ExportSink], image_downloader=None) -> int:
+        """
+        遍历选中的专题并把题目分发给导出目标
+
+        Args:
+            chapters: 要导出的专题（open_course() 返回的 chapters 中的元素）
+            sinks: 导出目标，按列表顺序接收回调
+            image_downloader: ImageDownloader，为 None 时不下载题目图片
+
+        Returns:
+            本次导出的题目数（含从检查点恢复的题目）
+        """
+        forms = tuple(form for form in (RECORD, PLATFORM) if any(sink.form == form for sink in sinks))
+        if not forms:
+            raise ValueError("至少需要一个导出目标")
+        journal = CheckpointJournal(self.course["output_dir"], _JOURNAL_NAMES[forms], resume=self.resume)
+        render_stats = self.stats.stage("render")
+        questions_exported = 0
+        for sink in sinks: sink.start(self.course)
+        try:
+            for kind, *args in self.iter_events(chapters, forms, journal, image_downloader):
+                if kind != "question":
+                    for sink in sinks: getattr(sink, kind)(*args)
+                    continue
+                results, context = args
+                with render_stats.timed():
+                    for sink in sinks: sink.question(results[sink.form], context)
+                questions_exported += 1
+        except BaseException:
+            # Keep whatever was written so far; the journal lets --resume finish the export
+            for sink in sinks: sink.abort()
+            raise
+        finally:
+            journal.close()
+        for sink in sinks: sink.close()
+        self.questions_exported += questions_exported
+        return questions_exported
+
+    def iter_events(self, chapters: List[Dict[str, Any]], forms: tuple = (RECORD, PLATFORM), journal=None,
+                    image_downloader=None) -> Iterator[tuple]:
+        """
+        惰性遍历选中的专题，按输出顺序产出事件：
+
+            ("chapter", title)
+            ("unit", title)
+            ("question", {form: 题目}, context)
+            ("end_chapter", question_count, last)
+
+        Args:
+            chapters: 要遍历的专题
+            forms: 需要的题目形式（RECORD、PLATFORM）
+            journal: 检查点日志，为 None 时不记录也不恢复
+            image_downloader: ImageDownloader，为 None 时不下载题目图片（RECORD 中只有图片地址）
+
+        调用方提前停止迭代（或关闭生成器）时后台预取线程随之结束。
+        """
+        if self.speculative is not None:
+            self.speculative.retain(chapter.get("nodeid") for chapter in chapters)
+        run = _ExtractionRun(self, forms, journal if journal is not None else NullJournal(), image_downloader)
+        return run.events(chapters)
+
+
+class _ExtractionRun:
+    """CourseExtractor.iter_events() 一次遍历的状态"""
+
+    def __init__(self, extractor: CourseExtractor, forms: tuple, journal, image_downloader):
+        self.extractor = extractor
+        self.course = extractor.course
+        self.forms = forms
+        self.journal = journal
+        self.image_downloader = image_downloader
+        self.stats = extractor.stats
+        self._log = extractor._log
+
+    # --- 检查点日志中的题目：只有一种形式时直接保存该形式，与旧版本日志兼容 ---
+
+    def _pack(self, results: Dict[str, Any]) -> Dict[str, Any]:
+        stored = {form: value.to_dict() if form == RECORD else value for form, value in results.items()}
+        return stored[self.forms[0]] if len(self.forms) == 1 else stored
+
+    def _unpack(self, stored: Dict[str, Any]) -> Dict[str, Any]:
+        if len(self.forms) == 1:
+            stored = {self.forms[0]: stored}
+        return {form: QuestionRecord.from_dict(value) if form == RECORD else value for form, value in stored.items()}
+
+    # --- 遍历 ---
+
+    def _unit_context(self, chapter_node_id, chapter_title_raw, parent_id, unit_title_raw) -> Dict[str, Any]:
+        return {
+            "course_output_dir": self.course["output_dir"], "course_name_raw": self.course["name"],
+            "chapter_node_id": chapter_node_id, "chapter_title_raw": chapter_title_raw,
+            "chapter_title_sanitized": sanitize_filename(chapter_title_raw), "parent_id": parent_id,
+            "unit_title_raw": unit_title_raw, "unit_title_sanitized": sanitize_filename(unit_title_raw),
+        }
+
+    def events(self, chapters: List[Dict[str, Any]]) -> Iterator[tuple]:
+        journal = self.journal
+
+        def fetch_chapter_content(chapter):
+            # Runs on the prefetch thread; chapters restored from the journal need no request
+            chapter_node_id = chapter.get("nodeid")
+            if not chapter_node_id or journal.is_chapter_done(chapter_node_id):
+                return None
+            if self.extractor.speculative is not None:
+                prefetched = self.extractor.speculative.take(chapter_node_id)
+                if prefetched is not None:
+                    chapter_content, unit_answers = prefetched
+                    if unit_answers:
+                        self.extractor._speculative_answers[chapter_node_id] = unit_answers
+                    return chapter_content
+            return self.extractor._get_whole_chapter_page_content(chapter_node_id)
+
+        # Chapter N+1 is fetched in the background while chapter N is processed
+        chapter_stream = prefetch(chapters, fetch_chapter_content, self.extractor.pipeline_depth,
+                                  self.stats.stage("chapter_fetch"))
+        for chapter_idx, (chapter, chapter_content) in enumerate(chapter_stream):
+            chapter_title_raw = chapter.get("nodetitle", f"UnknownChapter_{chapter_idx+1}")
+            chapter_node_id = chapter.get("nodeid")
+            if not chapter_node_id:
+                self._log(f"Skipping chapter '{chapter_title_raw}' due to missing nodeId.")
+                continue
+
+            self._log(f"\nProcessing Chapter: {chapter_title_raw} (NodeID: {chapter_node_id})")
+            yield "chapter", chapter_title_raw
+            last = chapter_idx == len(chapters) - 1
+
+            if journal.is_chapter_done(chapter_node_id):
+                # Finished in a previous run: rebuild this chapter from the journal without any requests
+                self._log("  Chapter already exported, restoring from checkpoint.")
+                yield from self._restore_chapter(chapter_node_id, chapter_title_raw, last)
+                continue
+
+            if not chapter_content:
+                self._log(f"  Failed to fetch content for chapter '{chapter_title_raw}'. Skipping.")
+                continue
+
+            question_count = yield from self._chapter_events(chapter_node_id, chapter_title_raw, chapter_content)
+            journal.mark_chapter_done(chapter_node_id)
+            yield "end_chapter", question_count, last
+
+    def _restore_chapter(self, chapter_node_id, chapter_title_raw, last) -> Iterator[tuple]:
+        question_count = 0
+        context = self._unit_context(chapter_node_id, chapter_title_raw, None, "")
+        for record in self.journal.chapter_records(chapter_node_id):
+            if record["type"] == "unit":
+                context = self._unit_context(chapter_node_id, chapter_title_raw, record["unit"], record["title"])
+                yield "unit", record["title"]
+            else:
+                question_count += 1
+                yield "question", self._unpack(record["result"]), context
+        yield "end_chapter", question_count, last
+
+    def _chapter_events(self, chapter_node_id, chapter_title_raw, chapter_content) -> Iterator[tuple]:
+        """产出一个专题的单元和题目事件，返回该专题的题目数"""
+        journal = self.journal
+        extractor = self.extractor
+        question_units = _question_units(chapter_content)
+        question_counter_overall = 0  # For numbering in MD/TeX
+        # Answers fetched speculatively while the user was choosing chapters
+        speculative_answers = extractor._speculative_answers.pop(chapter_node_id, {})
+
+        def fetch_unit_answers(wholepage_dto):
+            # Resolve all answers of a unit concurrently on the prefetch thread, so unit N+1's answers
+            # are in flight while unit N is resolved and dispatched. Journaled questions are skipped.
+            parent_id = wholepage_dto.get("id")
+            if parent_id in speculative_answers:
+                return speculative_answers.pop(parent_id)
+            pending_question_ids = [
+                question_id for question_id in collect_unit_question_ids(wholepage_dto.get("coursepageDTOList", []))
+                if journal.get_question(chapter_node_id, parent_id, question_id) is None
+            ]
+            return fetch_question_answers(pending_question_ids, parent_id, extractor._get_question_answer,
+                                          extractor.answer_workers)
+
+        unit_stream = prefetch(question_units, fetch_unit_answers, extractor.pipeline_depth,
+                               self.stats.stage("answer_fetch"))
+        for wholepage_dto, unit_answers in unit_stream:
+            parent_id = wholepage_dto.get("id")
+            unit_title_raw = wholepage_dto.get("content", f"UnknownUnit_{parent_id}")
+            self._log(f"  Processing Unit: {unit_title_raw} (ParentID: {parent_id})")
+            journal.start_unit(chapter_node_id, parent_id, unit_title_raw)
+            yield "unit", unit_title_raw
+
+            coursepage_list = wholepage_dto.get("coursepageDTOList", [])
+            if not coursepage_list:
+                journal.mark_unit_done(chapter_node_id, parent_id)
+                continue
+
+            context = self._unit_context(chapter_node_id, chapter_title_raw, parent_id, unit_title_raw)
+            questions_found_in_unit = False
+            unit_questions = []  # (question_id, results, newly_resolved) in output order
+            pending_images = []
+            for coursepage in coursepage_list:
+                questions_list = coursepage.get("questionDTOList", [])
+                if not questions_list:
+                    continue  # No questions in this page, check next one
+
+                questions_found_in_unit = True
+                for q_data in questions_list:
+                    question_counter_overall += 1
+                    question_id = q_data.get("questionid")
+                    journaled = journal.get_question(chapter_node_id, parent_id, question_id)
+                    if journaled is None:
+                        with self.stats.stage("resolve").timed():
+                            results = self._resolve(q_data, unit_answers.get(question_id), question_counter_overall,
+                                                    context, pending_images)
+                    else:
+                        results = self._unpack(journaled)
+                    unit_questions.append((question_id, results, journaled is None))
+
+            # The unit's images download concurrently; wait for them before journaling and dispatching
+            with self.stats.stage("image_wait").timed(len(pending_images)):
+                for image, future in pending_images:
+                    image["downloaded"] = future.result()
+            for question_id, results, newly_resolved in unit_questions:
+                if newly_resolved:
+                    journal.record_question(chapter_node_id, parent_id, question_id, self._pack(results))
+                yield "question", results, context
+
+            if not questions_found_in_unit:
+                self._log(f"    No questions found in unit '{unit_title_raw}'.")
+                self._log(f"    DEBUG: wholepage_dto for this unit:\n{json.dumps(wholepage_dto, indent=2, ensure_ascii=False)}\n")
+            journal.mark_unit_done(chapter_node_id, parent_id)
+        return question_counter_overall
+
+    def _resolve(self, q_data, answer_data, question_index, context, pending_images) -> Dict[str, Any]:
+        """
+        把一道题解析为所需的各种形式；图片下载提交到 image_downloader，(image, future) 追加到 pending_images，
+        调用方须等待下载完成并设置 image["downloaded"] 后再分发
+        """
+        results = {}
+        if RECORD in self.forms:
+            question_subfolder_relative = os.path.join(
+                f"chapter_{context['chapter_node_id']}_{context['chapter_title_sanitized']}",
+                f"unit_{context['parent_id']}_{context['unit_title_sanitized']}",
+                f"question_{q_data.get('questionid')}"
+            )
+            record = build_question_record(q_data, answer_data, question_index, question_subfolder_relative)
+            images = record.all_images()
+            if images and self.image_downloader is not None:
+                question_folder_absolute = os.path.join(context["course_output_dir"], question_subfolder_relative)
+                os.makedirs(question_folder_absolute, exist_ok=True)
+                pending_images.extend(
+                    (image, self.image_downloader.submit(image["url"], os.path.join(question_folder_absolute, image["filename"])))
+                    for image in images
+                )
+            results[RECORD] = record
+        if PLATFORM in self.forms:
+            results[PLATFORM] = build_platform_entry(q_data, answer_data, context)
+        return results
+
+
+# --- 生成器接口 ---
+
+class CourseQuestion:
+    """
+    iter_course_questions() 产出的一道已解析题目
+
+    record 为 QuestionRecord（题干、选项、答案的纯文本和图片地址），entry 为刷题平台完整条目（含原始 HTML 和答案数据）
+    """
+
+    __slots__ = ("course_id", "class_id", "course_name", "chapter_id", "chapter_title", "unit_id", "unit_title",
+                 "record", "entry")
+
+    def __init__(self, course_id: Any, class_id: Any, course_name: str, chapter_id: Any, chapter_title: str,
+                 unit_id: Any, unit_title: str, record: QuestionRecord, entry: Dict[str, Any]):
+        self.course_id = course_id
+        self.class_id = class_id
+        self.course_name = course_name
+        self.chapter_id = chapter_id
+        self.chapter_title = chapter_title
+        self.unit_id = unit_id
+        self.unit_title = unit_title
+        self.record = record
+        self.entry = entry
+
+    @property
+    def question_id(self) -> Any:
+        return self.record.question_id
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "course_id": self.course_id, "class_id": self.class_id, "course_name": self.course_name,
+            "chapter_id": self.chapter_id, "chapter_title": self.chapter_title,
+            "unit_id": self.unit_id, "unit_title": self.unit_title,
+            "record": self.record.to_dict(), "entry": self.entry,
+        }
+
+    def __repr__(self) -> str:
+        return f"CourseQuestion(course_id={self.course_id!r}, question_id={self.question_id!r}, type={self.record.type_name!r})"
+
+
+def iter_course_questions(course_id: Any, class_id: Any, client=None, chapter_selection: Optional[str] = None,
+                          answer_workers: int = DEFAULT_ANSWER_WORKERS,
+                          pipeline_depth: int = DEFAULT_PIPELINE_DEPTH) -> Iterator[CourseQuestion]:
+    """
+    逐专题惰性产出一门课程的全部题目，不写任何文件，不读写模块级全局状态
+
+    调用方可以随时停止迭代，后台预取随之结束，未遍历到的专题不会被请求；
+    不同课程可以使用各自的 client（例如不同的授权令牌）在同一进程中同时遍历。
+
+    Args:
+        course_id: 课程ID
+        class_id: 班级ID
+        client: 提供 get_course_directory / get_whole_chapter_page_content / get_question_answer 的 API 对象
+                （APIAdapter、UlearningAPI 或 DGUTUlearningAPI），默认使用全局 API 适配器
+        chapter_selection: 专题选择（"1,3,5"、"2-4" 或 "all"），默认全部
+        answer_workers: 每个单元并发获取答案的线程数
+        pipeline_depth: 后台提前获取的专题/单元数
+
+    Yields:
+        CourseQuestion，顺序与导出文件一致
+
+    Raises:
+        RuntimeError: 课程目录获取失败
+        ValueError: 专题选择无效
+    """
+    if client is None:
+        from api_adapter import get_default_api_adapter
+        client = get_default_api_adapter()
+
+    def unwrapped(method):
+        # APIAdapter 和 DGUT 客户端返回 {"success", "data"}，失败时视为没有数据；原始 API 直接返回数据
+        def call(*args):
+            response = method(*args)
+            if isinstance(response, dict) and "success" in response:
+                return response.get("data") if response["success"] else None
+            return response
+        return call
+
+    extractor = CourseExtractor(unwrapped(client.get_course_directory), unwrapped(client.get_whole_chapter_page_content),
+                                unwrapped(client.get_question_answer), answer_workers=answer_workers,
+                                pipeline_depth=pipeline_depth, verbose=False)
+    course = extractor.load_course(course_id, class_id)
+    if course is None:
+        raise RuntimeError(f"获取课程目录失败: course_id={course_id}, class_id={class_id}")
+    chapters = select_chapters(course["chapters"], chapter_selection)
+
+    for kind, *args in extractor.iter_events(chapters):
+        if kind != "question":
+            continue
+        results, context = args
+        yield CourseQuestion(
+            course_id, class_id, course["name"], context["chapter_node_id"], context["chapter_title_raw"],
+            context["parent_id"], context["unit_title_raw"], results[RECORD], results[PLATFORM]
+        )
@@ -6,17 +6,63 @@
 import requests
 import json
 import os
-from typing import Dict, List, Optional, Union, Any
+import threading
+from typing import Dict, List, Optional, Tuple, Union, Any
 from dotenv import load_dotenv
+from adaptive_timeout import LatencyTracker, get_default_latency_tracker
+from endpoint_cache import EndpointVersionCache
+from response_cache import ResponseCache, get_default_response_cache
+from rate_limiter import get_rate_limiter
+from retry_policy import DEFINITIVE, TRANSIENT, RetryPolicy, classify_error, classify_status, get_default_retry_policy
+from run_metrics import get_default_run_metrics
+from transport import get_default_transport
 
 # 加载环境变量
 load_dotenv()
 
+
+def normalize_response(response: Optional[Dict]) -> Dict:
+    """
+    将新旧版API响应统一为 {"success", "message", "data"} 格式
+    
+    Args:
+        response: 原始API响应
+        
+    Returns:
+        统一格式的响应数据
+    """
+    if not response:
+        return {"success": False, "message": "API请求失败", "data": None}
+    
+    # 检查响应格式并统一处理
+    if "code" in response:
+        # 新版API格式
+        if response["code"] == 200:
+            return {"success": True, "message": "请求成功", "data": response.get("data")}
+        else:
+            return {"success": False, "message": response.get("message", "请求失败"), "data": None}
+    elif "success" in response:
+        # 旧版API格式
+        if response["success"]:
+            return {"success": True, "message": "请求成功", "data": response.get("data")}
+        else:
+            return {"success": False, "message": response.get("message", "请求失败"), "data": None}
+    else:
+        # 直接返回数据
+        return {"success": True, "message": "请求成功", "data": response}
+
+
+# auto 模式下所有客户端共享的端点版本缓存
+endpoint_version_cache = EndpointVersionCache()
+
+
 class DGUTUlearningAPI:
     """东莞理工学院优学院API类，支持新旧API兼容性"""
     
     def __init__(self, base_url: str = None, authorization_token: str = None, 
-                 ua_authorization_token: str = None, api_version: str = "auto"):
+                 ua_authorization_token: str = None, api_version: str = "auto",
+                 version_cache: EndpointVersionCache = None, response_cache: ResponseCache = None,
+                 retry_policy: RetryPolicy = None, latency_tracker: LatencyTracker = None):
         """
         初始化API客户端
         
@@ -25,12 +71,23 @@ class DGUTUlearningAPI:
             authorization_token: 授权令牌
             ua_authorization_token: UA授权令牌
             api_version: API版本，可选值为 "auto"(自动检测), "v1"(旧版), "v2"(新版)
+            version_cache: auto 模式下的端点版本缓存，默认使用模块级共享缓存
+            response_cache: 响应缓存，为 None 时使用全局响应缓存（通过 RESPONSE_CACHE_DB 或 --cache-db 启用）
+            retry_policy: 暂时性失败的重试策略，为 None 时使用全局重试策略
+            latency_tracker: 按端点自适应超时的延迟统计，为 None 时使用全局延迟统计
         """
         self.base_url = base_url or os.getenv("BASE_API_URL", "https://ua.dgut.edu.cn")
         self.authorization_token = authorization_token or os.getenv("AUTHORIZATION_TOKEN")
         self.ua_authorization_token = ua_authorization_token or os.getenv("UA_AUTHORIZATION_TOKEN", "18016158863D724D29B3334BD9853C36")
         self.api_version = api_version
-        self.session = requests.Session()
+        self.version_cache = version_cache or endpoint_version_cache
+        self.response_cache = response_cache
+        self.retry_policy = retry_policy
+        self.latency_tracker = latency_tracker
+        # 并发请求时同一端点只探测一次
+        self._probe_lock = threading.Lock()
+        # 与其他会话共享连接池（长连接和 TLS 连接复用）
+        self.session = get_default_transport().session()
         
         # 设置默认请求头
         self.session.headers.update({
@@ -91,7 +148,7 @@ class DGUTUlearningAPI:
     
     def _try_endpoint_with_fallback(self, endpoint_name: str) -> str:
         """
-        尝试使用v2 API，如果失败则回退到v1
+        尝试使用v2 API，如果失败则回退到v1；探测结果按端点缓存，缓存有效期内不再发送探测请求
         
         Args:
             endpoint_name: 端点名称
@@ -99,22 +156,61 @@ class DGUTUlearningAPI:
         Returns:
             可用的API端点URL
         """
+        cached_url = self._get_cached_endpoint(endpoint_name)
+        if cached_url:
+            return cached_url
+        
+        with self._probe_lock:
+            # 等锁期间其他线程可能已经完成探测
+            cached_url = self._get_cached_endpoint(endpoint_name)
+            if cached_url:
+                return cached_url
+            return self._probe_endpoint(endpoint_name)
+    
+    def _get_cached_endpoint(self, endpoint_name: str) -> Optional[str]:
+        """返回缓存中未过期的端点URL"""
+        cached_version = self.version_cache.get(self.base_url, endpoint_name)
+        if cached_version:
+            cached_path = self.api_endpoints.get(cached_version, {}).get(endpoint_name)
+            if cached_path:
+                return f"{self.base_url}{cached_path}"
+        return None
+    
+    def _probe_endpoint(self, endpoint_name: str) -> str:
+        """探测端点版本，只缓存确定的结果；探测超时或返回 5xx 时本次回退到v1但不写入缓存"""
         # 先尝试v2
         v2_path = self.api_endpoints.get("v2", {}).get(endpoint_name)
+        v2_healthy = False
         if v2_path:
             v2_url = f"{self.base_url}{v2_path}"
             # 这里可以添加一个简单的健康检查
-            if self._check_endpoint_health(v2_url):
+            v2_healthy = self._check_endpoint_health(v2_url)
+            if v2_healthy:
+                self.version_cache.set(self.base_url, endpoint_name, "v2")
                 return v2_url
         
         # 回退到v1
         v1_path = self.api_endpoints.get("v1", {}).get(endpoint_name)
         if v1_path:
+            if v2_healthy is not None:
+                self.version_cache.set(self.base_url, endpoint_name, "v1")
             return f"{self.base_url}{v1_path}"
         
         raise ValueError(f"未找到端点 {endpoint_name}")
     
-    def _check_endpoint_health(self, url: str) -> bool:
+    def _get_response_cache(self) -> Optional[ResponseCache]:
+        """获取当前生效的响应缓存"""
+        return self.response_cache if self.response_cache is not None else get_default_response_cache()
+    
+    def _get_retry_policy(self) -> RetryPolicy:
+        """获取当前生效的重试策略"""
+        return self.retry_policy if self.retry_policy is not None else get_default_retry_policy()
+    
+    def _get_latency_tracker(self) -> LatencyTracker:
+        """获取当前生效的延迟统计"""
+        return self.latency_tracker if self.latency_tracker is not None else get_default_latency_tracker()
+    
+    def _check_endpoint_health(self, url: str) -> Optional[bool]:
         """
         检查API端点是否健康可用
         
@@ -122,14 +218,19 @@ class DGUTUlearningAPI:
             url: API端点URL
             
         Returns:
-            端点是否可用
+            端点是否可用；请求异常或返回暂时性状态码（5xx、429 等）时无法判断，返回 None
         """
         try:
             # 发送一个简单的OPTIONS请求检查端点
-            response = self.session.options(url, timeout=5)
-            return response.status_code in [200, 204, 405]  # 405 Method Not Allowed也算可用
-        except:
-            return False
+            response = self._get_latency_tracker().send(
+                url, "endpoint_probe", lambda t: self.session.options(url, timeout=t), default=5)
+        except requests.RequestException:
+            return None
+        if response.status_code in [200, 204, 405]:  # 405 Method Not Allowed也算可用
+            return True
+        if classify_status(response.status_code) == TRANSIENT:
+            return None
+        return False
     
     def _make_request(self, method: str, endpoint_name: str, **kwargs) -> Optional[Dict]:
         """
@@ -143,57 +244,90 @@ class DGUTUlearningAPI:
         Returns:
             API响应数据
         """
-        url = self._get_endpoint(endpoint_name)
+        return self._request(method, endpoint_name, **kwargs)[0]
+    
+    def _request(self, method: str, endpoint_name: str, **kwargs) -> Tuple[Optional[Dict], Optional[str]]:
+        """
+        发送API请求，暂时性失败（超时、连接重置、5xx、429）按重试策略重试
         
-        try:
-            if method.upper() == "GET":
-                response = self.session.get(url, params=kwargs, timeout=30)
-            elif method.upper() == "POST":
-                response = self.session.post(url, json=kwargs, timeout=30)
-            else:
-                raise ValueError(f"不支持的HTTP方法: {method}")
+        Returns:
+            (API响应数据, 失败类型)：成功时失败类型为 None，失败时为 TRANSIENT 或 DEFINITIVE
+        """
+        cache = self._get_response_cache()
+        cache_key = None
+        if cache is not None and cache.is_cacheable(endpoint_name):
+            cache_key = cache.make_key(endpoint_name, self.base_url, kwargs, namespace="dgut")
+            cached = cache.get(endpoint_name, cache_key)
+            if cached is not None:
+                get_default_run_metrics().record_cache_hit(endpoint_name)
+                return cached, None
+        
+        auto_version = self.api_version == "auto"
+        # 缓存的版本失效时最多重新探测一次
+        for attempt in range(2):
+            from_cache = auto_version and self.version_cache.get(self.base_url, endpoint_name) is not None
+            url = self._get_endpoint(endpoint_name)
+            # 同一主机的请求共享限流器（与旧版客户端、图片下载器共用）
+            limiter = get_rate_limiter(url)
+            tracker = self._get_latency_tracker()
             
-            response.raise_for_status()
+            def _send():
+                if method.upper() == "GET":
+                    request = lambda t: self.session.get(url, params=kwargs, timeout=t)
+                elif method.upper() == "POST":
+                    request = lambda t: self.session.post(url, json=kwargs, timeout=t)
+                else:
+                    raise ValueError(f"不支持的HTTP方法: {method}")
+                # 样本不足时使用 30 秒，之后按该端点的延迟统计自适应
+                return limiter.send(lambda: tracker.send(url, endpoint_name, request, default=30))
             
-            # 尝试解析JSON响应
             try:
-                return response.json()
-            except json.JSONDecodeError:
-                return {"data": response.text, "status_code": response.status_code}
+                # 按端点记录耗时、状态码、字节数和重试次数
+                with get_default_run_metrics().measure(endpoint_name) as measurement:
+                    response = measurement.response = self._get_retry_policy().send(endpoint_name,
+                                                                                    measurement.wrap(_send))
+                    response.raise_for_status()
                 
-        except requests.exceptions.RequestException as e:
-            print(f"API请求失败: {e}")
-            return None
+                # 尝试解析JSON响应
+                try:
+                    result = response.json()
+                except json.JSONDecodeError:
+                    return {"data": response.text, "status_code": response.status_code}, None
+                if cache_key and normalize_response(result)["success"]:
+                    cache.set(endpoint_name, cache_key, result)
+                return result, None
+                    
+            except requests.exceptions.HTTPError as e:
+                status_code = e.response.status_code if e.response is not None else None
+                if auto_version and status_code in (404, 405):
+                    # 端点版本不可用，清除缓存以便下次重新探测
+                    self.version_cache.invalidate(self.base_url, endpoint_name)
+                    if from_cache and attempt == 0:
+                        print(f"缓存的端点版本已失效 ({endpoint_name})，重新探测")
+                        continue
+                print(f"API请求失败: {e}")
+                return None, classify_error(e)
+            except requests.exceptions.RequestException as e:
+                print(f"API请求失败: {e}")
+                return None, classify_error(e)
+        return None, DEFINITIVE
     
-    def _handle_response(self, response: Dict) -> Dict:
+    def _handle_response(self, response: Dict, failure: Optional[str] = None) -> Dict:
         """
         处理API响应，统一格式
         
         Args:
             response: 原始API响应
+            failure: 请求失败类型，暂时性失败（重试后仍失败）会在结果中标记 "transient": True，
+                     调用方据此不回退到其他接口
             
         Returns:
             统一格式的响应数据
         """
-        if not response:
-            return {"success": False, "message": "API请求失败", "data": None}
-        
-        # 检查响应格式并统一处理
-        if "code" in response:
-            # 新版API格式
-            if response["code"] == 200:
-                return {"success": True, "message": "请求成功", "data": response.get("data")}
-            else:
-                return {"success": False, "message": response.get("message", "请求失败"), "data": None}
-        elif "success" in response:
-            # 旧版API格式
-            if response["success"]:
-                return {"success": True, "message": "请求成功", "data": response.get("data")}
-            else:
-                return {"success": False, "message": response.get("message", "请求失败"), "data": None}
-        else:
-            # 直接返回数据
-            return {"success": True, "message": "请求成功", "data": response}
+        result = normalize_response(response)
+        if failure == TRANSIENT:
+            result["transient"] = True
+        return result
     
     def get_course_directory(self, course_id: str, class_id: str) -> Optional[Dict]:
         """
@@ -206,9 +340,9 @@ class DGUTUlearningAPI:
         Returns:
             课程目录数据
         """
-        response = self._make_request("POST", "course_directory", 
+        response, failure = self._request("POST", "course_directory", 
                                     courseId=course_id, classId=class_id)
-        return self._handle_response(response)
+        return self._handle_response(response, failure)
     
     def get_whole_chapter_page_content(self, node_id: str) -> Optional[Dict]:
         """
@@ -220,8 +354,8 @@ class DGUTUlearningAPI:
         Returns:
             章节内容数据
         """
-        response = self._make_request("POST", "chapter_content", nodeId=node_id)
-        return self._handle_response(response)
+        response, failure = self._request("POST", "chapter_content", nodeId=node_id)
+        return self._handle_response(response, failure)
     
     def get_question_answer(self, question_id: str, parent_id: str) -> Optional[Dict]:
         """
@@ -234,9 +368,9 @@ class DGUTUlearningAPI:
         Returns:
             题目答案数据
         """
-        response = self._make_request("POST", "question_answer", 
+        response, failure = self._request("POST", "question_answer", 
                                     questionId=question_id, parentId=parent_id)
-        return self._handle_response(response)
+        return self._handle_response(response, failure)
     
     def get_user_info(self) -> Optional[Dict]:
         """
@@ -245,8 +379,8 @@ class DGUTUlearningAPI:
         Returns:
             用户信息数据
         """
-        response = self._make_request("GET", "user_info")
-        return self._handle_response(response)
+        response, failure = self._request("GET", "user_info")
+        return self._handle_response(response, failure)
     
     def get_course_remaining(self, course_id: str, class_id: str) -> Optional[Dict]:
         """
@@ -259,9 +393,9 @@ class DGUTUlearningAPI:
         Returns:
             课程剩余时间数据
         """
-        response = self._make_request("POST", "course_remaining", 
+        response, failure = self._request("POST", "course_remaining", 
                                     courseId=course_id, classId=class_id)
-        return self._handle_response(response)
+        return self._handle_response(response, failure)
     
     def get_study_record(self, course_id: str, class_id: str) -> Optional[Dict]:
         """
@@ -274,9 +408,9 @@ class DGUTUlearningAPI:
         Returns:
             学习记录数据
         """
-        response = self._make_request("POST", "study_record", 
+        response, failure = self._request("POST", "study_record", 
                                     courseId=course_id, classId=class_id)
-        return self._handle_response(response)
+        return self._handle_response(response, failure)
     
     def send_study_heartbeat(self, course_id: str, class_id: str, node_id: str, 
                            current_time: int = None) -> Optional[Dict]:
@@ -296,10 +430,10 @@ class DGUTUlearningAPI:
             import time
             current_time = int(time.time() * 1000)
             
-        response = self._make_request("POST", "study_heartbeat", 
+        response, failure = self._request("POST", "study_heartbeat", 
                                     courseId=course_id, classId=class_id, 
                                     nodeId=node_id, currentTime=current_time)
-        return self._handle_response(response)
+        return self._handle_response(response, failure)
     
     def sync_personal_data(self) -> Optional[Dict]:
         """
@@ -308,51 +442,81 @@ class DGUTUlearningAPI:
         Returns:
             同步结果
         """
-        response = self._make_request("POST", "sync_personal_data")
-        return self._handle_response(response)
+        response, failure = self._request("POST", "sync_personal_data")
+        return self._handle_response(response, failure)
+
+
+
+_default_dgut_api: Optional[DGUTUlearningAPI] = None
+_default_dgut_api_lock = threading.Lock()
+
+
+def get_default_dgut_api() -> DGUTUlearningAPI:
+    """
+    获取全局DGUT API客户端，首次调用时创建（导入模块时不创建、不发送请求）
+
+    Returns:
+        DGUTUlearningAPI 实例
+    """
+    global _default_dgut_api
+    if _default_dgut_api is None:
+        with _default_dgut_api_lock:
+            if _default_dgut_api is None:
+                _default_dgut_api = DGUTUlearningAPI()
+    return _default_dgut_api
+
+
+def set_default_dgut_api(dgut_api: Optional[DGUTUlearningAPI]):
+    """设置全局DGUT API客户端，传入 None 时恢复为首次使用时按默认配置创建"""
+    global _default_dgut_api
+    _default_dgut_api = dgut_api
+
 
+def __getattr__(name: str):
+    # 兼容 `from dgut_ulearning_api import dgut_api`：模块属性改为首次访问时创建
+    if name == "dgut_api":
+        return get_default_dgut_api()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# 创建全局API实例
-dgut_api = DGUTUlearningAPI()
 
 # 向后兼容的函数接口
 def get_course_directory(course_id: str, class_id: str, headers: Dict = None) -> Optional[Dict]:
     """向后兼容的课程目录获取函数"""
-    response = dgut_api.get_course_directory(course_id, class_id)
+    response = get_default_dgut_api().get_course_directory(course_id, class_id)
     return response.get("data") if response and response.get("success") else None
 
 def get_whole_chapter_page_content(node_id: str, headers: Dict = None) -> Optional[Dict]:
     """向后兼容的章节内容获取函数"""
-    response = dgut_api.get_whole_chapter_page_content(node_id)
+    response = get_default_dgut_api().get_whole_chapter_page_content(node_id)
     return response.get("data") if response and response.get("success") else None
 
 def get_question_answer(question_id: str, parent_id: str, headers: Dict = None) -> Optional[Dict]:
     """向后兼容的题目答案获取函数"""
-    response = dgut_api.get_question_answer(question_id, parent_id)
+    response = get_default_dgut_api().get_question_answer(question_id, parent_id)
     return response.get("data") if response and response.get("success") else None
 
 def get_user_info(headers: Dict = None) -> Optional[Dict]:
     """向后兼容的用户信息获取函数"""
-    response = dgut_api.get_user_info()
+    response = get_default_dgut_api().get_user_info()
     return response.get("data") if response and response.get("success") else None
 
 def get_course_remaining(course_id: str, class_id: str, headers: Dict = None) -> Optional[Dict]:
     """向后兼容的课程剩余时间获取函数"""
-    response = dgut_api.get_course_remaining(course_id, class_id)
+    response = get_default_dgut_api().get_course_remaining(course_id, class_id)
     return response.get("data") if response and response.get("success") else None
 
 def get_study_record(course_id: str, class_id: str, headers: Dict = None) -> Optional[Dict]:
     """向后兼容的学习记录获取函数"""
-    response = dgut_api.get_study_record(course_id, class_id)
+    response = get_default_dgut_api().get_study_record(course_id, class_id)
     return response.get("data") if response and response.get("success") else None
 
 def send_study_heartbeat(course_id: str, class_id: str, node_id: str, 
                        current_time: int = None, headers: Dict = None) -> Optional[Dict]:
     """向后兼容的学习心跳发送函数"""
-    response = dgut_api.send_study_heartbeat(course_id, class_id, node_id, current_time)
+    response = get_default_dgut_api().send_study_heartbeat(course_id, class_id, node_id, current_time)
     return response.get("data") if response and response.get("success") else None
 
 def sync_personal_data(headers: Dict = None) -> Optional[Dict]:
     """向后兼容的个人数据同步函数"""
-    response = dgut_api.sync_personal_data()
+    response = get_default_dgut_api().sync_personal_data()
     return response.get("data") if response and response.get("success") else None
\ No newline at end of file
@@ -0,0 +1,105 @@
+"""
+API端点版本缓存模块
+记录每个端点在 auto 模式下探测到的 v1/v2 版本，带过期时间，可选持久化到磁盘，避免每次请求前都发送 OPTIONS 探测
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+# 默认缓存有效期（秒）
+DEFAULT_ENDPOINT_CACHE_TTL = float(os.getenv("ENDPOINT_CACHE_TTL", str(6 * 3600)))
+# 持久化文件路径，为空时仅缓存在内存中
+DEFAULT_ENDPOINT_CACHE_FILE = os.getenv("ENDPOINT_CACHE_FILE") or None
+
+
+class EndpointVersionCache:
+    """端点版本缓存，键为 (base_url, endpoint_name)"""
+
+    def __init__(self, ttl: float = DEFAULT_ENDPOINT_CACHE_TTL, path: Optional[str] = DEFAULT_ENDPOINT_CACHE_FILE):
+        """
+        初始化缓存
+
+        Args:
+            ttl: 缓存有效期（秒）
+            path: 持久化 JSON 文件路径，为 None 时不落盘
+        """
+        self.ttl = ttl
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = {}
+        self._load()
+
+    @staticmethod
+    def _key(base_url: str, endpoint_name: str) -> str:
+        return f"{base_url.rstrip('/')}|{endpoint_name}"
+
+    def _load(self):
+        """从磁盘加载缓存，文件缺失或损坏时忽略"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            if isinstance(entries, dict):
+                self._entries = entries
+        except (OSError, ValueError) as e:
+            print(f"读取端点版本缓存失败: {e}")
+
+    def _save(self):
+        """写入磁盘（调用方需持有锁），先写临时文件再替换"""
+        if not self.path:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"保存端点版本缓存失败: {e}")
+
+    def get(self, base_url: str, endpoint_name: str) -> Optional[str]:
+        """
+        获取未过期的端点版本
+
+        Args:
+            base_url: API基础URL
+            endpoint_name: 端点名称
+
+        Returns:
+            "v1"/"v2"，未命中或已过期返回 None
+        """
+        key = self._key(base_url, endpoint_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return None
+            if time.time() - entry.get("resolved_at", 0) > self.ttl:
+                del self._entries[key]
+                return None
+            return entry.get("version")
+
+    def set(self, base_url: str, endpoint_name: str, version: str):
+        """记录端点版本，重新确认同一版本时也刷新落盘的确认时间"""
+        key = self._key(base_url, endpoint_name)
+        with self._lock:
+            self._entries[key] = {"version": version, "resolved_at": time.time()}
+            self._save()
+
+    def invalidate(self, base_url: str, endpoint_name: str):
+        """使端点版本失效（例如收到 404/405）"""
+        key = self._key(base_url, endpoint_name)
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._save()
+
+    def clear(self):
+        """清空全部缓存"""
+        with self._lock:
+            self._entries = {}
+            self._save()
@@ -1,32 +1,36 @@
-import requests
-import json
 import os
-import re
-from bs4 import BeautifulSoup
-from urllib.parse import urlparse, unquote
-import datetime
+import argparse
 from dotenv import load_dotenv
+from response_cache import ResponseCache, set_default_response_cache
+from pipeline import DEFAULT_PIPELINE_DEPTH
+from fragment_cache import get_default_fragment_cache
+from course_extractor import CourseExtractor, create_sinks
+from chapter_selection import select_chapters
+from answer_fetcher import DEFAULT_ANSWER_WORKERS
+from transport import DEFAULT_PREWARM_CONNECTIONS, get_default_transport, mount_pooled_adapter
+from run_metrics import DEFAULT_METRICS_PROMETHEUS, DEFAULT_METRICS_REPORT, report_run_stats
 
 # 导入API模块，优先使用适配器以兼容DGUT环境
 try:
     from api_adapter import (
         get_course_directory, get_whole_chapter_page_content,
-        get_question_answer, api_adapter
+        get_question_answer, get_default_api_adapter
     )
-    from api_adapter import APIAdapter  # noqa: F401  # for potential type checking
-    api = api_adapter.current_api
-    API_HEADERS = api.session.headers
-    IMAGE_DOWNLOAD_HEADERS = {
-        "User-Agent": API_HEADERS.get("User-Agent", API_HEADERS.get("user-agent", "Mozilla/5.0")),
-        "Referer": API_HEADERS.get("Referer", API_HEADERS.get("referer", ""))
-    }
+
+    def configure_connection_pool(max_workers):
+        get_default_api_adapter().configure_connection_pool(max_workers)
 except ImportError:
     print("警告: 无法导入API适配器，回退到原始API模块")
+    get_default_api_adapter = None
     from ulearning_api import (
-        api, get_course_directory, get_whole_chapter_page_content,
-        get_question_answer, API_HEADERS, IMAGE_DOWNLOAD_HEADERS
+        get_default_api, get_course_directory, get_whole_chapter_page_content,
+        get_question_answer
     )
 
+    def configure_connection_pool(max_workers):
+        mount_pooled_adapter(get_default_api().session, max_workers)
+        get_default_transport().prewarm([get_default_api().base_url], min(max_workers, DEFAULT_PREWARM_CONNECTIONS))
+
 # --- Configuration ---
 load_dotenv() # 从 .env 文件加载环境变量
 
@@ -35,339 +39,73 @@ CLASS_ID = os.getenv("CLASS_ID")
 AUTHORIZATION_TOKEN = os.getenv("AUTHORIZATION_TOKEN")
 BASE_OUTPUT_DIR = os.getenv("BASE_OUTPUT_DIR", "ulearning_courseware_exports")
 
-# --- 环境检查 ---
-if not all([COURSE_ID, CLASS_ID, AUTHORIZATION_TOKEN]):
-    print("错误：请确保 .env 文件中已配置 COURSE_ID, CLASS_ID, 和 AUTHORIZATION_TOKEN。")
-    exit()
-
-# --- Helper Functions (保持大部分不变) ---
-def sanitize_filename(filename):
-    if filename is None: filename = "untitled"
-    filename = str(filename); filename = re.sub(r'[<>:"/\\|?*]', '_', filename)
-    filename = re.sub(r'\s+', '_', filename); filename = re.sub(r'_+', '_', filename)
-    filename = filename.strip('_'); return filename[:100]
-
-def get_clean_text_from_html(html_content):
-    if not html_content or not isinstance(html_content, str): return ""
-    soup = BeautifulSoup(html_content, 'html.parser')
-    for p_tag in soup.find_all("p"): p_tag.append("\n")
-    for br_tag in soup.find_all("br"): br_tag.replace_with("\n")
-    text = soup.get_text(separator='', strip=False)
-    text = re.sub(r'\n\s*\n', '\n\n', text)
-    text = re.sub(r'^\s*\n|\n\s*$', '', text)
-    return text.strip()
-
-def extract_image_urls_from_html(html_content): # 确保这个函数存在
-    if not html_content or not isinstance(html_content, str): return []
-    soup = BeautifulSoup(html_content, 'html.parser')
-    img_tags = soup.find_all('img'); urls = []
-    for img in img_tags:
-        if 'src' in img.attrs and img['src'] and img['src'].strip(): urls.append(img['src'].strip())
-    return list(set(urls))
-
-def escape_latex_special_chars(text): # TeX相关，此处用不到但保留
-    if not text: return ""; text = text.replace('\\', r'\textbackslash{}')
-    text = text.replace('{', r'\{'); text = text.replace('}', r'\}')
-    text = text.replace('&', r'\&'); text = text.replace('%', r'\%')
-    text = text.replace('$', r'\$'); text = text.replace('#', r'\#')
-    text = text.replace('_', r'\_'); text = text.replace('^', r'\^{}')
-    text = text.replace('~', r'\textasciitilde{}'); return text
-
-def download_image(url, save_path, headers): # 保留，但此功能不直接用于刷题平台格式
-    try:
-        response = requests.get(url, headers=headers, stream=True, timeout=20)
-        response.raise_for_status()
-        with open(save_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192): f.write(chunk)
-        return True
-    except Exception as e: print(f"  Error downloading image {url}: {e}"); return False
-
-def has_fill_inputs(html_content: str) -> bool:
-    if not html_content:
-        return False
-    lower_html = html_content.lower()
-    return 'input-wrapper' in lower_html or '<input' in lower_html
-
-def build_fill_stem(title_html: str, answers: list) -> str:
-    if not title_html:
-        return "".join([f"{{{ans}}}" if ans else "{___}" for ans in answers])
-    soup = BeautifulSoup(title_html, 'html.parser')
-    blank_nodes = soup.select('span.input-wrapper, input')
-    for idx, node in enumerate(blank_nodes):
-        answer_text = answers[idx] if idx < len(answers) else ''
-        replacement_text = f"{{{answer_text}}}" if answer_text else "{___}"
-        node.replace_with(replacement_text)
-    rendered = get_clean_text_from_html(str(soup))
-    if len(blank_nodes) < len(answers):
-        extra = "".join([f"{{{ans}}}" for ans in answers[len(blank_nodes):]])
-        rendered = f"{rendered} {extra}".strip()
-    return rendered
-
-def _answers_look_like_choice_letters(answers: list) -> bool:
-    if not answers:
-        return False
-    normalized = []
-    for a in answers:
-        text = re.sub(r"[^A-Za-z]", "", (a or "")).upper()
-        if not text:
-            continue
-        normalized.append(text)
-    if not normalized:
-        return False
-    for text in normalized:
-        if not text.isalpha():
-            return False
-        if len(text) > 2:
-            return False
-    return True
-
-def _answers_look_like_true_false(answers: list) -> bool:
-    if not answers:
-        return False
-    tf_keywords = {"t", "f", "true", "false", "对", "错", "正确", "错误"}
-    normalized = set()
-    for a in answers:
-        if not a:
-            continue
-        text = re.sub(r"\s+", "", str(a).strip()).lower()
-        if text:
-            normalized.add(text)
-    return bool(normalized) and normalized.issubset(tf_keywords)
-
-def infer_platform_question_type(q_data: dict, answer_data: dict) -> str:
-    raw_type = q_data.get("type")
-    inferred = get_question_type_name(raw_type, for_platform=True)
-    has_options = bool(q_data.get("choiceitemModels"))
-    title_html = q_data.get("title", "") or ""
-    answers = []
-    if answer_data and answer_data.get("correctAnswerList"):
-        answers = [get_clean_text_from_html(str(ans)) for ans in answer_data["correctAnswerList"]]
-    elif answer_data and answer_data.get("answer"):
-        answers = [get_clean_text_from_html(str(answer_data["answer"]))]
-
-    if raw_type == 5:
-        return "填空题"
-    if has_fill_inputs(title_html):
-        return "填空题"
-    if not has_options and answers:
-        if not _answers_look_like_choice_letters(answers) and not _answers_look_like_true_false(answers):
-            return "填空题"
-
-    if inferred == "未知题型" and raw_type in (3, 5):
-        return "填空题"
-
-    return inferred
-
-def get_question_type_name(type_code_from_api, for_platform=False):
-    # API 的 type_code: 1:单选, 2:多选, 4:判断, 5:填空, (可能还有其他，如简答)
-    # 刷题平台格式: "选择题", "判断题", "填空题", "问答题"
-    if for_platform:
-        if type_code_from_api == 1: return "选择题"
-        if type_code_from_api == 2: return "选择题" # 多选也归为选择题
-        if type_code_from_api == 4: return "判断题"
-        if type_code_from_api == 5: return "填空题"
-        # 假设API中的简答题类型是6 (基于之前的get_question_type_name)
-        if type_code_from_api == 6: return "问答题" 
-        return "未知题型" # 平台未知
-    else: # 原来的逻辑，用于MD/TeX
-        type_map = {1: "单选题", 2: "多选题", 4: "判断题", 5: "填空题", 6: "简答题/论述题"}
-        return type_map.get(type_code_from_api, f"API未知题型({type_code_from_api})")
-
-# --- NEW FUNCTION for Platform Import Format ---
-def generate_json_output(data, output_dir, filename, is_complete_json=False):
+# --- Main Processing Logic ---
+def process_courseware_questions(answer_workers=DEFAULT_ANSWER_WORKERS, resume=False,
+                                 pipeline_depth=DEFAULT_PIPELINE_DEPTH, stream=False, compact=False,
+                                 chapter_selection=None):
     """
-    Generates a JSON file from the provided data.
-
     Args:
-        data: The list of question dictionaries.
-        output_dir: The directory to save the file in.
-        filename: The name of the output file.
-        is_complete_json: If True, saves the full original data structure.
-                          If False, saves the simplified format for the platform.
+        stream: 为 True 时每道题处理完立即写入 *_questions_complete.jsonl 和 *_questions_shuati.json，
+                不在内存中保留整门课程的数据
+        compact: 输出不缩进的 JSON
+        chapter_selection: 只导出选中的专题（"1,3,5"、"2-4" 或 "all"），默认导出全部
+
+    Returns:
+        {"course_name", "output_dir", "questions"}，未导出任何内容时返回 None
     """
-    output_path = os.path.join(output_dir, filename)
+    # 答案并发获取共用同一个会话，连接池需与并发数匹配
+    configure_connection_pool(answer_workers)
+
+    # 与 Markdown/TeX 导出共用同一个抽取引擎；需要同时导出多种格式时使用 ulearning_course_export.py --formats
+    extractor = CourseExtractor(get_course_directory, get_whole_chapter_page_content, get_question_answer,
+                                BASE_OUTPUT_DIR, answer_workers=answer_workers, pipeline_depth=pipeline_depth,
+                                resume=resume)
+    course = extractor.open_course(COURSE_ID, CLASS_ID)
+    if course is None: return
     try:
-        with open(output_path, 'w', encoding='utf-8') as f:
-            # Use json.dump for proper JSON formatting, escaping, and indentation
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        print(f"Successfully generated JSON file: {output_path}")
-    except Exception as e:
-        print(f"Error writing JSON file {filename}: {e}")
-
-# --- Main Processing Logic (Modified to collect data for platform format) ---
-def process_courseware_questions():
-    directory_data = get_course_directory(COURSE_ID, CLASS_ID)
-    if not directory_data: print("Failed to fetch course directory. Exiting."); return
-
-    course_name_raw = directory_data.get("coursename", f"UnknownCourse_{COURSE_ID}")
-    course_name_sanitized = sanitize_filename(course_name_raw)
-    course_output_dir = os.path.join(BASE_OUTPUT_DIR, f"course_{COURSE_ID}_{course_name_sanitized}")
-    os.makedirs(course_output_dir, exist_ok=True)
-    print(f"Processing course: {course_name_raw}")
-
-    # Data list for the new platform format
-    platform_data_list = []
-    # (MD and TeX content lists can remain if you still want those outputs)
-    # all_course_questions_md_content = [f"# {course_name_raw} - 课件题目汇总\n\n"]
-    # all_course_questions_tex_content = [...] # TeX preamble
-
-    chapters = directory_data.get("chapters", [])
-    if not chapters: print("No chapters found."); return
-
-    for chapter_idx, chapter in enumerate(chapters):
-        chapter_title_raw = chapter.get("nodetitle", f"UnknownChapter_{chapter_idx+1}")
-        chapter_node_id = chapter.get("nodeid")
-        if not chapter_node_id: print(f"Skipping chapter '{chapter_title_raw}' due to missing nodeId."); continue
-        
-        # (MD/TeX chapter titles can be added here if needed)
-        print(f"\nProcessing Chapter: {chapter_title_raw} (NodeID: {chapter_node_id})")
-
-        chapter_content = get_whole_chapter_page_content(chapter_node_id)
-        if not chapter_content: print(f"  Failed content for chapter '{chapter_title_raw}'."); continue
-
-        wholepage_item_list = chapter_content.get("wholepageItemDTOList", [])
-        
-        for item_dto in wholepage_item_list:
-            for wholepage_dto in item_dto.get("wholepageDTOList", []):
-                if wholepage_dto.get("contentType") == 7: # Question set
-                    parent_id = wholepage_dto.get("id")
-                    unit_title_raw = wholepage_dto.get("content", f"UnknownUnit_{parent_id}")
-                    print(f"  Processing Unit: {unit_title_raw} (ParentID: {parent_id})")
-                    
-                    # (MD/TeX unit titles can be added here if needed)
-
-                    coursepage_list = wholepage_dto.get("coursepageDTOList", [])
-                    if not coursepage_list: continue
-                    
-                    for coursepage in coursepage_list:
-                        questions_list = coursepage.get("questionDTOList", [])
-                        if not questions_list: continue # No questions in this page, check next one
-                        
-                        for q_data in questions_list:
-                            platform_entry = {} # For the new format
-
-                            question_id = q_data.get("questionid")
-                            q_title_html = q_data.get("title", "N/A")
-                            q_type_code_api = q_data.get("type") # API's type code
-                            q_options_raw_api = q_data.get("choiceitemModels", [])
-
-                            # Fetch answer
-                            answer_data = get_question_answer(question_id, parent_id)
-                            correct_answers_clean_list = []
-                            if answer_data and answer_data.get("correctAnswerList"):
-                                correct_answers_clean_list = [get_clean_text_from_html(str(ans)) for ans in answer_data["correctAnswerList"]]
-                            elif answer_data and answer_data.get("answer"):
-                                correct_answers_clean_list = [get_clean_text_from_html(str(answer_data["answer"]))]
-
-                            # Infer platform-specific question type
-                            platform_entry["题型"] = infer_platform_question_type(q_data, answer_data)
-                            
-                            # Get clean question stem
-                            if platform_entry["题型"] == "填空题":
-                                question_stem_clean = build_fill_stem(q_title_html, correct_answers_clean_list)
-                            else:
-                                question_stem_clean = get_clean_text_from_html(q_title_html)
-
-                            # Attach extra metadata for a "full" JSON
-                            platform_entry["课程名称"] = course_name_raw
-                            platform_entry["章节名称"] = chapter_title_raw
-                            platform_entry["单元名称"] = unit_title_raw
-                            platform_entry["题目ID"] = question_id
-                            platform_entry["ParentID"] = parent_id
-                            platform_entry["原始题型码"] = q_type_code_api
-                            platform_entry["原始题干HTML"] = q_title_html
-                            platform_entry["原始选项HTML"] = [opt.get("title", "") for opt in q_options_raw_api] if q_options_raw_api else []
-                            platform_entry["原始答案数据"] = answer_data
-
-                            # --- Populate platform_entry based on question type ---
-                            if platform_entry["题型"] == "选择题":
-                                platform_entry["题干"] = question_stem_clean
-                                options_list = []
-                                for opt_idx, opt in enumerate(q_options_raw_api):
-                                    opt_text = get_clean_text_from_html(opt.get("title", ""))
-                                    options_list.append(opt_text)
-                                platform_entry["选项"] = options_list
-
-                                # The correct_answers_clean_list already contains the option letters (e.g., ['A', 'B'])
-                                # We just need to join and sort them.
-                                platform_entry["答案"] = "".join(sorted(list(set(correct_answers_clean_list))))
-                                # Remove debug prints as the issue is understood
-                                # if not platform_entry["答案"] and correct_answers_clean_list:
-                                #     print(f"        DEBUG: Failed to map correct answer to options for QID {question_id}.")
-                                #     print(f"        DEBUG: Raw correct_answers_clean_list: {correct_answers_clean_list}")
-                                #     print(f"        DEBUG: Raw q_options_raw_api: {json.dumps(q_options_raw_api, indent=2, ensure_ascii=False)}")
-                                #     pass
-
-                            elif platform_entry["题型"] == "判断题":
-                                platform_entry["题干"] = question_stem_clean
-                                ans_text = correct_answers_clean_list[0].lower() if correct_answers_clean_list else ""
-                                platform_entry["答案"] = "正确" if ans_text in ["true", "t", "对"] else "错误"
-                            
-                            elif platform_entry["题型"] == "填空题":
-                                platform_entry["题干"] = question_stem_clean
-
-                            elif platform_entry["题型"] == "问答题":
-                                platform_entry["题干"] = question_stem_clean
-                                platform_entry["答案"] = "\n".join(correct_answers_clean_list) # Join parts if any
-                            
-                            else: # Unknown type for platform
-                                platform_entry["题型"] = "未知题型"
-                                platform_entry["题干"] = question_stem_clean
-                                platform_entry["答案"] = "未知题型答案: " + " | ".join(correct_answers_clean_list)
-
-                            platform_entry["解析"] = "" # Placeholder, need to check if API provides this
-                            
-                            platform_data_list.append(platform_entry)
-                            print(f"    Processed QID: {question_id} for platform import.")
-
-    # Generate the full export JSON (包含元数据的完整题目列表)
-    complete_json_filename = f"{course_name_sanitized}_questions_complete.json"
-    generate_json_output(platform_data_list, course_output_dir, complete_json_filename, is_complete_json=True)
-
-    # 同时生成刷题软件使用的精简版 JSON，命名为 *_questions_shuati.json
-    shuati_data_list = []
-    for entry in platform_data_list:
-        qtype = entry.get("题型")
-        if qtype == "选择题":
-            shuati_entry = {
-                "题型": "选择题",
-                "题干": entry.get("题干", ""),
-                "选项": entry.get("选项", []) or [],
-                "答案": entry.get("答案", "") or "",
-                "解析": entry.get("解析", "") or "",
-            }
-        elif qtype == "判断题":
-            shuati_entry = {
-                "题型": "判断题",
-                "题干": entry.get("题干", ""),
-                "答案": entry.get("答案", "") or "",
-                "解析": entry.get("解析", "") or "",
-            }
-        elif qtype == "填空题":
-            # 填空题的答案已经通过 build_fill_stem 嵌入到题干中的 {答案} 占位里
-            shuati_entry = {
-                "题型": "填空题",
-                "题干": entry.get("题干", ""),
-                "解析": entry.get("解析", "") or "",
-            }
-        elif qtype == "问答题":
-            shuati_entry = {
-                "题型": "问答题",
-                "题干": entry.get("题干", ""),
-                "答案": entry.get("答案", "") or "",
-                "解析": entry.get("解析", "") or "",
-            }
-        else:
-            # 其他类型（例如 未知题型）不导出到刷题 JSON
-            continue
-        shuati_data_list.append(shuati_entry)
+        chapters = select_chapters(course["chapters"], chapter_selection)
+    except ValueError as e:
+        print(f"专题选择 '{chapter_selection}' {e}"); return
 
-    shuati_json_filename = f"{course_name_sanitized}_questions_shuati.json"
-    generate_json_output(shuati_data_list, course_output_dir, shuati_json_filename, is_complete_json=False)
+    questions_exported = extractor.run(chapters, create_sinks(("json", "shuati"), stream=stream, compact=compact))
 
+    print(extractor.stats.format_report())
+    print(get_default_fragment_cache().format_stats())
     print("\n--- 数据导出与JSON文件生成处理完成 ---")
-    print(f"请检查输出目录: {os.path.abspath(course_output_dir)}")
+    print(f"请检查输出目录: {os.path.abspath(course['output_dir'])}")
+    return {"course_name": course["name"], "output_dir": course["output_dir"], "questions": questions_exported}
 
 
 if __name__ == "__main__":
-    process_courseware_questions()
+    parser = argparse.ArgumentParser(description="导出优学院课件题目为刷题平台 JSON")
+    parser.add_argument("--answer-workers", type=int, default=DEFAULT_ANSWER_WORKERS,
+                        help=f"并发获取答案的线程数 (默认: {DEFAULT_ANSWER_WORKERS})")
+    parser.add_argument("--cache-db", default=None,
+                        help="SQLite 响应缓存文件路径，重复导出时复用已获取的目录/章节/答案 (也可设置 RESPONSE_CACHE_DB)")
+    parser.add_argument("--pipeline-depth", type=int, default=DEFAULT_PIPELINE_DEPTH,
+                        help=f"后台提前获取的章节/单元数，0 表示不预取 (默认: {DEFAULT_PIPELINE_DEPTH})")
+    parser.add_argument("--stream", action="store_true",
+                        help="逐题写出 *_questions_complete.jsonl 和 *_questions_shuati.json，不在内存中保留整门课程")
+    parser.add_argument("--compact", action="store_true",
+                        help="输出不缩进的紧凑 JSON")
+    parser.add_argument("--resume", action="store_true",
+                        help="从课程输出目录中的检查点日志继续上次中断的导出")
+    parser.add_argument("--hedge", action="store_true",
+                        help="首选API响应慢时同时请求另一个API，先成功者胜出 (也可设置环境变量 API_HEDGING=1)")
+    parser.add_argument("--metrics-report", default=DEFAULT_METRICS_REPORT,
+                        help="运行结束时写出按端点统计的请求指标 JSON 报告，空字符串表示不写 "
+                             f"(默认: {DEFAULT_METRICS_REPORT or '不写'}，也可设置 METRICS_REPORT)")
+    parser.add_argument("--prometheus", default=DEFAULT_METRICS_PROMETHEUS,
+                        help="同时把请求指标写成 Prometheus 文本格式的文件 (也可设置 METRICS_PROMETHEUS)")
+    args = parser.parse_args()
+    if not all([COURSE_ID, CLASS_ID, AUTHORIZATION_TOKEN]):
+        print("错误：请确保 .env 文件中已配置 COURSE_ID, CLASS_ID, 和 AUTHORIZATION_TOKEN。")
+        exit()
+    if args.cache_db:
+        set_default_response_cache(ResponseCache(args.cache_db))
+    if args.hedge and get_default_api_adapter is not None:
+        get_default_api_adapter().hedging = True
+    process_courseware_questions(answer_workers=args.answer_workers, resume=args.resume,
+                                 pipeline_depth=args.pipeline_depth, stream=args.stream, compact=args.compact)
+    report_run_stats({"script": "export-to-json", "course_id": COURSE_ID, "class_id": CLASS_ID},
+                     args.metrics_report, args.prometheus)
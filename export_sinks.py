@@ -0,0 +1,226 @@
+"""
+导出文件写入模块
+Markdown / TeX 汇总文件在导出开始时打开，每写完一个专题就刷新到磁盘：内存占用与课程大小无关，
+中途失败时已导出的部分也保留在文件中。TeX 导言区和 \\end{document} 由 TexSink 负责；
+JSON 导出可逐条写入 JSONL 或流式写出 JSON 数组
+"""
+
+import datetime
+import json
+import os
+
+
+def escape_latex_special_chars(text):
+    if not text: return ""
+    text = text.replace('\\', r'\textbackslash{}')
+    text = text.replace('{', r'\{'); text = text.replace('}', r'\}')
+    text = text.replace('&', r'\&'); text = text.replace('%', r'\%')
+    text = text.replace('$', r'\$'); text = text.replace('#', r'\#')
+    text = text.replace('_', r'\_'); text = text.replace('^', r'\^{}')
+    text = text.replace('~', r'\textasciitilde{}')
+    return text
+
+def render_question_info(record, context):
+    info_lines = [
+        f"课程名称: {context['course_name_raw']}\n",
+        f"章节名称: {context['chapter_title_raw']}\n",
+        f"单元名称: {context['unit_title_raw']}\n",
+        f"题目ID: {record.question_id}\n",
+        f"ParentID (单元ID): {context['parent_id']}\n",
+        f"题型: {record.type_name}\n\n",
+        f"【题干】:\n{record.title_text}\n\n",
+    ]
+    if record.show_options:
+        info_lines.append("【选项】:\n")
+        for option in record.options:
+            info_lines.append(f"{option.prefix}{option.text}\n")
+        info_lines.append("\n")
+    info_lines.append(f"【正确答案】:\n{' | '.join(record.answers) or '未获取到'}\n")
+    return "".join(info_lines)
+
+def render_question_markdown(record):
+    md_q_entry = [f"#### {record.index}. ({record.type_name}) QID: {record.question_id}\n"]
+    md_q_entry.append(f"**题干:**\n{record.title_text}\n")
+    for img_idx, image in enumerate(record.title_images):
+        if image.get("downloaded"):
+            img_relative_path_for_md = os.path.join(record.folder, image["filename"]).replace("\\", "/")
+            md_q_entry.append(f"![题干图片 {img_idx+1}]({img_relative_path_for_md})\n")
+    md_q_entry.append("\n")
+
+    if record.show_options:
+        md_q_entry.append("**选项:**\n")
+        for option in record.options:
+            md_q_entry.append(f"- {option.prefix}{option.text}\n")
+            for img_idx, image in enumerate(option.images):
+                if image.get("downloaded"):
+                    img_relative_path_for_md = os.path.join(record.folder, image["filename"]).replace("\\", "/")
+                    md_q_entry.append(f"  ![选项 {option.letter} 图片 {img_idx+1}]({img_relative_path_for_md})\n")
+        md_q_entry.append("\n")
+    md_q_entry.append(f"**正确答案:**\n{' | '.join(record.answers) or '未获取到'}\n---\n")
+    return md_q_entry
+
+def render_question_tex(record, course_output_dir):
+    tex_q_entry = [f"\\subsubsection*{{{record.index}. ({escape_latex_special_chars(record.type_name)}) \\small QID: {record.question_id}}}\n"]
+    title_text_tex = escape_latex_special_chars(record.title_text).replace('\n\n', '\n\\par\n')
+    tex_q_entry.append(f"\\textbf{{{escape_latex_special_chars('题干')}:}}\n{title_text_tex}\n")
+    for image in record.title_images:
+        img_relative_path_for_tex = os.path.join(record.folder, image["filename"]).replace("\\", "/")
+        if os.path.exists(os.path.join(course_output_dir, record.folder, image["filename"])):
+            tex_q_entry.append(f"\\begin{{center}}\\includegraphics[width=0.8\\textwidth,height=0.25\\textheight,keepaspectratio]{{{img_relative_path_for_tex}}}\\end{{center}}\n")
+    tex_q_entry.append("\n")
+    if record.show_options:
+        tex_q_entry.append(f"\\textbf{{{escape_latex_special_chars('选项')}:}}\n\\begin{{itemize}}[leftmargin=*]\n")
+        for option in record.options:
+            opt_text_tex = escape_latex_special_chars(option.prefix + option.text).replace('\n\n', '\n\\par\n')
+            tex_q_entry.append(f"  \\item {opt_text_tex}\n")
+            for image in option.images:
+                img_relative_path_for_tex = os.path.join(record.folder, image["filename"]).replace("\\", "/")
+                if os.path.exists(os.path.join(course_output_dir, record.folder, image["filename"])):
+                    tex_q_entry.append(f"  \\begin{{center}}\\includegraphics[width=0.7\\textwidth,height=0.2\\textheight,keepaspectratio]{{{img_relative_path_for_tex}}}\\end{{center}}\n")
+        tex_q_entry.append("\\end{itemize}\n")
+    tex_q_entry.append(f"\\textbf{{{escape_latex_special_chars('正确答案')}:}}\n{escape_latex_special_chars(' | '.join(record.answers) or '未获取到')}\n")
+    tex_q_entry.append("\\vspace{0.3em}\\hrulefill\\vspace{0.7em}\n")
+    return tex_q_entry
+
+
+class MarkdownSink:
+    """逐段写入 Markdown 汇总文件"""
+
+    def __init__(self, path, course_name):
+        self.path = path
+        self._file = open(path, 'w', encoding='utf-8')
+        self._file.write(f"# {course_name} - 课件题目汇总\n\n")
+
+    def chapter(self, title):
+        self._file.write(f"## {title}\n\n")
+
+    def unit(self, title):
+        self._file.write(f"### {title}\n\n")
+
+    def question(self, record, course_output_dir):
+        self._file.write("".join(render_question_markdown(record)))
+
+    def note(self, text):
+        self._file.write(text)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        """写完并关闭文件"""
+        if not self._file.closed:
+            self._file.close()
+
+    def abort(self):
+        """异常退出时保留已写入的部分"""
+        self.close()
+
+
+class TexSink:
+    """逐段写入 TeX 汇总文件，各片段之间以换行分隔"""
+
+    def __init__(self, path, course_name):
+        self.path = path
+        self._file = open(path, 'w', encoding='utf-8')
+        self._started = False
+        self._write_parts([
+            r"\documentclass[12pt,UTF8]{ctexart}",
+            r"\usepackage{graphicx}", r"\usepackage{amsmath, amsfonts, amssymb}",
+            r"\usepackage[a4paper, margin=1in]{geometry}", r"\usepackage{enumitem}",
+            r"\usepackage{hyperref}", r"\hypersetup{colorlinks=true, linkcolor=blue, urlcolor=blue, citecolor=green}",
+            r"\usepackage{array,longtable}",r"\usepackage{float}", # Added float for better image placement control
+            f"\\title{{{escape_latex_special_chars(course_name)} - 课件题目汇总}}",
+            f"\\author{{优学院导出}}", f"\\date{{{datetime.date.today().strftime('%Y-%m-%d')}}}",
+            r"\begin{document}", r"\maketitle", "\n"
+        ])
+
+    def _write_parts(self, parts):
+        for part in parts:
+            if self._started:
+                self._file.write("\n")
+            self._file.write(part)
+            self._started = True
+
+    def chapter(self, title):
+        self._write_parts([f"\\section*{{{escape_latex_special_chars(title)}}}\n\\hrulefill\n"])
+
+    def unit(self, title):
+        self._write_parts([f"\\subsection*{{{escape_latex_special_chars(title)}}}\n"])
+
+    def question(self, record, course_output_dir):
+        self._write_parts(render_question_tex(record, course_output_dir))
+
+    def note(self, text):
+        self._write_parts([text])
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        """写入 \\end{document} 并关闭文件"""
+        if not self._file.closed:
+            self._write_parts([r"\end{document}"])
+            self._file.close()
+
+    def abort(self):
+        """异常退出时保留已写入的部分，不写 \\end{document}"""
+        if not self._file.closed:
+            self._file.close()
+
+
+class JsonLinesSink:
+    """逐条写入 JSON Lines 文件，每行一个紧凑的 JSON 对象"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def write(self, entry):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def abort(self):
+        self.close()
+
+
+class JsonArraySink:
+    """
+    逐条写出 JSON 数组，内存中只保留当前条目
+
+    indent=2 时输出与 json.dump(entries, f, ensure_ascii=False, indent=2) 完全一致；compact=True 时不缩进、不加空格。
+    """
+
+    def __init__(self, path, compact=False):
+        self.path = path
+        self.compact = compact
+        self._count = 0
+        self._file = open(path, 'w', encoding='utf-8')
+        self._file.write("[")
+
+    def write(self, entry):
+        if self.compact:
+            self._file.write(("," if self._count else "") + json.dumps(entry, ensure_ascii=False, separators=(",", ":")))
+        else:
+            item = json.dumps(entry, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+            self._file.write(("," if self._count else "") + "\n  " + item)
+        self._count += 1
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        """写入数组结尾并关闭文件"""
+        if not self._file.closed:
+            self._file.write("\n]" if self._count and not self.compact else "]")
+            self._file.close()
+
+    def abort(self):
+        """异常退出时保留已写入的条目，不写数组结尾"""
+        if not self._file.closed:
+            self._file.close()
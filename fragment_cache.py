@@ -0,0 +1,140 @@
+"""
+HTML 片段解析结果缓存模块
+选项和答案片段（如 "<p>正确</p>"、"<p>A</p>"、"true"）在一门课程中会重复出现成千上万次，
+按片段字符串缓存纯文本、解析后的 HtmlFragment 和填空检测结果，按占用大小（字符数）做最近最少使用淘汰，并统计命中率
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# 默认容量上限（键和值的字符数之和），可通过环境变量 FRAGMENT_CACHE_SIZE 覆盖，0 表示不缓存
+DEFAULT_FRAGMENT_CACHE_SIZE = int(os.getenv("FRAGMENT_CACHE_SIZE", str(8 * 1024 * 1024)))
+# 每条固定计入的开销，避免大量极短片段绕过容量限制
+_ENTRY_OVERHEAD = 64
+
+
+class FragmentCache:
+    """按占用大小限制容量的 LRU 缓存，按类别统计命中，线程安全"""
+
+    def __init__(self, max_size: int = DEFAULT_FRAGMENT_CACHE_SIZE, max_entry_size: Optional[int] = None):
+        """
+        Args:
+            max_size: 所有条目的占用之和上限，小于等于0时不缓存
+            max_entry_size: 单个条目的占用上限，默认为 max_size 的 1/64；很长的题干几乎不会重复，不占用缓存
+        """
+        self.max_size = max(0, max_size)
+        self.max_entry_size = max_entry_size if max_entry_size is not None else self.max_size // 64
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[Any, int]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._evictions = 0
+
+    def get_or_compute(self, kind: str, key: Hashable, compute: Callable[[], Any],
+                       size: Optional[Callable[[Any], int]] = None) -> Any:
+        """
+        返回缓存的结果，未命中时调用 compute() 计算并缓存
+
+        缓存的值会被所有调用方共享，调用方不得修改。
+
+        Args:
+            kind: 类别（如 "text"、"fragment"），不同类别的同一键互不影响，并分别统计
+            key: 片段字符串
+            compute: 计算函数
+            size: 计算值占用（字符数）的函数，默认对字符串取长度，其他值为 0；总占用再加上键的长度
+
+        Returns:
+            compute() 的结果
+        """
+        cache_key = (kind, key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                self._entries.move_to_end(cache_key)
+                self._count(kind, "hits")
+                return entry[0]
+            self._count(kind, "misses")
+
+        value = compute()
+        if size is not None:
+            value_size = size(value)
+        else:
+            value_size = len(value) if isinstance(value, str) else 0
+        entry_size = _ENTRY_OVERHEAD + (len(key) if isinstance(key, str) else 0) + value_size
+        if not self.max_size or entry_size > self.max_entry_size:
+            return value
+
+        with self._lock:
+            previous = self._entries.pop(cache_key, None)
+            if previous is not None:
+                self._size -= previous[1]
+            self._entries[cache_key] = (value, entry_size)
+            self._size += entry_size
+            while self._size > self.max_size:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+                self._evictions += 1
+        return value
+
+    def _count(self, kind: str, field: str):
+        kind_stats = self._stats.setdefault(kind, {"hits": 0, "misses": 0})
+        kind_stats[field] += 1
+
+    def clear(self):
+        """清空缓存（保留统计）"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """返回按类别统计的命中/未命中次数、条目数、占用和淘汰次数"""
+        with self._lock:
+            kinds = {name: dict(values) for name, values in self._stats.items()}
+            entries, size, evictions = len(self._entries), self._size, self._evictions
+        hits = sum(values["hits"] for values in kinds.values())
+        misses = sum(values["misses"] for values in kinds.values())
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "entries": entries,
+            "size": size,
+            "evictions": evictions,
+            "kinds": kinds,
+        }
+
+    def format_stats(self) -> str:
+        """生成一行可打印的统计信息"""
+        stats = self.stats()
+        parts = [f"{name} {values['hits']}/{values['hits'] + values['misses']}"
+                 for name, values in sorted(stats["kinds"].items())]
+        return (f"HTML 片段缓存命中率 {stats['hit_rate']:.1%} ({stats['hits']} 命中 / {stats['misses']} 未命中, "
+                f"{stats['entries']} 条, {stats['size'] / 1024:.0f} K 字符, 淘汰 {stats['evictions']} 条)"
+                + (f": {', '.join(parts)}" if parts else ""))
+
+
+_default_cache: Optional[FragmentCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_fragment_cache() -> FragmentCache:
+    """
+    获取全局片段缓存，首次调用时按 DEFAULT_FRAGMENT_CACHE_SIZE 创建
+
+    Returns:
+        FragmentCache 实例
+    """
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = FragmentCache()
+    return _default_cache
+
+
+def set_default_fragment_cache(cache: Optional[FragmentCache]):
+    """设置全局片段缓存（传入 FragmentCache(0) 可关闭缓存）"""
+    global _default_cache
+    _default_cache = cache
@@ -0,0 +1,377 @@
+"""
+HTML 解析后端模块
+提取纯文本、图片地址和首段标签时默认使用基于 html.parser 的流式分词器，不构建 BeautifulSoup 树；
+结果与 BeautifulSoup(html, 'html.parser') 的处理逐字节一致。需要改写文档的填空渲染仍使用 BeautifulSoup。
+可通过环境变量 HTML_PARSER_BACKEND=bs4 切换回 BeautifulSoup；内置语料的一致性由 tests/test_html_backends.py 保证，
+运行 `python html_backends.py --verify` 可额外核对导出 JSON 中的片段
+"""
+
+import json
+import os
+import re
+import sys
+from html.parser import HTMLParser
+from typing import Callable, Dict, Iterable, List, Optional
+
+from bs4 import BeautifulSoup
+from bs4.dammit import EntitySubstitution, UnicodeDammit
+
+from fragment_cache import get_default_fragment_cache
+
+# 默认后端："stream"（流式分词器）或 "bs4"
+DEFAULT_HTML_BACKEND = os.getenv("HTML_PARSER_BACKEND", "stream")
+
+# 与 bs4 HTMLTreeBuilder 相同的规则
+_EMPTY_ELEMENT_TAGS = frozenset([
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link", "menuitem", "meta",
+    "param", "source", "track", "wbr", "basefont", "bgsound", "command", "frame", "image", "isindex",
+    "nextid", "spacer",
+])
+_STRING_CONTAINER_TAGS = frozenset(["rt", "rp", "style", "script", "template"])
+_PRESERVE_WHITESPACE_TAGS = frozenset(["pre", "textarea"])
+_ASCII_SPACES = "\x20\x0a\x09\x0c\x0d"
+
+
+def clean_soup_text(soup: BeautifulSoup) -> str:
+    """把已解析的 HTML 转为纯文本：段落和换行标签转为换行，合并多余空行（会修改 soup）"""
+    for p_tag in soup.find_all("p"): p_tag.append("\n") # Add newline after <p>
+    for br_tag in soup.find_all("br"): br_tag.replace_with("\n") # Replace <br> with newline
+    return normalize_text(soup.get_text(separator='', strip=False)) # Use existing newlines
+
+
+def normalize_text(text: str) -> str:
+    """合并多余空行并去掉首尾空白"""
+    text = re.sub(r'\n\s*\n', '\n\n', text) # Consolidate multiple newlines
+    text = re.sub(r'^\s*\n|\n\s*$', '', text) # Trim leading/trailing newlines from whole text
+    return text.strip()
+
+
+class HtmlScan:
+    """一次扫描的结果：纯文本、按出现顺序去重的图片地址、首个 <p> 的文本（去空白）"""
+
+    __slots__ = ("text", "image_urls", "label")
+
+    def __init__(self, text: str, image_urls: List[str], label: str):
+        self.text = text
+        self.image_urls = image_urls
+        self.label = label
+
+
+def _unique(urls: Iterable[str]) -> List[str]:
+    seen = set()
+    result = []
+    for url in urls:
+        if url and url not in seen:
+            seen.add(url)
+            result.append(url)
+    return result
+
+
+def _scan_soup(html: str) -> HtmlScan:
+    """BeautifulSoup 后端"""
+    soup = BeautifulSoup(html, 'html.parser')
+    image_urls = _unique((img.get('src') or "").strip() for img in soup.find_all('img'))
+    p_tag = soup.find('p')
+    label = p_tag.get_text(strip=True) if p_tag else ""
+    return HtmlScan(clean_soup_text(soup), image_urls, label)
+
+
+_DECIMAL_REFERENCE_WITH_FOLLOWING_DATA = re.compile("^([0-9]+)(.*)")
+_HEX_REFERENCE_WITH_FOLLOWING_DATA = re.compile("^([0-9a-f]+)(.*)")
+
+
+def _dereference_charref(name: str):
+    """
+    解码 html.parser 给出的数字字符引用，规则与 bs4（>=4.13）的 BeautifulSoupHTMLParser 相同，
+    不依赖其私有方法：未以分号结束的引用只取数字部分，其余作为普通文本
+
+    Returns:
+        (解码后的字符, 是否替换为 U+FFFD, 引用之后的普通文本)
+    """
+    base = 10
+    reg = _DECIMAL_REFERENCE_WITH_FOLLOWING_DATA
+    if name.startswith("x") or name.startswith("X"):
+        name = name[1:]
+        base = 16
+        reg = _HEX_REFERENCE_WITH_FOLLOWING_DATA
+    extra_data = ""
+    real_name = None
+    try:
+        real_name = int(name, base)
+    except ValueError:
+        match = reg.search(name)
+        if match is not None:
+            real_name = int(match.groups()[0], base)
+            extra_data = match.groups()[1]
+    if real_name is None:
+        return "", False, name
+    dereferenced, replacement_added = UnicodeDammit.numeric_character_reference(real_name)
+    return dereferenced, replacement_added, extra_data
+
+
+class _StreamingScanner(HTMLParser):
+    """
+    按 BeautifulSoup 建树时的规则处理分词事件，但不构建树：
+
+    - 连续的文本在遇到标签/注释等事件时才成为一个字符串，全部是 ASCII 空白时折叠为单个换行或空格（pre/textarea 内除外）；
+    - script/style/template/rt/rp 内的文本、注释、声明和处理指令不计入文本；
+    - 空元素（br、img 等）立即关闭，其后多余的结束标签被忽略；结束标签只关闭最近一个同名的未关闭元素；
+    - 每个 <p> 关闭时追加一个换行，每个 <br> 替换为换行（等同于 clean_soup_text 的处理）。
+
+    字符引用与实体的解码方式与 BeautifulSoupHTMLParser 相同。
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.already_closed_empty_element = []
+        self.pieces: List[str] = []
+        self.image_urls: List[str] = []
+        self.label_pieces: Optional[List[str]] = None
+        self._label_depth: Optional[int] = None
+        self._stack: List[str] = []
+        self._open_counts: Dict[str, int] = {}
+        self._preserve_depth = 0
+        self._container_depth = 0
+        self._current_data: List[str] = []
+
+    # --- 与 BeautifulSoup.endData / pushTag / popTag 对应的部分 ---
+
+    def _end_data(self, counted: bool = True, cdata: bool = False):
+        if not self._current_data:
+            return
+        data = "".join(self._current_data)
+        self._current_data = []
+        if not self._preserve_depth:
+            for char in data:
+                if char not in _ASCII_SPACES:
+                    break
+            else:
+                data = "\n" if "\n" in data else " "
+        # script 等容器中的普通文本不计入，CDATA 不受容器影响
+        if not counted or (self._container_depth and not cdata):
+            return
+        self.pieces.append(data)
+        if self._label_depth is not None:
+            stripped = data.strip()
+            if stripped:
+                self.label_pieces.append(stripped)
+
+    def _push(self, name: str):
+        self._stack.append(name)
+        self._open_counts[name] = self._open_counts.get(name, 0) + 1
+        if name in _PRESERVE_WHITESPACE_TAGS:
+            self._preserve_depth += 1
+        if name in _STRING_CONTAINER_TAGS:
+            self._container_depth += 1
+        if name == "p" and self.label_pieces is None:
+            self.label_pieces = []
+            self._label_depth = len(self._stack)
+
+    def _pop(self):
+        name = self._stack.pop()
+        self._open_counts[name] -= 1
+        if name in _PRESERVE_WHITESPACE_TAGS:
+            self._preserve_depth -= 1
+        if name in _STRING_CONTAINER_TAGS:
+            self._container_depth -= 1
+        if self._label_depth is not None and len(self._stack) < self._label_depth:
+            self._label_depth = None
+        if name == "p":
+            self.pieces.append("\n")
+
+    def _pop_to(self, name: str):
+        if not self._open_counts.get(name):
+            return
+        while self._stack:
+            popped = self._stack[-1]
+            self._pop()
+            if popped == name:
+                break
+
+    # --- html.parser 事件 ---
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs, handle_empty_element=False)
+        self.handle_endtag(tag, check_already_closed=False)
+
+    def handle_starttag(self, tag, attrs, handle_empty_element=True):
+        self._end_data()
+        if tag == "img":
+            src = None
+            for key, value in attrs:
+                if key == "src":
+                    src = "" if value is None else value
+            src = (src or "").strip()
+            if src and src not in self.image_urls:
+                self.image_urls.append(src)
+        self._push(tag)
+        if tag == "br":
+            self.pieces.append("\n")
+        if tag in _EMPTY_ELEMENT_TAGS and handle_empty_element:
+            self.handle_endtag(tag, check_already_closed=False)
+            self.already_closed_empty_element.append(tag)
+
+    def handle_endtag(self, tag, check_already_closed=True):
+        if check_already_closed and tag in self.already_closed_empty_element:
+            self.already_closed_empty_element.remove(tag)
+            return
+        self._end_data()
+        self._pop_to(tag)
+
+    def handle_data(self, data):
+        self._current_data.append(data)
+
+    def handle_charref(self, name):
+        dereferenced, _, extra_data = _dereference_charref(name)
+        self._current_data.append(dereferenced)
+        self._current_data.append(extra_data)
+
+    def handle_entityref(self, name):
+        character = EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name)
+        self._current_data.append(character if character is not None else f"&{name}")
+
+    def _special_string(self, data: str, counted: bool, cdata: bool = False):
+        self._end_data()
+        self._current_data.append(data)
+        self._end_data(counted, cdata)
+
+    def handle_comment(self, data):
+        self._special_string(data, counted=False)
+
+    def handle_decl(self, decl):
+        self._special_string(decl, counted=False)
+
+    def unknown_decl(self, data):
+        # CDATA 与普通文本一样计入 get_text()，其他声明不计入
+        if data.upper().startswith("CDATA["):
+            self._special_string(data[len("CDATA["):], counted=True, cdata=True)
+        else:
+            self._special_string(data, counted=False)
+
+    def handle_pi(self, data):
+        self._special_string(data, counted=False)
+
+    def finish(self):
+        self.close()
+        self._end_data()
+        while self._stack:
+            self._pop()
+
+
+def _scan_stream(html: str) -> HtmlScan:
+    """流式分词器后端；分词器无法处理的输入交给 BeautifulSoup（结果或异常与原来一致）"""
+    scanner = _StreamingScanner()
+    try:
+        scanner.feed(html)
+        scanner.finish()
+    except Exception:
+        return _scan_soup(html)
+    label = "".join(scanner.label_pieces) if scanner.label_pieces else ""
+    return HtmlScan(normalize_text("".join(scanner.pieces)), scanner.image_urls, label)
+
+
+BACKENDS: Dict[str, Callable[[str], HtmlScan]] = {
+    "stream": _scan_stream,
+    "bs4": _scan_soup,
+}
+
+_backend = BACKENDS.get(DEFAULT_HTML_BACKEND, _scan_stream)
+
+
+def set_html_backend(name: str):
+    """切换解析后端（"stream" 或 "bs4"）"""
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"未知的 HTML 解析后端: {name}（可选: {', '.join(BACKENDS)}）")
+    _backend = BACKENDS[name]
+
+
+def scan_html(html: str) -> HtmlScan:
+    """提取纯文本、图片地址和首段标签"""
+    return _backend(html)
+
+
+def clean_html_text(html_content) -> str:
+    """HTML 转纯文本，非字符串或空内容返回空字符串；结果按片段缓存"""
+    if not html_content or not isinstance(html_content, str): return ""
+    return get_default_fragment_cache().get_or_compute("text", html_content, lambda: _backend(html_content).text)
+
+
+# --- 语料核对 ---
+
+GOLDEN_CORPUS = [
+    "<p>A</p><p>苹果</p>",
+    "<p>B.香蕉<img src=' x.png '></p>",
+    "<p>  </p>\n<p>题干<br>第二行</p><p><br/></p><p>   </p>",
+    "文本 <b>粗体</b> &lt;tag&gt; &amp;amp; &nbsp;&copy &foo; &#150; &#x41; &#0; &#xZZ; &#65abc",
+    "<div><p>x</p><p>y</p></div><img src='a.png'><img src='a.png'><img src='b.jpg'><img><img src=''>",
+    "<p>unclosed <b>bold<p>nested p<p>deeper", "<p>\xa0\n\n\n \xa0</p>end", "<p>a</p>\r\n<p>b</p>",
+    "<p><span>x</span></p></p></span>after", "<br></br><br/></br>text</br>", "<img src=a.png></img>tail",
+    "<pre>  keep   \n  spaces </pre>  <textarea> \n </textarea>", "<p>code<script>var a = '<p>';</script>after</p>",
+    "<style>p {color: red}</style><p>styled</p>", "<template><p>hidden</p>t</template>shown",
+    "<ruby>漢<rp>(</rp><rt>kan</rt><rp>)</rp></ruby>", "<!-- comment --><p>c</p><!DOCTYPE html><?php echo 1 ?>",
+    "<![CDATA[cdata text]]><p>x</p>", "<script><![CDATA[x]]></script>", "<p><rt><![CDATA[y]]></rt></p>", "<P>Upper</P><BR><IMG SRC='U.PNG'>", "<p>  A  </p><p>label</p>",
+    "<p><b>A</b><i></i></p>", "<p>\n</p><p>多行\n\n\n\n文本</p>", "plain text only", "   ",
+    "<p>a &lt;b&gt; c</p>", "<table><tr><td>1</td><td>2</td></tr></table>", "<p>x<img src='i.png' src='j.png'>y</p>",
+    "<ul><li>一</li><li>二</li></ul>", "<p>trailing <", "<p>broken <b attr='x>y</b>", "<a href='#'>link</a >text",
+    "<p>1</p>\t \n\t<p>2</p>", "<span>　全角空白　</span>", "<p>x</p><!---->\n\n<p>y</p>",
+    "<input><p>x<img src=a.png></pre> </span>\n<span>x<input/><input>",
+    "</input>y z<b>\n</br>\t<td></input><span></span><p>&lt;",
+]
+
+
+def _verify_html(html: str) -> Optional[str]:
+    """比较两种后端的结果，不一致时返回说明"""
+    outcomes = []
+    for name in ("bs4", "stream"):
+        try:
+            scan = BACKENDS[name](html)
+            outcomes.append((scan.text, scan.image_urls, scan.label))
+        except Exception as e:
+            outcomes.append(("error", type(e).__name__))
+    if outcomes[0] != outcomes[1]:
+        return f"{html!r}\n  bs4:    {outcomes[0]!r}\n  stream: {outcomes[1]!r}"
+    return None
+
+
+def _iter_json_html(path: str) -> Iterable[str]:
+    """从导出的 JSON / JSONL 文件中收集 HTML 字符串（原始题干HTML、原始选项HTML 等）"""
+    def _walk(value):
+        if isinstance(value, str):
+            if "<" in value or "&" in value:
+                yield value
+        elif isinstance(value, dict):
+            for item in value.values():
+                yield from _walk(item)
+        elif isinstance(value, list):
+            for item in value:
+                yield from _walk(item)
+
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield from _walk(json.loads(line))
+        else:
+            yield from _walk(json.load(f))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="核对流式 HTML 解析后端与 BeautifulSoup 的输出是否一致")
+    parser.add_argument("--verify", nargs="*", metavar="JSON", default=None,
+                        help="使用内置语料以及给定的导出 JSON/JSONL 文件（如 *_questions_complete.json）进行核对")
+    args = parser.parse_args()
+    if args.verify is None:
+        parser.print_help()
+        sys.exit(0)
+
+    corpus = list(GOLDEN_CORPUS)
+    for path in args.verify:
+        corpus.extend(_iter_json_html(path))
+    failures = [message for message in map(_verify_html, corpus) if message]
+    for message in failures:
+        print(message)
+    print(f"核对 {len(corpus)} 个 HTML 片段，{len(failures)} 个不一致")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,272 @@
+"""
+图片下载模块
+共用一个保持长连接的会话和一个线程池并发下载题目图片：同一URL只下载一次（其他保存路径从已下载的文件复制），
+文件先写入临时文件再重命名，中断时不会留下半个图片，并统计下载字节数和吞吐量；请求经过按主机共享的自适应限流器。
+配置 AssetStore 后图片按内容存储一次，题目目录中为硬链接，并对已下载过的URL使用条件请求
+"""
+
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+
+import requests
+
+from asset_store import AssetStore
+from rate_limiter import default_worker_count, get_rate_limiter
+from run_metrics import Measurement, get_default_run_metrics
+from transport import mount_pooled_adapter
+
+# 默认下载线程数（并发窗口上限，实际并发由限流器控制），可通过环境变量 IMAGE_WORKERS 或命令行 --image-workers 限制
+DEFAULT_IMAGE_WORKERS = default_worker_count("IMAGE_WORKERS")
+# 单张图片的请求超时（秒）
+DEFAULT_IMAGE_TIMEOUT = 20
+# 运行指标中的端点名称
+METRICS_ENDPOINT = "images"
+
+
+class ImageDownloader:
+    """并发、去重的图片下载器，线程安全"""
+
+    def __init__(self, headers: Optional[Dict[str, str]] = None, max_workers: int = DEFAULT_IMAGE_WORKERS,
+                 timeout: float = DEFAULT_IMAGE_TIMEOUT, session: Optional[requests.Session] = None,
+                 asset_store: Optional[AssetStore] = None):
+        """
+        初始化下载器
+
+        Args:
+            headers: 下载图片时使用的请求头（User-Agent、Referer 等）
+            max_workers: 最大并发下载数
+            timeout: 单张图片的请求超时（秒）
+            session: 复用的 requests 会话，默认新建会话并挂载共享连接池（容量不低于并发数）
+            asset_store: 按内容寻址的图片存储，为 None 时直接写入保存路径
+        """
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout
+        if session is None:
+            session = requests.Session()
+            mount_pooled_adapter(session, self.max_workers)
+        if headers:
+            session.headers.update({k: v for k, v in headers.items() if v is not None})
+        self.session = session
+        self.asset_store = asset_store
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="image")
+        self._lock = threading.Lock()
+        # URL -> 首次下载的 Future；保存路径 -> 对应的 Future；URL -> 已成功保存的文件（使用存储时为对象文件）
+        self._downloads: Dict[str, Future] = {}
+        self._targets: Dict[str, Future] = {}
+        self._sources: Dict[str, str] = {}
+        self._stats = {"downloaded": 0, "not_modified": 0, "deduplicated": 0, "failed": 0, "bytes": 0}
+        self._first_started: Optional[float] = None
+        self._last_finished: Optional[float] = None
+
+    def submit(self, url: str, save_path: str) -> "Future[bool]":
+        """
+        提交下载任务，立即返回
+
+        同一URL正在下载或已下载时不会重复请求：结果会在原下载完成后复制到 save_path。
+
+        Args:
+            url: 图片URL
+            save_path: 保存路径
+
+        Returns:
+            结果为是否保存成功的 Future
+        """
+        with self._lock:
+            if self._first_started is None:
+                self._first_started = time.perf_counter()
+            existing = self._targets.get(save_path)
+            if existing is not None:
+                return existing
+            primary = self._downloads.get(url)
+            if primary is not None:
+                get_default_run_metrics().record_cache_hit(METRICS_ENDPOINT)
+            if primary is None:
+                future = self._executor.submit(self._fetch, url, save_path)
+                self._downloads[url] = future
+            else:
+                future = Future()
+            self._targets[save_path] = future
+        if primary is not None:
+            # 回调可能立即执行，需在释放锁之后注册
+            self._copy_when_done(primary, future, url, save_path)
+        return future
+
+    def download(self, url: str, save_path: str) -> bool:
+        """下载单张图片并等待完成，返回是否成功"""
+        return self.submit(url, save_path).result()
+
+    def _fetch(self, url: str, save_path: str) -> bool:
+        """实际下载（在线程池中执行）"""
+        try:
+            os.makedirs(os.path.dirname(save_path) or ".", exist_ok=True)
+            # 按端点记录耗时（含写入文件）、状态码和字节数
+            with get_default_run_metrics().measure(METRICS_ENDPOINT) as measurement:
+                if self.asset_store is not None:
+                    return self._fetch_into_store(url, save_path, measurement)
+                response = measurement.response = get_rate_limiter(url).send(
+                    lambda: self.session.get(url, stream=True, timeout=self.timeout))
+                response.raise_for_status()
+                with _atomic_file(save_path) as f:
+                    size = measurement.bytes = _write_response(response, f)
+            self._record_download(url, save_path, size)
+            return True
+        except Exception as e:
+            print(f"  Error downloading image {url}: {e}")
+            with self._lock:
+                self._stats["failed"] += 1
+                self._last_finished = time.perf_counter()
+            return False
+
+    def _fetch_into_store(self, url: str, save_path: str, measurement: Measurement) -> bool:
+        """下载到资源存储（已有记录时发送条件请求），再链接到保存路径"""
+        store = self.asset_store
+        previous = store.lookup(url)
+        headers = store.conditional_headers(url)
+        response = measurement.response = get_rate_limiter(url).send(
+            lambda: self.session.get(url, stream=True, timeout=self.timeout, headers=headers))
+        if response.status_code == 304 and previous:
+            measurement.bytes = 0
+            get_default_run_metrics().record_cache_hit(METRICS_ENDPOINT)
+            response.close()
+            object_path = store.object_path(previous["sha256"])
+            store.link(object_path, save_path)
+            with self._lock:
+                self._sources[url] = object_path
+                self._stats["not_modified"] += 1
+                self._last_finished = time.perf_counter()
+            return True
+        response.raise_for_status()
+        tmp_path = store.new_temp_path()
+        try:
+            with open(tmp_path, "wb") as f:
+                size = measurement.bytes = _write_response(response, f)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        object_path = store.commit(tmp_path, url, response.headers.get("ETag"),
+                                   response.headers.get("Last-Modified"))
+        store.link(object_path, save_path)
+        self._record_download(url, object_path, size)
+        return True
+
+    def _record_download(self, url: str, source_path: str, size: int):
+        with self._lock:
+            self._sources[url] = source_path
+            self._stats["downloaded"] += 1
+            self._stats["bytes"] += size
+            self._last_finished = time.perf_counter()
+
+    def _copy_when_done(self, primary: Future, future: Future, url: str, save_path: str):
+        """在首次下载完成后把文件复制（使用存储时为链接）到新的保存路径并完成 future，不占用下载线程等待"""
+        def _done(_):
+            with self._lock:
+                source = self._sources.get(url)
+            if source is None:
+                future.set_result(False)
+                return
+            try:
+                if self.asset_store is not None:
+                    self.asset_store.link(source, save_path)
+                else:
+                    os.makedirs(os.path.dirname(save_path) or ".", exist_ok=True)
+                    with open(source, "rb") as src, _atomic_file(save_path) as dst:
+                        shutil.copyfileobj(src, dst)
+                with self._lock:
+                    self._stats["deduplicated"] += 1
+                future.set_result(True)
+            except OSError as e:
+                # 源文件已被移走等情况，退回到重新下载
+                print(f"  复制已下载图片失败 ({e})，重新下载: {url}")
+                retry = self._executor.submit(self._fetch, url, save_path)
+                retry.add_done_callback(lambda f: future.set_result(f.result()))
+
+        primary.add_done_callback(_done)
+
+    def stats(self) -> Dict[str, float]:
+        """返回下载统计：张数、未变化（304）次数、去重次数、失败次数、字节数及吞吐量"""
+        with self._lock:
+            stats = dict(self._stats)
+            started, finished = self._first_started, self._last_finished
+        elapsed = (finished - started) if started is not None and finished is not None else 0.0
+        stats["elapsed_seconds"] = round(elapsed, 3)
+        stats["bytes_per_second"] = stats["bytes"] / elapsed if elapsed > 0 else 0.0
+        stats["images_per_second"] = stats["downloaded"] / elapsed if elapsed > 0 else 0.0
+        return stats
+
+    def format_stats(self) -> str:
+        """生成一行可打印的统计信息"""
+        stats = self.stats()
+        return (f"图片下载: {stats['downloaded']} 张 ({stats['bytes'] / 1024:.0f} KiB), "
+                f"未变化 {stats['not_modified']} 张, 去重 {stats['deduplicated']} 张, 失败 {stats['failed']} 张, "
+                f"{stats['images_per_second']:.1f} 张/s, {stats['bytes_per_second'] / 1024:.0f} KiB/s")
+
+    def close(self):
+        """等待未完成的下载并关闭线程池和会话，保存资源存储索引"""
+        self._executor.shutdown(wait=True)
+        self.session.close()
+        if self.asset_store is not None:
+            self.asset_store.save()
+
+
+def _write_response(response, f) -> int:
+    """把响应内容分块写入文件，返回字节数"""
+    size = 0
+    for chunk in response.iter_content(chunk_size=8192):
+        f.write(chunk)
+        size += len(chunk)
+    return size
+
+
+class _atomic_file:
+    """写入同目录下的临时文件，成功关闭后重命名为目标文件，失败时删除临时文件"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def __enter__(self):
+        directory, name = os.path.split(self.path)
+        self.tmp_path = os.path.join(directory, f".{name}.{uuid.uuid4().hex}.part")
+        self._file = open(self.tmp_path, "xb")
+        return self._file
+
+    def __exit__(self, exc_type, exc, tb):
+        self._file.close()
+        if exc_type is None:
+            os.replace(self.tmp_path, self.path)
+        else:
+            try:
+                os.remove(self.tmp_path)
+            except OSError:
+                pass
+        return False
+
+
+_default_downloader: Optional[ImageDownloader] = None
+_default_downloader_lock = threading.Lock()
+
+
+def get_default_image_downloader(headers: Optional[Dict[str, str]] = None) -> ImageDownloader:
+    """
+    获取全局图片下载器，首次调用时使用给定请求头创建
+
+    Returns:
+        ImageDownloader 实例
+    """
+    global _default_downloader
+    if _default_downloader is None:
+        with _default_downloader_lock:
+            if _default_downloader is None:
+                _default_downloader = ImageDownloader(headers)
+    return _default_downloader
+
+
+def set_default_image_downloader(downloader: Optional[ImageDownloader]):
+    """设置全局图片下载器（例如根据命令行参数创建）"""
+    global _default_downloader
+    _default_downloader = downloader
@@ -0,0 +1,241 @@
+"""
+导出流水线模块
+用有界队列把“获取章节内容 -> 获取答案 -> 解析/下载图片 -> 渲染”串成流水线：
+后台线程提前获取下一个章节（或单元答案），主线程处理当前项，内存占用受队列深度限制，并统计各阶段吞吐量；
+SpeculativeFetcher 在还不确定是否需要时（如等待用户选择专题）就开始获取，确定后取消其余项
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+# 默认队列深度：后台最多提前准备的项数
+DEFAULT_PIPELINE_DEPTH = int(os.getenv("PIPELINE_DEPTH", "2"))
+# 推测性预取的线程数
+DEFAULT_SPECULATIVE_WORKERS = int(os.getenv("SPECULATIVE_WORKERS", "2"))
+
+_DONE = object()
+
+
+class StageStats:
+    """单个流水线阶段的计数器"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, items: int, seconds: float):
+        """记录一次处理：处理的项数和耗时"""
+        with self._lock:
+            self.items += items
+            self.busy_seconds += seconds
+
+    @contextmanager
+    def timed(self, items: int = 1):
+        """计时上下文，退出时记录 items 项"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(items, time.perf_counter() - start)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            items, busy = self.items, self.busy_seconds
+        return {
+            "items": items,
+            "busy_seconds": round(busy, 3),
+            "items_per_second": round(items / busy, 2) if busy > 0 else None,
+        }
+
+
+class PipelineStats:
+    """整条流水线的阶段统计"""
+
+    def __init__(self, stage_names: Iterable[str] = ()):
+        """
+        Args:
+            stage_names: 预先登记的阶段名称，决定报告中的输出顺序
+        """
+        self.started_at = time.perf_counter()
+        self._stages: Dict[str, StageStats] = {name: StageStats(name) for name in stage_names}
+        self._lock = threading.Lock()
+
+    def stage(self, name: str) -> StageStats:
+        """获取（必要时创建）阶段计数器，未预先登记的阶段按首次使用的顺序输出"""
+        with self._lock:
+            if name not in self._stages:
+                self._stages[name] = StageStats(name)
+            return self._stages[name]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            stages = list(self._stages.values())
+        return {stage.name: stage.snapshot() for stage in stages}
+
+    def format_report(self) -> str:
+        """生成可打印的阶段吞吐量报告"""
+        elapsed = time.perf_counter() - self.started_at
+        lines = [f"流水线统计 (总耗时 {elapsed:.1f}s):"]
+        for name, values in self.snapshot().items():
+            rate = f"{values['items_per_second']:.1f}/s" if values["items_per_second"] is not None else "-"
+            lines.append(f"  {name:<14} {values['items']:>6} 项  忙碌 {values['busy_seconds']:>8.2f}s  吞吐 {rate}")
+        return "\n".join(lines)
+
+
+def prefetch(items: Iterable[Any], fetch: Callable[[Any], Any], depth: int = DEFAULT_PIPELINE_DEPTH,
+             stats: Optional[StageStats] = None) -> Iterator[Tuple[Any, Any]]:
+    """
+    在后台线程中按顺序执行 fetch(item)，通过有界队列把 (item, result) 交给调用方
+
+    调用方处理第 N 项时，第 N+1..N+depth 项已在获取中；队列满时后台线程阻塞，因此同时持有的结果不超过 depth+1 个。
+    fetch 抛出的异常会在对应项被取出时重新抛出。
+
+    Args:
+        items: 待处理项
+        fetch: 获取函数，在后台线程中调用
+        depth: 队列深度，小于等于0时不使用后台线程
+        stats: 记录获取阶段耗时的计数器
+
+    Yields:
+        (item, fetch(item))，顺序与 items 一致
+    """
+    if depth <= 0:
+        for item in items:
+            start = time.perf_counter()
+            result = fetch(item)
+            if stats is not None:
+                stats.record(1, time.perf_counter() - start)
+            yield item, result
+        return
+
+    buffer: "queue.Queue" = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def _put(entry) -> bool:
+        # 带超时的 put，调用方提前结束时可以退出
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _producer():
+        try:
+            for item in items:
+                if stop.is_set():
+                    return
+                start = time.perf_counter()
+                try:
+                    entry = (item, fetch(item), None)
+                except BaseException as e:  # 交给消费者抛出
+                    entry = (item, None, e)
+                if stats is not None:
+                    stats.record(1, time.perf_counter() - start)
+                if not _put(entry):
+                    return
+        finally:
+            _put(_DONE)
+
+    producer = threading.Thread(target=_producer, name="prefetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            entry = buffer.get()
+            if entry is _DONE:
+                break
+            item, result, error = entry
+            if error is not None:
+                raise error
+            yield item, result
+    finally:
+        stop.set()
+
+
+class SpeculativeFetcher:
+    """
+    推测性预取：在确定需要哪些项之前就按顺序在后台获取
+
+    retain(keys) 确定需要的项后，尚未开始的其余项被取消，已完成或进行中的结果被丢弃；
+    take(key) 取走一项的结果（未完成时等待）。未提交、已取消或获取失败的项返回 None，由调用方自行获取。
+    """
+
+    def __init__(self, items: Iterable[Any], fetch: Callable[[Any], Any], key: Callable[[Any], Any] = lambda item: item,
+                 workers: int = DEFAULT_SPECULATIVE_WORKERS, stats: Optional[StageStats] = None):
+        """
+        Args:
+            items: 可能需要的项，按可能性从高到低排列
+            fetch: 获取函数，在后台线程中调用
+            key: 由项得到 take()/retain() 使用的键
+            workers: 并发获取的线程数
+            stats: 记录获取耗时的计数器
+        """
+        self._lock = threading.Lock()
+        self._futures: Dict[Any, "Future"] = {}
+        self._hits = 0
+        self._cancelled = 0
+        self._discarded = 0
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="speculative")
+
+        def _fetch(item):
+            start = time.perf_counter()
+            try:
+                return fetch(item)
+            finally:
+                if stats is not None:
+                    stats.record(1, time.perf_counter() - start)
+
+        for item in items:
+            item_key = key(item)
+            if item_key not in self._futures:
+                self._futures[item_key] = self._executor.submit(_fetch, item)
+
+    def retain(self, keys: Iterable[Any]):
+        """只保留 keys 中的项：其余未开始的项取消，已开始的项结果丢弃"""
+        keep = set(keys)
+        with self._lock:
+            dropped = [(item_key, future) for item_key, future in self._futures.items() if item_key not in keep]
+            for item_key, future in dropped:
+                del self._futures[item_key]
+                if future.cancel():
+                    self._cancelled += 1
+                else:
+                    self._discarded += 1
+
+    def take(self, item_key: Any) -> Any:
+        """取走一项的结果，没有可用结果时返回 None"""
+        with self._lock:
+            future = self._futures.pop(item_key, None)
+        if future is None:
+            return None
+        try:
+            result = future.result()
+        except Exception:
+            return None
+        if result is not None:
+            with self._lock:
+                self._hits += 1
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self._hits, "cancelled": self._cancelled, "discarded": self._discarded,
+                    "pending": len(self._futures)}
+
+    def format_stats(self) -> str:
+        """生成一行可打印的统计信息"""
+        stats = self.stats()
+        return f"推测性预取: 命中 {stats['hits']} 项, 取消 {stats['cancelled']} 项, 丢弃 {stats['discarded']} 项"
+
+    def close(self):
+        """取消未开始的项并丢弃全部结果，不等待进行中的获取"""
+        self.retain(())
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,324 @@
+"""
+题目中间表示模块
+每个 HTML 片段（题干、选项）只解析一次，得到纯文本、图片地址、首段单字母标签和填空位置
+（不含填空的片段由 html_backends 的流式分词器处理，含填空的片段使用 BeautifulSoup，
+填答案用的模板与原实现一样经过一次序列化和重新解析）；
+QuestionRecord 保存一道题目规范化后的全部信息，question_info.txt、Markdown 和 TeX 渲染都直接使用它
+"""
+
+import os
+import re
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+from bs4 import BeautifulSoup
+
+from fragment_cache import get_default_fragment_cache
+from html_backends import clean_html_text, clean_soup_text, scan_html
+
+# 填空位置在纯文本模板中的占位符（私有区字符，不会出现在正文中，也不属于空白字符）
+_BLANK_OPEN = "\ue000"
+_BLANK_CLOSE = "\ue001"
+_BLANK_PATTERN = re.compile(f"{_BLANK_OPEN}(\\d+){_BLANK_CLOSE}")
+
+
+def has_blank_inputs(html: Optional[str]) -> bool:
+    """片段是否含填空元素（input 或 span.input-wrapper），结果按片段缓存"""
+    if not html or not isinstance(html, str):
+        return False
+    return get_default_fragment_cache().get_or_compute("blank", html, lambda: _detect_blank_inputs(html))
+
+
+def _detect_blank_inputs(html: str) -> bool:
+    lower_html = html.lower()
+    return 'input-wrapper' in lower_html or '<input' in lower_html
+
+
+def _replace_blanks(soup: BeautifulSoup) -> int:
+    """把填空元素替换为带序号的占位符，返回填空数"""
+    blank_nodes = soup.select('span.input-wrapper, input')
+    for idx, node in enumerate(blank_nodes):
+        node.replace_with(f"{_BLANK_OPEN}{idx}{_BLANK_CLOSE}")
+    return len(blank_nodes)
+
+
+def _reparsed_text(soup: BeautifulSoup) -> str:
+    """
+    替换填空后的文档先序列化再重新解析，然后提取文本（不修改 soup）；
+    多余的结束标签等畸形标记在重新解析后结构可能不同，这样与逐题替换答案后再提取文本的结果逐字节一致
+    """
+    return clean_soup_text(BeautifulSoup(str(soup), 'html.parser'))
+
+
+class HtmlFragment:
+    """一次解析得到的 HTML 片段信息；parse() 返回按片段缓存的共享实例"""
+
+    __slots__ = ("empty", "template", "blank_count", "image_urls", "label", "_html", "_render_template")
+
+    def __init__(self, html: Optional[str]):
+        """
+        解析 HTML 片段
+
+        Args:
+            html: 题干或选项的 HTML，None 或空字符串视为空片段
+        """
+        self.empty = not html or not isinstance(html, str)
+        self.template = ""
+        self.blank_count = 0
+        self.image_urls: List[str] = []
+        self.label = ""
+        self._html = None if self.empty else html
+        self._render_template = None
+        if self.empty:
+            return
+
+        # 填空元素（input、span.input-wrapper）的标签或类名都含 "input"，不含时无需构建文档树
+        if "input" not in html.lower():
+            scan = scan_html(html)
+            self.image_urls = scan.image_urls
+            self.label = scan.label
+            self.template = scan.text
+            return
+
+        soup = BeautifulSoup(html, 'html.parser')
+        # 图片地址按出现顺序去重
+        seen = set()
+        for img in soup.find_all('img'):
+            src = (img.get('src') or "").strip()
+            if src and src not in seen:
+                seen.add(src)
+                self.image_urls.append(src)
+        # 首个 <p> 的文本，选项用它识别 "A"、"B" 这类标签
+        p_tag = soup.find('p')
+        if p_tag:
+            self.label = p_tag.get_text(strip=True)
+        # 填空位置替换为占位符后再提取文本，渲染答案时无需重新解析
+        self.blank_count = _replace_blanks(soup)
+        if self.blank_count:
+            self._render_template = _reparsed_text(soup)
+        self.template = clean_soup_text(soup)
+
+    @classmethod
+    def parse(cls, html: Optional[str]) -> "HtmlFragment":
+        """解析片段，相同的 HTML 只解析一次（返回的实例被共享，不得修改）"""
+        if not html or not isinstance(html, str):
+            return cls(html)
+        return get_default_fragment_cache().get_or_compute("fragment", html, lambda: cls(html),
+                                                           size=HtmlFragment._cached_size)
+
+    def _cached_size(self) -> int:
+        return (len(self.template) + len(self._render_template or "") + len(self.label)
+                + sum(len(url) for url in self.image_urls))
+
+    @property
+    def text(self) -> str:
+        """纯文本（不填答案，与直接提取整段 HTML 文本一致）"""
+        if not self.blank_count:
+            return self.template
+        # 含填空的片段很少按原样输出，此时再提取一次以保留填空元素自身的文本
+        return clean_html_text(self._html)
+
+    def _get_render_template(self) -> str:
+        """填答案用的文本模板；不含填空的片段按填空题渲染时才构建"""
+        if self._render_template is None:
+            soup = BeautifulSoup(self._html, 'html.parser')
+            _replace_blanks(soup)
+            self._render_template = _reparsed_text(soup)
+        return self._render_template
+
+    def render_blanks(self, answers: List[str], separator: str = " ") -> str:
+        """
+        把答案填入填空位置，如 "{答案}"，未给出答案的位置为 "{___}"
+
+        Args:
+            answers: 按填空顺序排列的答案文本
+            separator: 片段为空或答案多于填空位置时，多出的答案之间的分隔符
+
+        Returns:
+            填好答案的纯文本
+        """
+        if self.empty:
+            return separator.join([f"{{{ans}}}" if ans else "{___}" for ans in answers])
+
+        def _replace(match):
+            idx = int(match.group(1))
+            answer_text = answers[idx] if idx < len(answers) else ''
+            return f"{{{answer_text}}}" if answer_text else "{___}"
+
+        rendered = _BLANK_PATTERN.sub(_replace, self._get_render_template())
+        if self.blank_count < len(answers):
+            extra = separator.join([f"{{{ans}}}" for ans in answers[self.blank_count:]])
+            rendered = f"{rendered} {extra}".strip()
+        return rendered
+
+
+class OptionRecord:
+    """选项：显示前缀（如 "A. "）、字母、纯文本和图片"""
+
+    __slots__ = ("prefix", "letter", "text", "images")
+
+    def __init__(self, prefix: str, letter: str, text: str, images: List[Dict[str, Any]]):
+        self.prefix = prefix
+        self.letter = letter
+        self.text = text
+        self.images = images
+
+    @classmethod
+    def from_fragment(cls, fragment: HtmlFragment, opt_idx: int) -> "OptionRecord":
+        """由选项片段构建，首段为单个字母时用作选项标签"""
+        letter = chr(ord('A') + opt_idx)
+        text = fragment.text
+        label = fragment.label
+        if len(label) == 1 and label.isalpha():
+            letter = label
+            if text.startswith(label): text = text[len(label):].lstrip(". ")
+        return cls(f"{letter}. ", letter, text, [])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"prefix": self.prefix, "letter": self.letter, "text": self.text, "images": self.images}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "OptionRecord":
+        return cls(data["prefix"], data["letter"], data["text"], data.get("images", []))
+
+
+class QuestionRecord:
+    """
+    一道题目的规范化表示
+
+    images 为 {"url", "filename", "downloaded"} 字典列表；to_dict()/from_dict() 用于检查点日志的存取。
+    """
+
+    __slots__ = ("index", "question_id", "type_name", "title_text", "show_options", "folder",
+                 "title_images", "options", "answers")
+
+    def __init__(self, index: int, question_id: Any, type_name: str, title_text: str, show_options: bool,
+                 folder: str, title_images: List[Dict[str, Any]], options: List[OptionRecord], answers: List[str]):
+        self.index = index
+        self.question_id = question_id
+        self.type_name = type_name
+        self.title_text = title_text
+        self.show_options = show_options
+        self.folder = folder
+        self.title_images = title_images
+        self.options = options
+        self.answers = answers
+
+    def all_images(self) -> List[Dict[str, Any]]:
+        """题干和选项中的全部图片"""
+        return self.title_images + [image for option in self.options for image in option.images]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "question_id": self.question_id,
+            "type_name": self.type_name,
+            "title_text": self.title_text,
+            "show_options": self.show_options,
+            "folder": self.folder,
+            "title_images": self.title_images,
+            "options": [option.to_dict() for option in self.options],
+            "answers": self.answers,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "QuestionRecord":
+        return cls(
+            data["index"], data["question_id"], data["type_name"], data["title_text"], data["show_options"],
+            data["folder"], data.get("title_images", []),
+            [OptionRecord.from_dict(option) for option in data.get("options", [])], data.get("answers", [])
+        )
+
+
+# --- 由接口数据构建 QuestionRecord ---
+
+QUESTION_TYPE_NAMES = {1: "单选题", 2: "多选题", 3: "不定项选择题", 4: "判断题", 5: "填空题", 6: "简答题/论述题", 7: "文件题"}
+
+
+def get_question_type_name(type_code: Any) -> str:
+    return QUESTION_TYPE_NAMES.get(type_code, f"未知题型({type_code})")
+
+
+def image_filename(img_url: str, stem: str) -> str:
+    """图片保存文件名：stem 加上 URL 中的扩展名，缺失时使用 .png"""
+    img_ext = os.path.splitext(urlparse(img_url).path)[1] or '.png'
+    if not img_ext.startswith('.'): img_ext = '.' + img_ext
+    return f"{stem}{img_ext}"
+
+
+def extract_answer_texts(answer_data: Optional[Dict[str, Any]]) -> List[str]:
+    """答案纯文本列表；含子题时每个子题的答案合并为一项（多个子题加 "子题N: " 前缀）"""
+    correct_answer_str_list = []
+    if answer_data and answer_data.get("correctAnswerList"):
+        correct_answer_str_list = [clean_html_text(str(ans)) for ans in answer_data["correctAnswerList"]]
+    elif answer_data and answer_data.get("answer"):
+        correct_answer_str_list = [clean_html_text(str(answer_data["answer"]))]
+
+    sub_answers = []
+    if answer_data:
+        sub_answers = answer_data.get("subQuestionAnswerDTOList") or []
+    for sub_index, sub_answer in enumerate(sub_answers, 1):
+        sub_values = []
+        if sub_answer.get("correctAnswerList"):
+            sub_values = [clean_html_text(str(ans)) for ans in sub_answer["correctAnswerList"]]
+        elif sub_answer.get("answer"):
+            sub_values = [clean_html_text(str(sub_answer["answer"]))]
+        joined = " | ".join([value for value in sub_values if value])
+        if not joined:
+            continue
+        label = f"子题{sub_index}: {joined}" if len(sub_answers) > 1 else joined
+        correct_answer_str_list.append(label)
+    return correct_answer_str_list
+
+
+def build_question_record(q_data: Dict[str, Any], answer_data: Optional[Dict[str, Any]], question_index: int,
+                          folder: str) -> QuestionRecord:
+    """
+    把 questionDTOList 中的一道题目和它的答案解析为 QuestionRecord，每个 HTML 片段只解析一次
+
+    Args:
+        q_data: 题目数据
+        answer_data: get_question_answer 返回的答案数据，可以为 None
+        question_index: 题目在专题中的序号
+        folder: 题目目录（相对课程输出目录），图片保存在其中
+
+    Returns:
+        QuestionRecord，图片尚未下载（images 中没有 "downloaded"）
+    """
+    question_id = q_data.get("questionid")
+    q_title_html = q_data.get("title", "N/A")
+    q_type_code = q_data.get("type")
+    q_options_raw = q_data.get("choiceitemModels") or []
+
+    correct_answer_str_list = extract_answer_texts(answer_data)
+
+    has_options = bool(q_options_raw)
+    is_fill_question = q_type_code == 5 or not has_options or has_blank_inputs(q_title_html)
+    q_type_name = "填空题" if is_fill_question else get_question_type_name(q_type_code)
+
+    title_fragment = HtmlFragment.parse(q_title_html)
+    option_fragments = [HtmlFragment.parse(opt.get("title", "")) for opt in q_options_raw]
+    if is_fill_question:
+        title_text_clean = title_fragment.render_blanks(correct_answer_str_list)
+    else:
+        title_text_clean = title_fragment.text
+
+    show_options = has_options and not is_fill_question
+    options = []
+    if show_options:
+        for opt_idx, fragment in enumerate(option_fragments):
+            option = OptionRecord.from_fragment(fragment, opt_idx)
+            option.images = [
+                {"url": img_url, "filename": image_filename(img_url, f"option_{option.letter}_img_{img_idx+1}")}
+                for img_idx, img_url in enumerate(fragment.image_urls)
+            ]
+            options.append(option)
+
+    return QuestionRecord(
+        question_index, question_id, q_type_name, title_text_clean, show_options, folder,
+        [
+            {"url": img_url, "filename": image_filename(img_url, f"title_img_{img_idx+1}")}
+            for img_idx, img_url in enumerate(title_fragment.image_urls)
+        ],
+        options, correct_answer_str_list
+    )
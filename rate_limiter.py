@@ -0,0 +1,274 @@
+"""
+自适应限流模块
+每个主机一个限流器，由 UlearningAPI、DGUTUlearningAPI 和图片下载器共享：
+令牌桶限制请求速率（默认不限速），AIMD 控制同时进行的请求数——延迟平稳时并发窗口逐步加一，收到 429/5xx、超时或延迟突增时减半
+（设置了速率上限时 429/503 同时降低速率，之后逐步恢复），无需按学校手动调整并发数；当前速率和并发窗口可随时获取用于日志。
+答案和图片线程池默认按并发窗口上限创建（见 default_worker_count），实际并发数由窗口决定
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+
+from retry_policy import TRANSIENT, classify_error
+
+# 每个主机的请求速率上限（次/秒），0 表示不限速（默认）
+DEFAULT_RATE_LIMIT = float(os.getenv("RATE_LIMIT", "0"))
+# 令牌桶容量（允许的突发请求数），默认与速率上限相同
+DEFAULT_RATE_BURST = float(os.getenv("RATE_BURST", "0")) or None
+# 并发窗口的初始值、下限和上限，MAX_CONCURRENCY 为 0 表示不限制并发
+DEFAULT_INITIAL_CONCURRENCY = int(os.getenv("INITIAL_CONCURRENCY", "8"))
+DEFAULT_MIN_CONCURRENCY = int(os.getenv("MIN_CONCURRENCY", "1"))
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("MAX_CONCURRENCY", "32"))
+# 并发窗口不限制时线程池的默认大小
+FALLBACK_WORKERS = 8
+# 延迟超过基线的倍数（且至少多出 LATENCY_SPIKE_MIN_SECONDS 秒）视为延迟突增
+DEFAULT_LATENCY_SPIKE_FACTOR = float(os.getenv("LATENCY_SPIKE_FACTOR", "3"))
+LATENCY_SPIKE_MIN_SECONDS = 0.2
+# 速率被降低后每个成功请求恢复的比例（相对速率上限）
+RATE_RECOVERY_STEP = 0.01
+# 速率下限（次/秒）
+MIN_RATE = 0.5
+
+# 请求结果
+OK = "ok"
+THROTTLED = "throttled"    # 429/503：服务端明确要求放慢，降低并发和速率
+CONGESTED = "congested"    # 其他 5xx、超时、连接错误、延迟突增：降低并发
+NEUTRAL = "neutral"        # 与负载无关的失败，不调整
+
+
+def default_worker_count(env_name: str) -> int:
+    """
+    请求线程池的默认大小：环境变量未指定时取并发窗口上限，线程数足够让窗口增长到上限，
+    同时进行的请求数由限流器的窗口控制；并发不限制时为 FALLBACK_WORKERS
+
+    Args:
+        env_name: 指定线程数的环境变量名（如 ANSWER_WORKERS）
+    """
+    value = os.getenv(env_name)
+    if value:
+        return int(value)
+    return DEFAULT_MAX_CONCURRENCY or FALLBACK_WORKERS
+
+
+def classify_outcome(response: Optional[requests.Response], error: Optional[BaseException] = None) -> str:
+    """根据响应或异常判断请求结果对限流的意义"""
+    if error is not None:
+        return CONGESTED if classify_error(error) == TRANSIENT else NEUTRAL
+    if response.status_code in (429, 503):
+        return THROTTLED
+    if response.status_code >= 500:
+        return CONGESTED
+    return OK
+
+
+class AdaptiveRateLimiter:
+    """令牌桶限速 + AIMD 并发窗口，线程安全"""
+
+    def __init__(self, name: str = "default", rate: float = DEFAULT_RATE_LIMIT, burst: Optional[float] = DEFAULT_RATE_BURST,
+                 initial_concurrency: int = DEFAULT_INITIAL_CONCURRENCY, min_concurrency: int = DEFAULT_MIN_CONCURRENCY,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY, latency_spike_factor: float = DEFAULT_LATENCY_SPIKE_FACTOR):
+        """
+        Args:
+            name: 名称（通常为主机名），用于日志
+            rate: 速率上限（次/秒），小于等于0时不限速
+            burst: 令牌桶容量，默认等于 rate
+            initial_concurrency: 初始并发窗口
+            min_concurrency: 并发窗口下限
+            max_concurrency: 并发窗口上限，小于等于0时不限制并发
+            latency_spike_factor: 延迟超过基线多少倍视为突增
+        """
+        self.name = name
+        self.max_rate = max(0.0, rate)
+        self.burst = max(1.0, burst if burst else self.max_rate)
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(0, max_concurrency)
+        self.latency_spike_factor = latency_spike_factor
+        self._cond = threading.Condition()
+        self._rate = self.max_rate
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._window = float(min(max(initial_concurrency, self.min_concurrency), self.max_concurrency or initial_concurrency))
+        self._in_flight = 0
+        self._baseline: Optional[float] = None
+        self._last_decrease = 0.0
+        self._stats = {"requests": 0, "throttled": 0, "congested": 0, "latency_spikes": 0, "decreases": 0,
+                       "wait_seconds": 0.0}
+
+    # --- 获取/释放 ---
+
+    def acquire(self) -> float:
+        """等待并发窗口和令牌，返回请求开始时间"""
+        started_waiting = time.monotonic()
+        with self._cond:
+            while self.max_concurrency and self._in_flight >= max(1, int(self._window)):
+                self._cond.wait()
+            self._in_flight += 1
+        try:
+            self._take_token()
+        except BaseException:
+            self._finish(None)
+            raise
+        now = time.monotonic()
+        with self._cond:
+            self._stats["requests"] += 1
+            self._stats["wait_seconds"] += now - started_waiting
+        return now
+
+    def _take_token(self):
+        while True:
+            with self._cond:
+                if not self._rate:
+                    return
+                now = time.monotonic()
+                # 速率被降低时突发量也随之降低
+                burst = max(1.0, min(self.burst, self._rate))
+                self._tokens = min(burst, self._tokens + (now - self._refilled_at) * self._rate)
+                self._refilled_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._rate
+            time.sleep(wait)
+
+    def release(self, started_at: float, outcome: str):
+        """
+        释放并发名额并根据结果调整窗口和速率
+
+        Args:
+            started_at: acquire() 返回的开始时间
+            outcome: OK / THROTTLED / CONGESTED / NEUTRAL
+        """
+        self._finish((started_at, time.monotonic() - started_at, outcome))
+
+    def _finish(self, result):
+        with self._cond:
+            self._in_flight -= 1
+            if result is not None:
+                self._adjust(*result)
+            self._cond.notify_all()
+
+    def _adjust(self, started_at: float, latency: float, outcome: str):
+        """AIMD 调整（调用方持有锁）"""
+        if outcome == OK:
+            baseline = self._baseline
+            if baseline is not None and latency > baseline * self.latency_spike_factor \
+                    and latency - baseline > LATENCY_SPIKE_MIN_SECONDS:
+                self._stats["latency_spikes"] += 1
+                self._decrease(started_at, f"延迟 {latency:.2f}s, 基线 {baseline:.2f}s", throttle=False)
+                return
+            # 基线取近期较低的延迟：低于基线时立即跟随，高于时缓慢上调
+            self._baseline = latency if baseline is None or latency < baseline else baseline + (latency - baseline) * 0.05
+            if self.max_concurrency:
+                self._window = min(float(self.max_concurrency), self._window + 1.0 / max(self._window, 1.0))
+            if self.max_rate and self._rate < self.max_rate:
+                self._rate = min(self.max_rate, self._rate + self.max_rate * RATE_RECOVERY_STEP)
+        elif outcome == THROTTLED:
+            self._stats["throttled"] += 1
+            self._decrease(started_at, "服务端限流", throttle=True)
+        elif outcome == CONGESTED:
+            self._stats["congested"] += 1
+            self._decrease(started_at, "服务端错误或超时", throttle=False)
+
+    def _decrease(self, started_at: float, reason: str, throttle: bool):
+        """乘性减小；降低之前发出的请求的结果不再触发降低，避免一批失败把窗口连续减半"""
+        if started_at < self._last_decrease:
+            return
+        self._last_decrease = time.monotonic()
+        self._stats["decreases"] += 1
+        old_window, old_rate = self._window, self._rate
+        if self.max_concurrency:
+            self._window = max(float(self.min_concurrency), self._window / 2)
+        if throttle and self._rate:
+            self._rate = max(MIN_RATE, self._rate / 2)
+        print(f"  限流 {self.name}: 并发窗口 {old_window:.1f} -> {self._window:.1f}, "
+              f"速率 {old_rate:.1f} -> {self._rate:.1f}/s ({reason})")
+
+    # --- 包装请求 ---
+
+    def send(self, request: Callable[[], requests.Response]) -> requests.Response:
+        """在限流下发送一次请求（延迟按收到响应头计算），并用结果调整窗口和速率"""
+        started_at = self.acquire()
+        response = None
+        error = None
+        try:
+            response = request()
+            return response
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            if error is not None and not isinstance(error, Exception):
+                outcome = NEUTRAL
+            else:
+                outcome = classify_outcome(response, error)
+            self.release(started_at, outcome)
+
+    # --- 状态 ---
+
+    def state(self) -> Dict[str, Any]:
+        """当前速率、并发窗口、进行中的请求数、延迟基线及累计统计"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                "name": self.name,
+                "rate": round(self._rate, 2) if self._rate else None,
+                "window": round(self._window, 2) if self.max_concurrency else None,
+                "in_flight": self._in_flight,
+                "latency_baseline": round(self._baseline, 4) if self._baseline is not None else None,
+            })
+        stats["wait_seconds"] = round(stats["wait_seconds"], 3)
+        return stats
+
+    def format_state(self) -> str:
+        """生成一行可打印的状态信息"""
+        state = self.state()
+        rate = f"{state['rate']:.1f}/s" if state["rate"] else "不限"
+        window = f"{state['window']:.1f}" if state["window"] is not None else "不限"
+        return (f"限流 {self.name}: 速率 {rate}, 并发窗口 {window}, {state['requests']} 个请求, "
+                f"限流响应 {state['throttled']} 次, 错误/超时 {state['congested']} 次, 延迟突增 {state['latency_spikes']} 次, "
+                f"降低 {state['decreases']} 次, 累计等待 {state['wait_seconds']:.1f}s")
+
+
+_limiters: Dict[str, AdaptiveRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(url: str) -> AdaptiveRateLimiter:
+    """
+    获取URL所在主机的共享限流器，首次使用时按环境变量配置创建
+
+    Args:
+        url: 请求URL
+
+    Returns:
+        AdaptiveRateLimiter 实例
+    """
+    host = urlparse(url).netloc or "default"
+    limiter = _limiters.get(host)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(host)
+            if limiter is None:
+                limiter = _limiters[host] = AdaptiveRateLimiter(host)
+    return limiter
+
+
+def set_rate_limiter(host: str, limiter: Optional[AdaptiveRateLimiter]):
+    """为主机设置限流器（例如使用不同的速率上限），传入 None 时恢复按默认配置创建"""
+    with _limiters_lock:
+        if limiter is None:
+            _limiters.pop(host, None)
+        else:
+            _limiters[host] = limiter
+
+
+def format_rate_limiter_stats() -> str:
+    """所有主机限流器的状态，每行一个"""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return "\n".join(limiter.format_state() for limiter in limiters)
@@ -0,0 +1,215 @@
+"""
+API响应缓存模块
+基于 SQLite 持久化课程目录、章节内容和题目答案等接口响应，按端点设置过期时间，超过容量时按最近最少使用淘汰，
+用于重复导出（换格式导出、崩溃后重跑）时避免重复请求
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# 各端点默认缓存有效期（秒），未列出的端点不缓存
+DEFAULT_ENDPOINT_TTLS = {
+    "course_directory": 10 * 60,
+    "chapter_content": 24 * 3600,
+    "question_answer": 30 * 24 * 3600,
+}
+
+# 默认缓存容量上限（字节）
+DEFAULT_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+
+class ResponseCache:
+    """SQLite 响应缓存，线程安全"""
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES, ttls: Dict[str, float] = None):
+        """
+        初始化缓存
+
+        Args:
+            path: SQLite 数据库文件路径
+            max_bytes: 缓存内容总大小上限（字节）
+            ttls: 端点名称到有效期（秒）的映射，默认使用 DEFAULT_ENDPOINT_TTLS
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_ENDPOINT_TTLS if ttls is None else ttls)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " endpoint TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+
+    def is_cacheable(self, endpoint_name: Optional[str]) -> bool:
+        """端点是否启用缓存"""
+        return bool(endpoint_name) and self.ttls.get(endpoint_name, 0) > 0
+
+    @staticmethod
+    def make_key(endpoint_name: str, base_url: str, params: Optional[Dict] = None, namespace: str = "") -> str:
+        """
+        根据端点和规范化后的参数生成缓存键
+
+        Args:
+            endpoint_name: 逻辑端点名称
+            base_url: API基础URL（不同学校的数据互不混用）
+            params: 请求参数，键排序且值统一转为字符串
+            namespace: 客户端命名空间，不同客户端的原始响应格式不同，需分开存放
+
+        Returns:
+            缓存键
+        """
+        normalized = {str(k): str(v) for k, v in (params or {}).items() if v is not None}
+        raw = json.dumps([namespace, endpoint_name, base_url.rstrip("/"), normalized], sort_keys=True, ensure_ascii=False)
+        return f"{endpoint_name}:{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+    def _count(self, endpoint_name: str, field: str):
+        endpoint_stats = self._stats.setdefault(endpoint_name, {"hits": 0, "misses": 0, "stores": 0})
+        endpoint_stats[field] += 1
+
+    def get(self, endpoint_name: str, key: str) -> Optional[Any]:
+        """
+        读取未过期的缓存
+
+        Args:
+            endpoint_name: 逻辑端点名称
+            key: 缓存键
+
+        Returns:
+            缓存的响应，未命中返回 None
+        """
+        ttl = self.ttls.get(endpoint_name, 0)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > ttl:
+                self._count(endpoint_name, "misses")
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._count(endpoint_name, "hits")
+        return json.loads(row[0])
+
+    def set(self, endpoint_name: str, key: str, value: Any):
+        """
+        写入缓存，必要时淘汰最久未使用的条目
+
+        Args:
+            endpoint_name: 逻辑端点名称
+            key: 缓存键
+            value: 可 JSON 序列化的响应
+        """
+        payload = json.dumps(value, ensure_ascii=False)
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, endpoint, payload, size, created_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, endpoint_name, payload, size, now, now)
+            )
+            self._count(endpoint_name, "stores")
+            if self._total_bytes_locked() > self.max_bytes:
+                self._evict_locked()
+
+    def _total_bytes_locked(self) -> int:
+        """数据库中缓存内容的总大小；多个进程可能共用同一个数据库文件，因此每次从数据库统计（调用方需持有锁）"""
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _evict_locked(self):
+        """按 last_access 淘汰条目，直到总大小降到上限的 90%（调用方需持有锁）"""
+        target = int(self.max_bytes * 0.9)
+        # 统计和删除放在同一个写事务中，避免与其他进程的淘汰交错
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            total_bytes = self._total_bytes_locked()
+            rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall()
+            evicted = []
+            for key, size in rows:
+                if total_bytes <= target:
+                    break
+                evicted.append((key,))
+                total_bytes -= size
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def invalidate(self, key: str):
+        """删除单个缓存条目"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def stats(self) -> Dict[str, Any]:
+        """返回按端点统计的命中/未命中次数及缓存大小"""
+        with self._lock:
+            endpoints = {name: dict(values) for name, values in self._stats.items()}
+            total_bytes = self._total_bytes_locked()
+        hits = sum(values["hits"] for values in endpoints.values())
+        misses = sum(values["misses"] for values in endpoints.values())
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "bytes": total_bytes,
+            "endpoints": endpoints,
+        }
+
+    def format_stats(self) -> str:
+        """生成一行可打印的统计信息"""
+        stats = self.stats()
+        parts = [f"{name} {values['hits']}/{values['hits'] + values['misses']}"
+                 for name, values in sorted(stats["endpoints"].items())]
+        return (f"响应缓存命中率 {stats['hit_rate']:.1%} ({stats['hits']} 命中 / {stats['misses']} 未命中, "
+                f"{stats['bytes'] / 1024:.0f} KiB)" + (f": {', '.join(parts)}" if parts else ""))
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache: Optional[ResponseCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_response_cache() -> Optional[ResponseCache]:
+    """
+    获取全局响应缓存；仅当设置了 RESPONSE_CACHE_DB 环境变量时自动创建
+
+    Returns:
+        ResponseCache 实例或 None
+    """
+    global _default_cache
+    if _default_cache is None and os.getenv("RESPONSE_CACHE_DB"):
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = ResponseCache(os.getenv("RESPONSE_CACHE_DB"))
+    return _default_cache
+
+
+def set_default_response_cache(cache: Optional[ResponseCache]):
+    """设置全局响应缓存（例如根据命令行参数创建）"""
+    global _default_cache
+    _default_cache = cache
@@ -0,0 +1,251 @@
+"""
+请求重试策略模块
+把请求失败分为“暂时性”（超时、连接重置、5xx、429 等，值得重试）和“确定性”（404/405 等，应换用其他路径）两类；
+暂时性失败按指数退避加随机抖动重试，遵循 Retry-After，并按端点限制重试次数和重试预算（重试量不超过请求量的一定比例），
+避免一次偶发超时就回退到旧接口或在服务端过载时放大请求量
+"""
+
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional
+
+import requests
+
+# 默认每次请求的最大尝试次数（含首次）
+DEFAULT_RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", "3"))
+# 退避基准延迟和上限（秒）
+DEFAULT_RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.5"))
+DEFAULT_RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "10"))
+# Retry-After 的最大等待时间（秒），超过时放弃重试
+DEFAULT_MAX_RETRY_AFTER = float(os.getenv("RETRY_MAX_RETRY_AFTER", "60"))
+# 重试预算：每个请求为所在端点积累的重试额度，以及额度上限（允许的突发重试数）
+DEFAULT_RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.2"))
+DEFAULT_RETRY_BUDGET_BURST = float(os.getenv("RETRY_BUDGET_BURST", "10"))
+# 是否逐条打印请求和重试信息；默认关闭，重试次数已计入运行指标和 stats()
+VERBOSE_REQUESTS = os.getenv("VERBOSE_REQUESTS", "0").lower() in ("1", "true", "yes")
+
+# 各端点的最大尝试次数，未列出的端点使用 DEFAULT_RETRY_ATTEMPTS；
+# 心跳和个人数据同步不是幂等操作，超时后无法确认服务端是否已处理，不重试
+DEFAULT_ENDPOINT_ATTEMPTS = {
+    "study_heartbeat": 1,
+    "sync_personal_data": 1,
+}
+
+# 失败类型
+TRANSIENT = "transient"
+DEFINITIVE = "definitive"
+
+# 值得重试的状态码
+RETRYABLE_STATUS_CODES = frozenset([408, 425, 429, 500, 502, 503, 504])
+
+
+def classify_status(status_code: Optional[int]) -> str:
+    """按 HTTP 状态码判断失败类型"""
+    if status_code is None or status_code in RETRYABLE_STATUS_CODES or status_code >= 500:
+        return TRANSIENT
+    return DEFINITIVE
+
+
+def classify_error(error: BaseException) -> str:
+    """
+    判断请求异常的失败类型
+
+    Args:
+        error: requests 抛出的异常、响应 JSON 解析失败的 ValueError 等
+
+    Returns:
+        TRANSIENT 或 DEFINITIVE
+    """
+    if isinstance(error, requests.exceptions.HTTPError):
+        response = error.response
+        return classify_status(response.status_code if response is not None else None)
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                          requests.exceptions.ChunkedEncodingError, ConnectionError, TimeoutError)):
+        return TRANSIENT
+    # 无效URL、响应不是 JSON 等，重试也不会得到不同结果
+    return DEFINITIVE
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 头（秒数或 HTTP 日期），无法解析时返回 None"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class RetryPolicy:
+    """按端点重试的策略，线程安全，可被多个客户端共享"""
+
+    def __init__(self, max_attempts: int = DEFAULT_RETRY_ATTEMPTS, base_delay: float = DEFAULT_RETRY_BASE_DELAY,
+                 max_delay: float = DEFAULT_RETRY_MAX_DELAY, max_retry_after: float = DEFAULT_MAX_RETRY_AFTER,
+                 endpoint_attempts: Optional[Dict[str, int]] = None, budget_ratio: float = DEFAULT_RETRY_BUDGET_RATIO,
+                 budget_burst: float = DEFAULT_RETRY_BUDGET_BURST, sleep: Callable[[float], None] = time.sleep,
+                 verbose: bool = VERBOSE_REQUESTS):
+        """
+        Args:
+            max_attempts: 默认最大尝试次数（含首次），1 表示不重试
+            base_delay: 第一次重试前的最大退避时间（秒），之后每次翻倍
+            max_delay: 单次退避时间上限（秒）
+            max_retry_after: 服务端要求的等待时间超过该值时不再重试
+            endpoint_attempts: 端点名称到最大尝试次数的映射，默认使用 DEFAULT_ENDPOINT_ATTEMPTS
+            budget_ratio: 每个请求为端点积累的重试额度
+            budget_burst: 重试额度上限，也是初始额度
+            sleep: 等待函数
+            verbose: 是否打印每次重试
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.endpoint_attempts = dict(DEFAULT_ENDPOINT_ATTEMPTS if endpoint_attempts is None else endpoint_attempts)
+        self.budget_ratio = budget_ratio
+        self.budget_burst = budget_burst
+        self._sleep = sleep
+        self.verbose = verbose
+        self._lock = threading.Lock()
+        self._budgets: Dict[str, float] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def attempts_for(self, endpoint_name: Optional[str]) -> int:
+        """端点的最大尝试次数"""
+        return max(1, self.endpoint_attempts.get(endpoint_name, self.max_attempts))
+
+    def backoff(self, retry_index: int) -> float:
+        """第 retry_index 次重试（从 0 开始）前的等待时间：指数退避上限内均匀随机（full jitter）"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** retry_index)))
+
+    def send(self, endpoint_name: Optional[str], request: Callable[[], requests.Response]) -> requests.Response:
+        """
+        发送请求，暂时性失败时按策略重试
+
+        Args:
+            endpoint_name: 端点名称，用于重试次数、预算和统计
+            request: 发送一次请求并返回响应的函数
+
+        Returns:
+            最后一次的响应（状态码可能仍是可重试的错误，由调用方 raise_for_status）
+
+        Raises:
+            最后一次请求抛出的异常
+        """
+        name = endpoint_name or "default"
+        max_attempts = self.attempts_for(endpoint_name)
+        self._deposit(name)
+        attempt = 0
+        while True:
+            attempt += 1
+            error = None
+            response = None
+            try:
+                response = request()
+            except Exception as e:
+                if classify_error(e) != TRANSIENT:
+                    raise
+                error = e
+            if error is None and classify_status(response.status_code) != TRANSIENT:
+                return response
+
+            reason = str(error) if error is not None else f"HTTP {response.status_code}"
+            delay = self.backoff(attempt - 1)
+            if response is not None:
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if retry_after is not None:
+                    if retry_after > self.max_retry_after:
+                        self._count(name, "gave_up")
+                        return response
+                    delay = retry_after
+            if attempt >= max_attempts or not self._withdraw(name):
+                self._count(name, "gave_up")
+                if error is not None:
+                    raise error
+                return response
+
+            self._count(name, "retries")
+            if self.verbose:
+                print(f"  {name} 请求失败 ({reason})，{delay:.1f}s 后重试 ({attempt}/{max_attempts - 1})")
+            if response is not None:
+                response.close()
+            self._sleep(delay)
+
+    def _deposit(self, name: str):
+        with self._lock:
+            budget = self._budgets.get(name, self.budget_burst)
+            self._budgets[name] = min(self.budget_burst, budget + self.budget_ratio)
+            self._count_locked(name, "requests")
+
+    def _withdraw(self, name: str) -> bool:
+        """从端点的重试预算中取出一次重试额度，额度不足时返回 False"""
+        with self._lock:
+            budget = self._budgets.get(name, self.budget_burst)
+            if budget < 1:
+                self._count_locked(name, "budget_exhausted")
+                return False
+            self._budgets[name] = budget - 1
+            return True
+
+    def _count(self, name: str, field: str):
+        with self._lock:
+            self._count_locked(name, field)
+
+    def _count_locked(self, name: str, field: str):
+        endpoint_stats = self._stats.setdefault(
+            name, {"requests": 0, "retries": 0, "gave_up": 0, "budget_exhausted": 0})
+        endpoint_stats[field] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """返回按端点统计的请求数、重试次数、放弃次数和预算耗尽次数"""
+        with self._lock:
+            endpoints = {name: dict(values) for name, values in self._stats.items()}
+        return {
+            "requests": sum(values["requests"] for values in endpoints.values()),
+            "retries": sum(values["retries"] for values in endpoints.values()),
+            "gave_up": sum(values["gave_up"] for values in endpoints.values()),
+            "endpoints": endpoints,
+        }
+
+    def format_stats(self) -> str:
+        """生成一行可打印的统计信息"""
+        stats = self.stats()
+        parts = [f"{name} {values['retries']}" for name, values in sorted(stats["endpoints"].items())
+                 if values["retries"] or values["gave_up"]]
+        return (f"请求重试: {stats['retries']} 次 / {stats['requests']} 个请求, 放弃 {stats['gave_up']} 次"
+                + (f": {', '.join(parts)}" if parts else ""))
+
+
+_default_policy: Optional[RetryPolicy] = None
+_default_policy_lock = threading.Lock()
+
+
+def get_default_retry_policy() -> RetryPolicy:
+    """
+    获取全局重试策略，首次调用时按环境变量配置创建
+
+    Returns:
+        RetryPolicy 实例
+    """
+    global _default_policy
+    if _default_policy is None:
+        with _default_policy_lock:
+            if _default_policy is None:
+                _default_policy = RetryPolicy()
+    return _default_policy
+
+
+def set_default_retry_policy(policy: Optional[RetryPolicy]):
+    """设置全局重试策略（传入 RetryPolicy(max_attempts=1) 可关闭重试）"""
+    global _default_policy
+    _default_policy = policy
@@ -0,0 +1,359 @@
+"""
+运行指标模块
+按逻辑端点（course_directory、chapter_content、question_answer、images 等）记录请求数、响应字节数、状态码、
+重试次数、缓存命中数和延迟直方图（p50/p95/p99）；运行结束时写出 JSON 报告，可选写出 Prometheus 文本格式，
+便于对比不同运行之间的性能回退。延迟为调用方实际等待的时间（含重试和限流等待）
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+from adaptive_timeout import get_default_latency_tracker, percentile
+
+# JSON 报告路径，设置为空字符串时不写报告
+DEFAULT_METRICS_REPORT = os.getenv("METRICS_REPORT", "run_metrics.json")
+# Prometheus 文本格式输出路径，为空时不写
+DEFAULT_METRICS_PROMETHEUS = os.getenv("METRICS_PROMETHEUS", "")
+# 延迟直方图的桶上界（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# 报告中的分位数
+QUANTILES = (0.5, 0.95, 0.99)
+# Prometheus 指标名前缀
+METRIC_PREFIX = "ulearning"
+
+
+class _Endpoint:
+    """单个端点的计数和延迟样本（由 RunMetrics 加锁访问）"""
+
+    __slots__ = ("requests", "errors", "retries", "cache_hits", "bytes", "status_codes", "error_types",
+                 "latencies", "buckets")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.bytes = 0
+        self.status_codes: Dict[str, int] = {}
+        self.error_types: Dict[str, int] = {}
+        self.latencies: List[float] = []
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+
+
+class Measurement:
+    """
+    一次逻辑请求的计量，由 RunMetrics.measure() 创建，作为上下文管理器使用
+
+    退出时记录耗时、状态码（取 response 或 HTTPError 中的响应，无响应时为 "error"）、字节数和重试次数；
+    不吞掉异常
+    """
+
+    def __init__(self, metrics: "RunMetrics", endpoint_name: str):
+        self._metrics = metrics
+        self.endpoint_name = endpoint_name
+        # 实际发送次数，经 wrap() 包装的发送函数每调用一次加一
+        self.attempts = 0
+        # 最终响应，由调用方设置
+        self.response: Optional[requests.Response] = None
+        # 响应字节数，为 None 时按响应内容长度计算（流式下载需由调用方设置）
+        self.bytes: Optional[int] = None
+        self._started = 0.0
+
+    def wrap(self, send: Callable[[], requests.Response]) -> Callable[[], requests.Response]:
+        """包装单次发送函数以统计尝试次数（交给重试策略的函数）"""
+        def _attempt():
+            self.attempts += 1
+            return send()
+        return _attempt
+
+    def __enter__(self) -> "Measurement":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        latency = time.perf_counter() - self._started
+        response = self.response
+        if isinstance(exc, requests.exceptions.RequestException) and exc.response is not None:
+            response = exc.response
+        size = self.bytes
+        if size is None:
+            size = 0
+            if response is not None:
+                try:
+                    size = len(response.content or b"")
+                except (RuntimeError, requests.exceptions.RequestException):
+                    pass
+        self._metrics.record(self.endpoint_name, latency,
+                             status=str(response.status_code) if response is not None else "error",
+                             size=size, retries=max(0, self.attempts - 1),
+                             error=type(exc).__name__ if exc is not None else None)
+        return False
+
+
+class RunMetrics:
+    """按端点汇总的运行指标，线程安全，可被多个客户端共享"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, _Endpoint] = {}
+        self._started_at = time.time()
+        self._started = time.perf_counter()
+
+    # --- 记录 ---
+
+    def measure(self, endpoint_name: Optional[str]) -> Measurement:
+        """创建一次逻辑请求的计量（with 语句中使用）"""
+        return Measurement(self, endpoint_name or "default")
+
+    def record(self, endpoint_name: Optional[str], latency: float, status: str = "200", size: int = 0,
+               retries: int = 0, error: Optional[str] = None):
+        """
+        记录一次逻辑请求
+
+        Args:
+            endpoint_name: 端点名称
+            latency: 耗时（秒）
+            status: HTTP 状态码，未收到响应时为 "error"
+            size: 响应字节数
+            retries: 重试次数
+            error: 失败时的异常类型名
+        """
+        with self._lock:
+            endpoint = self._endpoint_locked(endpoint_name or "default")
+            endpoint.requests += 1
+            endpoint.retries += retries
+            endpoint.bytes += size
+            endpoint.status_codes[status] = endpoint.status_codes.get(status, 0) + 1
+            if error is not None:
+                endpoint.errors += 1
+                endpoint.error_types[error] = endpoint.error_types.get(error, 0) + 1
+            endpoint.latencies.append(latency)
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if latency <= bound:
+                    endpoint.buckets[index] += 1
+
+    def record_cache_hit(self, endpoint_name: Optional[str]):
+        """记录一次不经网络、直接从缓存（响应缓存、已下载的图片等）得到结果的请求"""
+        with self._lock:
+            self._endpoint_locked(endpoint_name or "default").cache_hits += 1
+
+    def _endpoint_locked(self, name: str) -> _Endpoint:
+        endpoint = self._endpoints.get(name)
+        if endpoint is None:
+            endpoint = self._endpoints[name] = _Endpoint()
+        return endpoint
+
+    # --- 报告 ---
+
+    def report(self, labels: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        生成报告：每个端点的计数、状态码、错误类型和延迟分布（秒）
+
+        Args:
+            labels: 附加到报告中的标识（如课程ID），便于区分不同运行
+        """
+        with self._lock:
+            endpoints = {}
+            for name, endpoint in sorted(self._endpoints.items()):
+                latencies = endpoint.latencies
+                latency = {"count": len(latencies), "sum": round(sum(latencies), 6)}
+                if latencies:
+                    latency["mean"] = round(sum(latencies) / len(latencies), 6)
+                    for quantile in QUANTILES:
+                        latency[f"p{round(quantile * 100)}"] = round(percentile(latencies, quantile), 6)
+                    latency["max"] = round(max(latencies), 6)
+                latency["buckets"] = {str(bound): count for bound, count in zip(LATENCY_BUCKETS, endpoint.buckets)}
+                endpoints[name] = {
+                    "requests": endpoint.requests,
+                    "errors": endpoint.errors,
+                    "retries": endpoint.retries,
+                    "cache_hits": endpoint.cache_hits,
+                    "bytes": endpoint.bytes,
+                    "status_codes": dict(sorted(endpoint.status_codes.items())),
+                    "error_types": dict(sorted(endpoint.error_types.items())),
+                    "latency_seconds": latency,
+                }
+        totals = {field: sum(values[field] for values in endpoints.values())
+                  for field in ("requests", "errors", "retries", "cache_hits", "bytes")}
+        return {
+            "started_at": round(self._started_at, 3),
+            "elapsed_seconds": round(time.perf_counter() - self._started, 3),
+            "labels": dict(labels or {}),
+            "totals": totals,
+            "endpoints": endpoints,
+        }
+
+    def prometheus_text(self, labels: Optional[Dict[str, Any]] = None) -> str:
+        """
+        生成 Prometheus 文本格式（exposition format 0.0.4）的指标
+
+        Args:
+            labels: 附加到每个样本上的标签（如 course_id）
+        """
+        report = self.report(labels)
+        base = {str(key): str(value) for key, value in (labels or {}).items()}
+        lines = []
+
+        def _family(name, metric_type, help_text):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {metric_type}")
+
+        def _sample(name, value, **extra):
+            sample_labels = dict(base, **extra)
+            label_text = ",".join(f'{key}="{_escape_label(value_)}"' for key, value_ in sample_labels.items())
+            lines.append(f"{METRIC_PREFIX}_{name}{{{label_text}}} {_format_value(value)}" if label_text
+                         else f"{METRIC_PREFIX}_{name} {_format_value(value)}")
+
+        endpoints = report["endpoints"]
+        _family("requests_total", "counter", "Logical requests by endpoint and final HTTP status")
+        for name, values in endpoints.items():
+            for status, count in values["status_codes"].items():
+                _sample("requests_total", count, endpoint=name, status=status)
+        _family("request_errors_total", "counter", "Failed logical requests by endpoint and error type")
+        for name, values in endpoints.items():
+            for error, count in values["error_types"].items():
+                _sample("request_errors_total", count, endpoint=name, error=error)
+        for field, help_text in (("retries", "Retried attempts"),
+                                 ("cache_hits", "Results served from cache without a request"),
+                                 ("response_bytes", "Response body bytes")):
+            _family(f"{field}_total", "counter", f"{help_text} by endpoint")
+            for name, values in endpoints.items():
+                _sample(f"{field}_total", values["bytes" if field == "response_bytes" else field], endpoint=name)
+        _family("request_duration_seconds", "histogram", "Logical request latency including retries")
+        for name, values in endpoints.items():
+            latency = values["latency_seconds"]
+            for bound, count in latency["buckets"].items():
+                _sample("request_duration_seconds_bucket", count, endpoint=name, le=bound)
+            _sample("request_duration_seconds_bucket", latency["count"], endpoint=name, le="+Inf")
+            _sample("request_duration_seconds_sum", latency["sum"], endpoint=name)
+            _sample("request_duration_seconds_count", latency["count"], endpoint=name)
+        _family("request_duration_quantile_seconds", "gauge", "Latency quantiles over the whole run")
+        for name, values in endpoints.items():
+            for quantile in QUANTILES:
+                key = f"p{round(quantile * 100)}"
+                if key in values["latency_seconds"]:
+                    _sample("request_duration_quantile_seconds", values["latency_seconds"][key],
+                            endpoint=name, quantile=str(quantile))
+        return "\n".join(lines) + "\n"
+
+    def write(self, report_path: Optional[str] = DEFAULT_METRICS_REPORT,
+              prometheus_path: Optional[str] = DEFAULT_METRICS_PROMETHEUS,
+              labels: Optional[Dict[str, Any]] = None) -> List[str]:
+        """
+        写出 JSON 报告和 Prometheus 文本（先写临时文件再替换），路径为空时跳过
+
+        Returns:
+            成功写出的文件路径
+        """
+        written = []
+        for path, render in ((report_path, lambda: json.dumps(self.report(labels), ensure_ascii=False, indent=2)),
+                             (prometheus_path, lambda: self.prometheus_text(labels))):
+            if not path:
+                continue
+            try:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(render())
+                os.replace(tmp_path, path)
+                written.append(path)
+            except OSError as e:
+                print(f"保存运行指标失败: {e}")
+        return written
+
+    def format_stats(self) -> str:
+        """生成可打印的统计信息，每个端点一行"""
+        lines = []
+        for name, values in self.report()["endpoints"].items():
+            latency = values["latency_seconds"]
+            line = (f"请求指标 {name}: {values['requests']} 次, 失败 {values['errors']}, 重试 {values['retries']}, "
+                    f"缓存命中 {values['cache_hits']}, {values['bytes'] / 1024:.0f} KiB")
+            if latency["count"]:
+                line += (f", p50 {latency['p50'] * 1000:.0f}ms / p95 {latency['p95'] * 1000:.0f}ms"
+                         f" / p99 {latency['p99'] * 1000:.0f}ms")
+            lines.append(line)
+        return "\n".join(lines) if lines else "请求指标: 无请求"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+_default_metrics: Optional[RunMetrics] = None
+_default_metrics_lock = threading.Lock()
+
+
+def get_default_run_metrics() -> RunMetrics:
+    """
+    获取全局运行指标，首次调用时创建
+
+    Returns:
+        RunMetrics 实例
+    """
+    global _default_metrics
+    if _default_metrics is None:
+        with _default_metrics_lock:
+            if _default_metrics is None:
+                _default_metrics = RunMetrics()
+    return _default_metrics
+
+
+def set_default_run_metrics(metrics: Optional[RunMetrics]):
+    """设置全局运行指标，传入 None 时下次使用时重新创建"""
+    global _default_metrics
+    _default_metrics = metrics
+
+
+def report_run_stats(labels: Optional[Dict[str, Any]] = None,
+                     report_path: Optional[str] = DEFAULT_METRICS_REPORT,
+                     prometheus_path: Optional[str] = DEFAULT_METRICS_PROMETHEUS) -> List[str]:
+    """
+    运行结束时打印响应缓存、重试、限流、超时、连接池、路由和请求指标的统计，保存延迟统计并写出运行指标；
+    各导出入口共用，新增统计来源时只需在这里添加
+
+    Args:
+        labels: 写入报告的标签（脚本名、课程ID等）
+        report_path: JSON 报告路径，为空时不写
+        prometheus_path: Prometheus 文本路径，为空时不写
+
+    Returns:
+        成功写出的指标文件路径
+    """
+    from rate_limiter import format_rate_limiter_stats
+    from response_cache import get_default_response_cache
+    from retry_policy import get_default_retry_policy
+    from transport import get_default_transport
+
+    response_cache = get_default_response_cache()
+    if response_cache is not None:
+        print(response_cache.format_stats())
+    print(get_default_retry_policy().format_stats())
+    print(format_rate_limiter_stats())
+    latency_tracker = get_default_latency_tracker()
+    print(latency_tracker.format_stats())
+    latency_tracker.save()
+    print(get_default_transport().format_stats())
+    try:
+        from api_adapter import get_default_api_adapter
+    except ImportError:
+        get_default_api_adapter = None
+    if get_default_api_adapter is not None and get_default_api_adapter().routing_stats():
+        print(get_default_api_adapter().format_routing_stats())
+
+    run_metrics = get_default_run_metrics()
+    print(run_metrics.format_stats())
+    written = run_metrics.write(report_path, prometheus_path, labels=labels)
+    for path in written:
+        print(f"运行指标已保存到: {path}")
+    return written
@@ -0,0 +1,238 @@
+"""
+刷题平台 JSON 格式模块
+把题目转换为刷题平台的完整条目（含原始数据）和刷题软件使用的精简条目，并写出 JSON 文件；
+题型按接口题型码推断，题型码缺失或不可靠时参考题干中的填空元素和答案形式
+"""
+
+import json
+import os
+import re
+
+from html_backends import clean_html_text
+from question_ir import HtmlFragment, has_blank_inputs
+
+
+def get_clean_text_from_html(html_content):
+    if not html_content or not isinstance(html_content, str): return ""
+    return clean_html_text(html_content)
+
+def has_fill_inputs(html_content: str) -> bool:
+    return has_blank_inputs(html_content)
+
+def build_fill_stem(title_html: str, answers: list) -> str:
+    # 填空位置在解析时已记录，同一题干按片段缓存，不同答案无需重新解析
+    return HtmlFragment.parse(title_html).render_blanks(answers, separator="")
+
+def _answers_look_like_choice_letters(answers: list) -> bool:
+    if not answers:
+        return False
+    normalized = []
+    for a in answers:
+        text = re.sub(r"[^A-Za-z]", "", (a or "")).upper()
+        if not text:
+            continue
+        normalized.append(text)
+    if not normalized:
+        return False
+    for text in normalized:
+        if not text.isalpha():
+            return False
+        if len(text) > 2:
+            return False
+    return True
+
+def _answers_look_like_true_false(answers: list) -> bool:
+    if not answers:
+        return False
+    tf_keywords = {"t", "f", "true", "false", "对", "错", "正确", "错误"}
+    normalized = set()
+    for a in answers:
+        if not a:
+            continue
+        text = re.sub(r"\s+", "", str(a).strip()).lower()
+        if text:
+            normalized.add(text)
+    return bool(normalized) and normalized.issubset(tf_keywords)
+
+def infer_platform_question_type(q_data: dict, answer_data: dict) -> str:
+    raw_type = q_data.get("type")
+    inferred = get_question_type_name(raw_type, for_platform=True)
+    has_options = bool(q_data.get("choiceitemModels"))
+    title_html = q_data.get("title", "") or ""
+    answers = []
+    if answer_data and answer_data.get("correctAnswerList"):
+        answers = [get_clean_text_from_html(str(ans)) for ans in answer_data["correctAnswerList"]]
+    elif answer_data and answer_data.get("answer"):
+        answers = [get_clean_text_from_html(str(answer_data["answer"]))]
+
+    if raw_type == 5:
+        return "填空题"
+    if has_fill_inputs(title_html):
+        return "填空题"
+    if not has_options and answers:
+        if not _answers_look_like_choice_letters(answers) and not _answers_look_like_true_false(answers):
+            return "填空题"
+
+    if inferred == "未知题型" and raw_type in (3, 5):
+        return "填空题"
+
+    return inferred
+
+def get_question_type_name(type_code_from_api, for_platform=False):
+    # API 的 type_code: 1:单选, 2:多选, 4:判断, 5:填空, (可能还有其他，如简答)
+    # 刷题平台格式: "选择题", "判断题", "填空题", "问答题"
+    if for_platform:
+        if type_code_from_api == 1: return "选择题"
+        if type_code_from_api == 2: return "选择题" # 多选也归为选择题
+        if type_code_from_api == 4: return "判断题"
+        if type_code_from_api == 5: return "填空题"
+        # 假设API中的简答题类型是6 (基于之前的get_question_type_name)
+        if type_code_from_api == 6: return "问答题" 
+        return "未知题型" # 平台未知
+    else: # 原来的逻辑，用于MD/TeX
+        type_map = {1: "单选题", 2: "多选题", 4: "判断题", 5: "填空题", 6: "简答题/论述题"}
+        return type_map.get(type_code_from_api, f"API未知题型({type_code_from_api})")
+
+def generate_json_output(data, output_dir, filename, is_complete_json=False, compact=False):
+    """
+    Generates a JSON file from the provided data.
+
+    Args:
+        data: The list of question dictionaries.
+        output_dir: The directory to save the file in.
+        filename: The name of the output file.
+        is_complete_json: If True, saves the full original data structure.
+                          If False, saves the simplified format for the platform.
+        compact: If True, writes without indentation or extra spaces.
+    """
+    output_path = os.path.join(output_dir, filename)
+    try:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            # Use json.dump for proper JSON formatting, escaping, and indentation
+            if compact:
+                json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+            else:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+        print(f"Successfully generated JSON file: {output_path}")
+    except Exception as e:
+        print(f"Error writing JSON file {filename}: {e}")
+
+def build_platform_entry(q_data, answer_data, context):
+    """
+    将单道题目转换为刷题平台格式的完整条目（含原始数据），检查点日志保存的也是该条目
+
+    Args:
+        q_data: questionDTOList 中的题目数据
+        answer_data: get_question_answer 返回的答案数据
+        context: 课程/章节/单元信息（course_name_raw, chapter_title_raw, unit_title_raw, parent_id）
+    """
+    platform_entry = {} # For the new format
+
+    question_id = q_data.get("questionid")
+    q_title_html = q_data.get("title", "N/A")
+    q_type_code_api = q_data.get("type") # API's type code
+    q_options_raw_api = q_data.get("choiceitemModels", [])
+
+    correct_answers_clean_list = []
+    if answer_data and answer_data.get("correctAnswerList"):
+        correct_answers_clean_list = [get_clean_text_from_html(str(ans)) for ans in answer_data["correctAnswerList"]]
+    elif answer_data and answer_data.get("answer"):
+        correct_answers_clean_list = [get_clean_text_from_html(str(answer_data["answer"]))]
+
+    # Infer platform-specific question type
+    platform_entry["题型"] = infer_platform_question_type(q_data, answer_data)
+
+    # Get clean question stem
+    if platform_entry["题型"] == "填空题":
+        question_stem_clean = build_fill_stem(q_title_html, correct_answers_clean_list)
+    else:
+        question_stem_clean = get_clean_text_from_html(q_title_html)
+
+    # Attach extra metadata for a "full" JSON
+    platform_entry["课程名称"] = context["course_name_raw"]
+    platform_entry["章节名称"] = context["chapter_title_raw"]
+    platform_entry["单元名称"] = context["unit_title_raw"]
+    platform_entry["题目ID"] = question_id
+    platform_entry["ParentID"] = context["parent_id"]
+    platform_entry["原始题型码"] = q_type_code_api
+    platform_entry["原始题干HTML"] = q_title_html
+    platform_entry["原始选项HTML"] = [opt.get("title", "") for opt in q_options_raw_api] if q_options_raw_api else []
+    platform_entry["原始答案数据"] = answer_data
+
+    # --- Populate platform_entry based on question type ---
+    if platform_entry["题型"] == "选择题":
+        platform_entry["题干"] = question_stem_clean
+        options_list = []
+        for opt_idx, opt in enumerate(q_options_raw_api):
+            opt_text = HtmlFragment.parse(opt.get("title", "")).text
+            options_list.append(opt_text)
+        platform_entry["选项"] = options_list
+
+        # The correct_answers_clean_list already contains the option letters (e.g., ['A', 'B'])
+        # We just need to join and sort them.
+        platform_entry["答案"] = "".join(sorted(list(set(correct_answers_clean_list))))
+        # Remove debug prints as the issue is understood
+        # if not platform_entry["答案"] and correct_answers_clean_list:
+        #     print(f"        DEBUG: Failed to map correct answer to options for QID {question_id}.")
+        #     print(f"        DEBUG: Raw correct_answers_clean_list: {correct_answers_clean_list}")
+        #     print(f"        DEBUG: Raw q_options_raw_api: {json.dumps(q_options_raw_api, indent=2, ensure_ascii=False)}")
+        #     pass
+
+    elif platform_entry["题型"] == "判断题":
+        platform_entry["题干"] = question_stem_clean
+        ans_text = correct_answers_clean_list[0].lower() if correct_answers_clean_list else ""
+        platform_entry["答案"] = "正确" if ans_text in ["true", "t", "对"] else "错误"
+
+    elif platform_entry["题型"] == "填空题":
+        platform_entry["题干"] = question_stem_clean
+
+    elif platform_entry["题型"] == "问答题":
+        platform_entry["题干"] = question_stem_clean
+        platform_entry["答案"] = "\n".join(correct_answers_clean_list) # Join parts if any
+
+    else: # Unknown type for platform
+        platform_entry["题型"] = "未知题型"
+        platform_entry["题干"] = question_stem_clean
+        platform_entry["答案"] = "未知题型答案: " + " | ".join(correct_answers_clean_list)
+
+    platform_entry["解析"] = "" # Placeholder, need to check if API provides this
+    return platform_entry
+
+def build_shuati_entry(entry):
+    """
+    将完整条目转换为刷题软件使用的精简条目
+
+    Returns:
+        精简条目；其他类型（例如 未知题型）不导出到刷题 JSON，返回 None
+    """
+    qtype = entry.get("题型")
+    if qtype == "选择题":
+        return {
+            "题型": "选择题",
+            "题干": entry.get("题干", ""),
+            "选项": entry.get("选项", []) or [],
+            "答案": entry.get("答案", "") or "",
+            "解析": entry.get("解析", "") or "",
+        }
+    elif qtype == "判断题":
+        return {
+            "题型": "判断题",
+            "题干": entry.get("题干", ""),
+            "答案": entry.get("答案", "") or "",
+            "解析": entry.get("解析", "") or "",
+        }
+    elif qtype == "填空题":
+        # 填空题的答案已经通过 build_fill_stem 嵌入到题干中的 {答案} 占位里
+        return {
+            "题型": "填空题",
+            "题干": entry.get("题干", ""),
+            "解析": entry.get("解析", "") or "",
+        }
+    elif qtype == "问答题":
+        return {
+            "题型": "问答题",
+            "题干": entry.get("题干", ""),
+            "答案": entry.get("答案", "") or "",
+            "解析": entry.get("解析", "") or "",
+        }
+    return None
@@ -0,0 +1,57 @@
+"""多进程共用 AssetStore 时索引的合并和临时文件清理"""
+
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from asset_store import STALE_TEMP_SECONDS, AssetStore
+
+
+def _store_images(root, prefix, count):
+    store = AssetStore(root)
+    for index in range(count):
+        tmp_path = store.new_temp_path()
+        with open(tmp_path, "wb") as f:
+            f.write(f"{prefix}-{index}".encode())
+        store.commit(tmp_path, f"http://example.com/{prefix}/{index}.png", etag=f'"{prefix}{index}"')
+    store.save()
+
+
+def test_concurrent_saves_merge_index(tmp_path):
+    root = str(tmp_path)
+    AssetStore(root)
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        list(executor.map(_store_images, [root] * 4, ["a", "b", "c", "d"], [20] * 4))
+    with open(os.path.join(root, ".assets", "index.json"), encoding="utf-8") as f:
+        index = json.load(f)
+    assert len(index) == 80
+    assert not [name for name in os.listdir(os.path.join(root, ".assets")) if name.endswith(".tmp")]
+
+
+def test_save_keeps_entries_written_by_other_store(tmp_path):
+    first, second = AssetStore(str(tmp_path)), AssetStore(str(tmp_path))
+    _commit(first, "one")
+    first.save()
+    _commit(second, "two")
+    second.save()
+    assert set(AssetStore(str(tmp_path))._index) == {"http://example.com/one.png", "http://example.com/two.png"}
+
+
+def test_stale_temp_files_removed_on_open(tmp_path):
+    store = AssetStore(str(tmp_path))
+    stale, fresh = store.new_temp_path(), store.new_temp_path()
+    for path in (stale, fresh):
+        open(path, "wb").close()
+    old = time.time() - STALE_TEMP_SECONDS - 1
+    os.utime(stale, (old, old))
+    AssetStore(str(tmp_path))
+    assert not os.path.exists(stale)
+    assert os.path.exists(fresh)
+
+
+def _commit(store, name):
+    tmp_path = store.new_temp_path()
+    with open(tmp_path, "wb") as f:
+        f.write(name.encode())
+    store.commit(tmp_path, f"http://example.com/{name}.png")
@@ -0,0 +1,26 @@
+"""批量导出清单的校验"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from batch_export import build_jobs
+
+ARGS = SimpleNamespace(token="tok", chapters=None, formats="md,tex", question_info=False)
+
+
+def test_duplicate_course_rejected_even_with_different_class():
+    rows = [{"course_id": "1", "class_id": "10"}, {"course_id": "1", "class_id": "11"}]
+    with pytest.raises(ValueError, match="重复"):
+        build_jobs(rows, ARGS)
+
+
+def test_duplicate_log_name_rejected():
+    rows = [{"course_id": "1", "class_id": "10", "name": "a b"}, {"course_id": "2", "class_id": "10", "name": "a_b"}]
+    with pytest.raises(ValueError, match="日志"):
+        build_jobs(rows, ARGS)
+
+
+def test_distinct_courses_accepted():
+    rows = [{"course_id": "1", "class_id": "10"}, {"course_id": "2", "class_id": "10"}]
+    assert [job["name"] for job in build_jobs(rows, ARGS)] == ["course_1_10", "course_2_10"]
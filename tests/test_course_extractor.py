@@ -0,0 +1,114 @@
+"""iter_course_questions 对 {"success", "data"} 响应的处理，以及中断后从检查点续传"""
+
+import os
+
+import pytest
+
+from course_extractor import CourseExtractor, create_sinks, iter_course_questions
+
+DIRECTORY = {"coursename": "测试课程", "chapters": [{"nodeid": 100, "nodetitle": "第一章"}]}
+CHAPTER = {"wholepageItemDTOList": [{"wholepageDTOList": [{
+    "contentType": 7, "id": 1000, "content": "单元一",
+    "coursepageDTOList": [{"questionDTOList": [
+        {"questionid": 1, "type": 1, "title": "<p>题目</p>", "choiceitemModels": [{"title": "<p>甲</p>"}]},
+    ]}],
+}]}]}
+
+
+class WrappedClient:
+    """按 APIAdapter / DGUT 客户端的格式返回响应"""
+
+    def __init__(self, directory=True, answer=True):
+        self.directory = directory
+        self.answer = answer
+
+    @staticmethod
+    def _wrap(ok, data):
+        return {"success": True, "data": data} if ok else {"success": False, "message": "API请求失败", "data": None}
+
+    def get_course_directory(self, course_id, class_id):
+        return self._wrap(self.directory, DIRECTORY)
+
+    def get_whole_chapter_page_content(self, node_id):
+        return self._wrap(True, CHAPTER)
+
+    def get_question_answer(self, question_id, parent_id):
+        return self._wrap(self.answer, {"correctAnswerList": ["A"]})
+
+
+def test_wrapped_success_is_unwrapped():
+    questions = list(iter_course_questions(1, 2, client=WrappedClient(), answer_workers=1, pipeline_depth=0))
+    assert [q.question_id for q in questions] == [1]
+    assert questions[0].record.answers == ["A"]
+
+
+def test_directory_failure_raises():
+    with pytest.raises(RuntimeError):
+        list(iter_course_questions(1, 2, client=WrappedClient(directory=False), answer_workers=1, pipeline_depth=0))
+
+
+def test_answer_failure_is_not_parsed_as_answer():
+    questions = list(iter_course_questions(1, 2, client=WrappedClient(answer=False), answer_workers=1,
+                                           pipeline_depth=0))
+    assert [q.question_id for q in questions] == [1]
+    assert questions[0].record.answers == []
+
+
+class CourseClient:
+    """三个专题、每个专题两个单元的课程，记录每次请求"""
+
+    def __init__(self, interrupt_at=None):
+        self.interrupt_at = interrupt_at
+        self.chapter_calls = []
+        self.answer_calls = []
+
+    def get_course_directory(self, course_id, class_id):
+        return {"coursename": "续传课程", "chapters": [{"nodeid": node_id, "nodetitle": f"专题{node_id}"}
+                                                     for node_id in (10, 20, 30)]}
+
+    def get_whole_chapter_page_content(self, node_id):
+        self.chapter_calls.append(node_id)
+        units = []
+        for unit in range(2):
+            parent_id = node_id * 10 + unit
+            questions = [{"questionid": parent_id * 10 + k, "type": 1, "title": f"<p>题目{parent_id}-{k}</p>",
+                          "choiceitemModels": [{"title": "<p>甲</p>"}, {"title": "<p>乙</p>"}]} for k in range(2)]
+            units.append({"contentType": 7, "id": parent_id, "content": f"单元{parent_id}",
+                          "coursepageDTOList": [{"questionDTOList": questions}]})
+        return {"wholepageItemDTOList": [{"wholepageDTOList": units}]}
+
+    def get_question_answer(self, question_id, parent_id):
+        if question_id == self.interrupt_at:
+            raise KeyboardInterrupt
+        self.answer_calls.append(question_id)
+        return {"correctAnswerList": ["A"]}
+
+
+def _export(client, output_dir, resume=False):
+    extractor = CourseExtractor(client.get_course_directory, client.get_whole_chapter_page_content,
+                                client.get_question_answer, base_output_dir=str(output_dir), answer_workers=1,
+                                pipeline_depth=0, resume=resume, verbose=False)
+    course = extractor.open_course(1, 2)
+    extractor.run(course["chapters"], create_sinks(["md", "json"]))
+    return course["output_dir"]
+
+
+def _exported_files(course_dir):
+    return {name: open(os.path.join(course_dir, name), encoding="utf-8").read()
+            for name in sorted(os.listdir(course_dir)) if name.endswith((".md", ".json"))}
+
+
+def test_resume_rebuilds_interrupted_export(tmp_path):
+    expected = _exported_files(_export(CourseClient(), tmp_path / "full"))
+
+    # 中断在第二个专题的第二个单元（单元 201）获取答案时
+    with pytest.raises(KeyboardInterrupt):
+        _export(CourseClient(interrupt_at=2010), tmp_path / "resumed")
+    client = CourseClient()
+    course_dir = _export(client, tmp_path / "resumed", resume=True)
+
+    assert _exported_files(course_dir) == expected
+    assert sorted(expected) == ["续传课程_questions_complete.json", "续传课程_课件题目.md"]
+    # 已完成的专题 10 不再请求；专题 20 中已完成的单元 200 不再获取答案
+    assert client.chapter_calls == [20, 30]
+    assert client.answer_calls == [2010, 2011, 3000, 3001, 3010, 3011]
@@ -0,0 +1,59 @@
+"""auto 模式下端点版本探测的缓存"""
+
+import json
+
+import pytest
+import requests
+
+from adaptive_timeout import LatencyTracker
+from dgut_ulearning_api import DGUTUlearningAPI
+from endpoint_cache import EndpointVersionCache
+
+BASE_URL = "http://dgut.test"
+
+
+def _response(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    return response
+
+
+@pytest.fixture
+def make_api(tmp_path):
+    def make(options):
+        cache = EndpointVersionCache(path=str(tmp_path / "endpoints.json"))
+        api = DGUTUlearningAPI(base_url=BASE_URL, authorization_token="tok", version_cache=cache,
+                               latency_tracker=LatencyTracker(path=None))
+        api.session.options = lambda url, timeout=None: options()
+        return api, cache
+
+    return make
+
+
+def _raise_timeout():
+    raise requests.exceptions.ConnectTimeout("probe timed out")
+
+
+@pytest.mark.parametrize("options", [_raise_timeout, lambda: _response(503)])
+def test_failed_probe_falls_back_without_caching(make_api, options):
+    api, cache = make_api(options)
+    assert api._get_endpoint("course_directory") == f"{BASE_URL}/learnCourse/courseDirectory"
+    assert cache.get(BASE_URL, "course_directory") is None
+
+
+@pytest.mark.parametrize("status_code, version", [(204, "v2"), (404, "v1")])
+def test_definitive_probe_is_cached(make_api, status_code, version):
+    api, cache = make_api(lambda: _response(status_code))
+    api._get_endpoint("course_directory")
+    assert cache.get(BASE_URL, "course_directory") == version
+
+
+def test_reconfirming_version_persists_resolved_at(tmp_path, monkeypatch):
+    path = tmp_path / "endpoints.json"
+    cache = EndpointVersionCache(path=str(path))
+    monkeypatch.setattr("endpoint_cache.time.time", lambda: 100.0)
+    cache.set(BASE_URL, "course_directory", "v2")
+    monkeypatch.setattr("endpoint_cache.time.time", lambda: 200.0)
+    cache.set(BASE_URL, "course_directory", "v2")
+    entries = json.loads(path.read_text(encoding="utf-8"))
+    assert entries[f"{BASE_URL}|course_directory"]["resolved_at"] == 200.0
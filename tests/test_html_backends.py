@@ -0,0 +1,22 @@
+"""流式后端与 BeautifulSoup 后端的逐字节一致性"""
+
+import pytest
+
+from html_backends import GOLDEN_CORPUS, _dereference_charref, _verify_html
+
+CHARREF_CASES = [
+    "&#150;&#128;&#129;&#x9F;", "&#x41;&#X42;&#67;", "&#0;&#xD800;&#1114112;&#xFDD0;&#xFFFF;",
+    "&#65abc &#x41zz &#xZZ; &#; &#x;", "<p title='&#150;'>&#x1F600;</p>",
+]
+
+
+@pytest.mark.parametrize("html", GOLDEN_CORPUS + CHARREF_CASES)
+def test_stream_backend_matches_bs4(html):
+    assert _verify_html(html) is None
+
+
+def test_dereference_charref_splits_trailing_text():
+    assert _dereference_charref("65abc") == ("A", False, "abc")
+    assert _dereference_charref("x41zz") == ("A", False, "zz")
+    assert _dereference_charref("150") == ("–", False, "")
+    assert _dereference_charref("xZZ") == ("", False, "ZZ")
@@ -0,0 +1,36 @@
+"""填空渲染与逐题替换答案后重新提取文本的结果逐字节一致"""
+
+import pytest
+from bs4 import BeautifulSoup
+
+from html_backends import GOLDEN_CORPUS, clean_soup_text
+from question_ir import HtmlFragment
+
+BLANK_CASES = [
+    "<p>Fill <span class='input-wrapper'></span> and <input/> end</p>",
+    "<p>a<input>b</p><p><input></p>", "<span class='input-wrapper'>旧答案</span>", "<INPUT>大写",
+]
+ANSWER_SETS = [[], ["a"], ["a", "", "b<c", "d & e", "f", "g"]]
+
+
+def _reference_render(title_html, answers, separator):
+    """原实现：在文档树中替换答案，序列化后重新解析再提取文本"""
+    if not title_html:
+        return separator.join([f"{{{ans}}}" if ans else "{___}" for ans in answers])
+    soup = BeautifulSoup(title_html, 'html.parser')
+    blank_nodes = soup.select('span.input-wrapper, input')
+    for idx, node in enumerate(blank_nodes):
+        answer_text = answers[idx] if idx < len(answers) else ''
+        node.replace_with(f"{{{answer_text}}}" if answer_text else "{___}")
+    rendered = clean_soup_text(BeautifulSoup(str(soup), 'html.parser'))
+    if len(blank_nodes) < len(answers):
+        extra = separator.join([f"{{{ans}}}" for ans in answers[len(blank_nodes):]])
+        rendered = f"{rendered} {extra}".strip()
+    return rendered
+
+
+@pytest.mark.parametrize("html", GOLDEN_CORPUS + BLANK_CASES + [""])
+@pytest.mark.parametrize("separator", [" ", ""])
+def test_render_blanks_matches_reference(html, separator):
+    for answers in ANSWER_SETS:
+        assert HtmlFragment(html).render_blanks(answers, separator) == _reference_render(html, answers, separator)
@@ -0,0 +1,45 @@
+"""限流器的并发窗口和线程池默认大小"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import rate_limiter
+from rate_limiter import AdaptiveRateLimiter, default_worker_count
+
+
+def test_default_worker_count_follows_window_maximum(monkeypatch):
+    monkeypatch.delenv("ANSWER_WORKERS", raising=False)
+    monkeypatch.setattr(rate_limiter, "DEFAULT_MAX_CONCURRENCY", 32)
+    assert default_worker_count("ANSWER_WORKERS") == 32
+    monkeypatch.setenv("ANSWER_WORKERS", "4")
+    assert default_worker_count("ANSWER_WORKERS") == 4
+
+
+def test_default_rate_is_unlimited():
+    assert AdaptiveRateLimiter().state()["rate"] is None
+
+
+def test_window_grows_past_initial_concurrency_with_large_pool():
+    limiter = AdaptiveRateLimiter(rate=0, initial_concurrency=2, max_concurrency=8)
+    lock = threading.Lock()
+    in_flight = peak = 0
+
+    def request():
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.005)
+        with lock:
+            in_flight -= 1
+        response = requests.Response()
+        response.status_code = 200
+        return response
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: limiter.send(request), range(200)))
+    assert limiter.state()["window"] == 8
+    assert 2 < peak <= 8
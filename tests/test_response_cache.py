@@ -0,0 +1,50 @@
+"""响应缓存的过期、最近最少使用淘汰和容量上限"""
+
+import pytest
+
+from response_cache import ResponseCache
+
+# json.dumps 后每条 30 字节
+VALUE = "x" * 28
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("response_cache.time.time", lambda: now[0])
+    return now
+
+
+def test_entries_expire_after_endpoint_ttl(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.db"), ttls={"chapter_content": 60})
+    cache.set("chapter_content", "k", {"a": 1})
+    clock[0] += 60
+    assert cache.get("chapter_content", "k") == {"a": 1}
+    clock[0] += 1
+    assert cache.get("chapter_content", "k") is None
+    assert not cache.is_cacheable("study_heartbeat")
+
+
+def test_eviction_drops_least_recently_used_first(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.db"), max_bytes=100, ttls={"question_answer": 3600})
+    for key in ("a", "b", "c"):
+        clock[0] += 1
+        cache.set("question_answer", key, VALUE)
+    clock[0] += 1
+    assert cache.get("question_answer", "a") == VALUE
+    clock[0] += 1
+    cache.set("question_answer", "d", VALUE)
+
+    assert cache.get("question_answer", "b") is None
+    assert [cache.get("question_answer", key) for key in ("a", "c", "d")] == [VALUE] * 3
+    assert cache.stats()["bytes"] == 90
+
+
+def test_size_cap_holds_across_instances_sharing_a_file(tmp_path, clock):
+    path = str(tmp_path / "cache.db")
+    first = ResponseCache(path, max_bytes=100, ttls={"question_answer": 3600})
+    second = ResponseCache(path, max_bytes=100, ttls={"question_answer": 3600})
+    for index in range(10):
+        clock[0] += 1
+        (first if index % 2 else second).set("question_answer", str(index), VALUE)
+    assert ResponseCache(path).stats()["bytes"] <= 100
@@ -0,0 +1,32 @@
+"""重试策略的计数和输出"""
+
+import requests
+
+from retry_policy import RetryPolicy
+
+
+def _flaky(failures):
+    calls = []
+
+    def send():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise requests.exceptions.ConnectionError("reset")
+        response = requests.Response()
+        response.status_code = 200
+        return response
+
+    return send
+
+
+def test_retries_are_counted_without_printing(capsys):
+    policy = RetryPolicy(base_delay=0, sleep=lambda _: None)
+    assert policy.send("course_directory", _flaky(1)).status_code == 200
+    assert policy.stats()["endpoints"]["course_directory"]["retries"] == 1
+    assert capsys.readouterr().out == ""
+
+
+def test_verbose_policy_prints_each_retry(capsys):
+    policy = RetryPolicy(base_delay=0, sleep=lambda _: None, verbose=True)
+    policy.send("course_directory", _flaky(1))
+    assert "course_directory 请求失败" in capsys.readouterr().out
@@ -0,0 +1,16 @@
+"""运行结束时的统计汇总"""
+
+import json
+
+from run_metrics import report_run_stats
+
+
+def test_report_run_stats_prints_every_source_and_writes_report(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    written = report_run_stats({"script": "test", "course_id": "1"}, str(tmp_path / "metrics.json"), None)
+
+    assert written == [str(tmp_path / "metrics.json")]
+    assert json.loads((tmp_path / "metrics.json").read_text(encoding="utf-8"))["labels"]["script"] == "test"
+    out = capsys.readouterr().out
+    for marker in ("请求重试", "请求指标", "运行指标已保存到"):
+        assert marker in out
@@ -0,0 +1,41 @@
+"""导入各模块时不发送网络请求（BASE_API_URL 指向不可达地址时导入也应立即完成）"""
+
+import json
+import os
+import subprocess
+import sys
+
+# 导入全部模块的时间上限（秒），远小于连接不可达地址的超时
+IMPORT_TIME_LIMIT = 5.0
+
+_CHILD = r"""
+import importlib, importlib.util, json, socket, sys, time
+
+attempts = []
+
+def _blocked(address, *args, **kwargs):
+    attempts.append(repr(address))
+    raise OSError("network disabled during import")
+
+socket.create_connection = _blocked
+socket.socket.connect = lambda self, address: _blocked(address)
+socket.socket.connect_ex = lambda self, address: _blocked(address)
+
+started = time.perf_counter()
+for name in ("ulearning_api", "api_adapter", "ulearning_course_export"):
+    importlib.import_module(name)
+spec = importlib.util.spec_from_file_location("export_to_json", "export-to-json.py")
+spec.loader.exec_module(importlib.util.module_from_spec(spec))
+print(json.dumps({"attempts": attempts, "seconds": time.perf_counter() - started}))
+"""
+
+
+def test_import_opens_no_sockets():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, BASE_API_URL="http://10.255.255.1:81", PYTHONPATH=root)
+    completed = subprocess.run([sys.executable, "-c", _CHILD], cwd=root, env=env, capture_output=True,
+                               text=True, timeout=60)
+    assert completed.returncode == 0, completed.stderr
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    assert result["attempts"] == []
+    assert result["seconds"] < IMPORT_TIME_LIMIT
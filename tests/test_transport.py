@@ -0,0 +1,66 @@
+"""共享连接池的按主机容量和连接复用"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from transport import SharedTransport
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+
+def _host_stats(transport):
+    (stats,) = transport.stats()["hosts"].values()
+    return stats
+
+
+def test_pool_created_with_host_size(server_url):
+    transport = SharedTransport(pool_maxsize=16, host_pool_sizes={"127.0.0.1": 3})
+    session = transport.session()
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        list(executor.map(lambda _: session.get(server_url).close(), range(30)))
+    stats = _host_stats(transport)
+    assert stats["maxsize"] == 3
+    assert stats["idle"] <= 3
+
+
+def test_sessions_share_connections(server_url):
+    transport = SharedTransport(pool_maxsize=4)
+    for _ in range(5):
+        transport.session().get(server_url).close()
+    stats = _host_stats(transport)
+    assert stats["requests"] == 5
+    assert stats["new_connections"] == 1
+    assert stats["maxsize"] == 4
+
+
+def test_session_close_keeps_shared_pool(server_url):
+    transport = SharedTransport()
+    session = transport.session()
+    session.get(server_url).close()
+    session.close()
+    transport.session().get(server_url).close()
+    assert _host_stats(transport)["new_connections"] == 1
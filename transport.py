@@ -0,0 +1,272 @@
+"""
+共享 HTTP 传输层
+新旧 API 会话和图片下载会话挂载同一个 HTTPAdapter：每个主机一个长连接池，连接（及其 TLS 会话）在所有会话之间复用，
+握手只发生在新建连接时；连接池大小按主机可调，启动时可预先建立到 BASE_API_URL 的连接，并统计连接池使用情况。
+各会话仍保留各自的请求头（授权信息等），只共享连接
+"""
+
+import os
+import threading
+from typing import Any, Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 缓存连接池的主机数
+DEFAULT_POOL_CONNECTIONS = int(os.getenv("POOL_CONNECTIONS", "10"))
+# 每个主机保留的最大连接数；并发请求数超过该值时多出的连接用完即被丢弃
+DEFAULT_POOL_MAXSIZE = int(os.getenv("POOL_MAXSIZE", "32"))
+# 单独指定部分主机的连接数，格式 "host1=64,host2=16"
+DEFAULT_POOL_MAXSIZE_PER_HOST = os.getenv("POOL_MAXSIZE_PER_HOST", "")
+# 启动时预先建立的连接数，0 表示不预热
+DEFAULT_PREWARM_CONNECTIONS = int(os.getenv("PREWARM_CONNECTIONS", "4"))
+# 预热请求的超时（秒）
+PREWARM_TIMEOUT = 5
+
+
+def _host_key(url: str) -> str:
+    """连接池的主机键 host:port（缺省端口按协议补全）"""
+    parsed = urlparse(url)
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    return f"{parsed.hostname}:{port}"
+
+
+def _parse_host_sizes(value: str) -> Dict[str, int]:
+    sizes = {}
+    for part in (value or "").split(","):
+        host, sep, size = part.strip().partition("=")
+        if sep and host.strip() and size.strip().isdigit():
+            sizes[host.strip().lower()] = int(size)
+    return sizes
+
+
+class _SharedAdapter(HTTPAdapter):
+    """
+    记录每个主机在途请求数的 HTTPAdapter，并支持按主机设置连接池大小
+
+    连接池大小通过 requests（>=2.32.2）的 build_connection_pool_key_attributes 以 maxsize 参数传给 urllib3，
+    连接池创建时即为该主机的容量
+    """
+
+    def __init__(self, transport: "SharedTransport", **kwargs):
+        self._transport = transport
+        super().__init__(**kwargs)
+
+    def build_connection_pool_key_attributes(self, request, verify, cert=None):
+        host_params, pool_kwargs = super().build_connection_pool_key_attributes(request, verify, cert)
+        pool_kwargs["maxsize"] = self._transport.pool_size(host_params.get("host"))
+        return host_params, pool_kwargs
+
+    def send(self, request, **kwargs):
+        host = _host_key(request.url)
+        self._transport._begin(host)
+        try:
+            return super().send(request, **kwargs)
+        finally:
+            self._transport._end(host)
+
+    def close(self):
+        # 各会话关闭时不释放共享连接，由 SharedTransport.close() 统一关闭
+        pass
+
+
+class SharedTransport:
+    """所有 requests 会话共用的连接池，线程安全"""
+
+    def __init__(self, pool_connections: int = DEFAULT_POOL_CONNECTIONS, pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+                 host_pool_sizes: Optional[Dict[str, int]] = None):
+        """
+        Args:
+            pool_connections: 缓存连接池的主机数
+            pool_maxsize: 每个主机的默认最大连接数
+            host_pool_sizes: 主机名 -> 最大连接数，覆盖默认值
+        """
+        self.pool_maxsize = max(1, pool_maxsize)
+        self.host_pool_sizes = {host.lower(): max(1, size) for host, size in
+                                (host_pool_sizes if host_pool_sizes is not None
+                                 else _parse_host_sizes(DEFAULT_POOL_MAXSIZE_PER_HOST)).items()}
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, int] = {}
+        self._peak: Dict[str, int] = {}
+        self._requests: Dict[str, int] = {}
+        self._overflow: Dict[str, int] = {}
+        self._prewarmed: Dict[str, int] = {}
+        self._prewarm_started = set()
+        self.adapter = _SharedAdapter(self, pool_connections=max(1, pool_connections), pool_maxsize=self.pool_maxsize)
+
+    # --- 会话 ---
+
+    def mount(self, session: requests.Session) -> requests.Session:
+        """让会话使用共享连接池（http 和 https）"""
+        session.mount("https://", self.adapter)
+        session.mount("http://", self.adapter)
+        return session
+
+    def session(self, headers: Optional[Dict[str, str]] = None) -> requests.Session:
+        """新建使用共享连接池的会话"""
+        session = self.mount(requests.Session())
+        if headers:
+            session.headers.update({k: v for k, v in headers.items() if v is not None})
+        return session
+
+    def pool_size(self, host: Optional[str]) -> int:
+        """主机的最大连接数"""
+        return self.host_pool_sizes.get((host or "").lower(), self.pool_maxsize)
+
+    def ensure_pool_size(self, maxsize: int):
+        """
+        把默认的每主机连接数至少调到 maxsize；maxsize 是 urllib3 连接池键的一部分，
+        调大后的请求使用按新容量创建的连接池，应在开始请求前调用
+        """
+        with self._lock:
+            self.pool_maxsize = max(self.pool_maxsize, maxsize)
+
+    # --- 计数 ---
+
+    def _begin(self, host: str):
+        with self._lock:
+            in_flight = self._in_flight.get(host, 0) + 1
+            self._in_flight[host] = in_flight
+            self._requests[host] = self._requests.get(host, 0) + 1
+            if in_flight > self._peak.get(host, 0):
+                self._peak[host] = in_flight
+            if in_flight > self.pool_size(host.rsplit(":", 1)[0]):
+                self._overflow[host] = self._overflow.get(host, 0) + 1
+
+    def _end(self, host: str):
+        with self._lock:
+            self._in_flight[host] = self._in_flight.get(host, 1) - 1
+
+    # --- 预热 ---
+
+    def prewarm(self, urls: Iterable[str], connections: int = DEFAULT_PREWARM_CONNECTIONS, wait: bool = False):
+        """
+        在后台并发向每个地址发送 HEAD 请求，预先建立 connections 个长连接（含 TLS 握手），
+        随后的 API 请求直接复用；每个主机只预热一次，失败时忽略
+
+        Args:
+            urls: 要预热的地址（如 BASE_API_URL）
+            connections: 每个主机预先建立的连接数
+            wait: 是否等待预热完成
+        """
+        targets = []
+        with self._lock:
+            for url in urls:
+                host = _host_key(url) if url and urlparse(url).hostname else ""
+                if not host or host in self._prewarm_started:
+                    continue
+                self._prewarm_started.add(host)
+                targets.append((host, url))
+        if connections <= 0 or not targets:
+            return
+        session = self.session()
+        threads = []
+        for host, url in targets:
+            for _ in range(min(connections, self.pool_size(urlparse(url).hostname))):
+                thread = threading.Thread(target=self._prewarm_one, args=(session, host, url),
+                                          name="prewarm", daemon=True)
+                thread.start()
+                threads.append(thread)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def _prewarm_one(self, session: requests.Session, host: str, url: str):
+        try:
+            session.head(url, timeout=PREWARM_TIMEOUT, allow_redirects=False)
+        except requests.exceptions.RequestException:
+            return
+        with self._lock:
+            self._prewarmed[host] = self._prewarmed.get(host, 0) + 1
+
+    def close(self):
+        """关闭所有共享连接（之后的请求会重新建立连接）"""
+        HTTPAdapter.close(self.adapter)
+
+    # --- 状态 ---
+
+    def stats(self) -> Dict[str, Any]:
+        """每个主机的请求数、新建连接数、复用率、峰值并发、空闲连接数和连接池容量"""
+        # 同一主机可能有多个连接池（如 ensure_pool_size 之后），按 host:port 汇总
+        pools: Dict[str, Dict[str, int]] = {}
+        poolmanager = self.adapter.poolmanager
+        for key in list(poolmanager.pools.keys()):
+            try:
+                pool = poolmanager.pools[key]
+            except KeyError:
+                continue
+            totals = pools.setdefault(f"{pool.host}:{pool.port}", {"new_connections": 0, "idle": 0, "maxsize": 0})
+            totals["new_connections"] += pool.num_connections
+            if pool.pool is not None:
+                # 队列中的 None 是尚未建立连接的空位（只读取，不修改连接池）
+                totals["idle"] += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+                totals["maxsize"] = max(totals["maxsize"], pool.pool.maxsize)
+        with self._lock:
+            hosts = {}
+            for host, requests_count in self._requests.items():
+                totals = pools.get(host, {})
+                new_connections = totals.get("new_connections", 0)
+                hosts[host] = {
+                    "requests": requests_count,
+                    "new_connections": new_connections,
+                    "reuse_ratio": round(max(0.0, 1 - new_connections / requests_count), 3) if requests_count else None,
+                    "peak_in_flight": self._peak.get(host, 0),
+                    "overflow": self._overflow.get(host, 0),
+                    "idle": totals.get("idle", 0),
+                    "maxsize": totals.get("maxsize") or self.pool_size(host.rsplit(":", 1)[0]),
+                    "prewarmed": self._prewarmed.get(host, 0),
+                }
+        return {"hosts": hosts}
+
+    def format_stats(self) -> str:
+        """生成可打印的统计信息，每个主机一行"""
+        lines = []
+        for host, values in sorted(self.stats()["hosts"].items()):
+            reuse = f"{values['reuse_ratio']:.0%}" if values["reuse_ratio"] is not None else "-"
+            line = (f"连接池 {host}: {values['requests']} 个请求, 新建连接 {values['new_connections']} 个 (复用率 {reuse}), "
+                    f"峰值并发 {values['peak_in_flight']}/{values['maxsize']}, 空闲 {values['idle']}")
+            if values["overflow"]:
+                line += f", 超出容量 {values['overflow']} 次"
+            if values["prewarmed"]:
+                line += f", 预热 {values['prewarmed']} 个"
+            lines.append(line)
+        return "\n".join(lines) if lines else "连接池: 无请求"
+
+
+_default_transport: Optional[SharedTransport] = None
+_default_transport_lock = threading.Lock()
+
+
+def get_default_transport() -> SharedTransport:
+    """
+    获取全局共享传输层，首次调用时按环境变量配置创建（不发送任何请求）
+
+    Returns:
+        SharedTransport 实例
+    """
+    global _default_transport
+    if _default_transport is None:
+        with _default_transport_lock:
+            if _default_transport is None:
+                _default_transport = SharedTransport()
+    return _default_transport
+
+
+def set_default_transport(transport: Optional[SharedTransport]):
+    """设置全局共享传输层，传入 None 时恢复按默认配置创建（只影响之后创建的会话）"""
+    global _default_transport
+    _default_transport = transport
+
+
+def mount_pooled_adapter(session: requests.Session, pool_maxsize: int):
+    """
+    为会话挂载共享连接池并确保容量足够，避免并发时连接被丢弃后重新握手
+
+    Args:
+        session: 需要调整的 requests 会话
+        pool_maxsize: 每个主机的最大连接数
+    """
+    transport = get_default_transport()
+    transport.ensure_pool_size(max(10, pool_maxsize))
+    transport.mount(session)
@@ -4,10 +4,17 @@
 """
 
 import requests
-import json
 import os
+import threading
+from typing import Optional
 from dotenv import load_dotenv
 from urllib.parse import urljoin
+from adaptive_timeout import LatencyTracker, get_default_latency_tracker
+from response_cache import get_default_response_cache
+from rate_limiter import get_rate_limiter
+from retry_policy import TRANSIENT, VERBOSE_REQUESTS, RetryPolicy, classify_error, get_default_retry_policy
+from run_metrics import get_default_run_metrics
+from transport import get_default_transport
 
 # 加载环境变量
 load_dotenv()
@@ -50,137 +57,217 @@ IMAGE_DOWNLOAD_HEADERS = {
 class UlearningAPI:
     """优学院API交互类"""
     
-    def __init__(self, base_url=None, headers=None):
+    def __init__(self, base_url=None, headers=None, response_cache=None, retry_policy=None, latency_tracker=None):
         self.base_url = base_url or BASE_API_URL
         self.headers = headers or API_HEADERS
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
+        # 与其他会话共享连接池（长连接和 TLS 连接复用）
+        self.session = get_default_transport().session(self.headers)
+        # 为 None 时使用全局响应缓存（通过 RESPONSE_CACHE_DB 或 --cache-db 启用）
+        self.response_cache = response_cache
+        # 为 None 时使用全局重试策略
+        self.retry_policy = retry_policy
+        # 为 None 时使用全局延迟统计（按端点自适应超时）
+        self.latency_tracker = latency_tracker
     
-    def _make_request(self, method, endpoint, params=None, data=None, timeout=15):
+    def _get_response_cache(self):
+        """获取当前生效的响应缓存"""
+        return self.response_cache if self.response_cache is not None else get_default_response_cache()
+    
+    def _get_retry_policy(self) -> RetryPolicy:
+        """获取当前生效的重试策略"""
+        return self.retry_policy if self.retry_policy is not None else get_default_retry_policy()
+    
+    def _get_latency_tracker(self) -> LatencyTracker:
+        """获取当前生效的延迟统计"""
+        return self.latency_tracker if self.latency_tracker is not None else get_default_latency_tracker()
+    
+    def _make_request(self, method, endpoint, params=None, data=None, timeout=15, endpoint_name=None):
         """通用请求方法"""
+        return self._request(method, endpoint, params=params, data=data, timeout=timeout,
+                             endpoint_name=endpoint_name)[0]
+    
+    def _request(self, method, endpoint, params=None, data=None, timeout=15, endpoint_name=None):
+        """
+        发送请求，暂时性失败（超时、连接重置、5xx、429）按重试策略重试
+        
+        timeout 为样本不足时的默认超时，之后按该端点的延迟统计自适应
+        
+        Returns:
+            (响应JSON, 失败类型)：成功时失败类型为 None，失败时为 TRANSIENT 或 DEFINITIVE
+        """
         url = urljoin(self.base_url, endpoint)
-        print(f"Making {method} request to: {url}")
+        if VERBOSE_REQUESTS:
+            print(f"Making {method} request to: {url}")
+        # 同一主机的请求共享限流器（与DGUT客户端、图片下载器共用）
+        limiter = get_rate_limiter(url)
+        tracker = self._get_latency_tracker()
         
-        try:
+        def _send():
             if method.upper() == 'GET':
-                response = self.session.get(url, params=params, timeout=timeout)
+                request = lambda t: self.session.get(url, params=params, timeout=t)
             elif method.upper() == 'POST':
-                response = self.session.post(url, json=data, timeout=timeout)
+                request = lambda t: self.session.post(url, json=data, timeout=t)
             else:
                 raise ValueError(f"Unsupported HTTP method: {method}")
-            
-            response.raise_for_status()
-            return response.json()
+            return limiter.send(lambda: tracker.send(url, endpoint_name, request, default=timeout))
+        
+        try:
+            # 按端点记录耗时、状态码、字节数和重试次数
+            with get_default_run_metrics().measure(endpoint_name) as measurement:
+                response = measurement.response = self._get_retry_policy().send(endpoint_name,
+                                                                                measurement.wrap(_send))
+                response.raise_for_status()
+                return response.json(), None
         except requests.exceptions.HTTPError as e:
             print(f"HTTP Error: {e}")
             if hasattr(e, 'response') and e.response is not None:
                 print(f"Response status: {e.response.status_code}")
                 print(f"Response text: {e.response.text[:500]}")
-            return None
+            return None, classify_error(e)
         except Exception as e:
             print(f"Request failed: {e}")
-            return None
+            return None, classify_error(e)
     
-    def get_course_directory(self, course_id, class_id):
-        """获取课程目录 - 更新API路径"""
+    def _get_with_fallback(self, endpoint_name, new_endpoint, old_endpoint, cache_params, timeout=15):
+        """先请求新API路径，失败后尝试旧API路径；成功的响应写入响应缓存"""
+        cache = self._get_response_cache()
+        cache_key = None
+        if cache is not None and cache.is_cacheable(endpoint_name):
+            cache_key = cache.make_key(endpoint_name, self.base_url, cache_params, namespace="ulearning")
+            cached = cache.get(endpoint_name, cache_key)
+            if cached is not None:
+                get_default_run_metrics().record_cache_hit(endpoint_name)
+                return cached
+        
         # 尝试新API路径
-        endpoint = f"{API_PREFIX}/course/{course_id}/directory?classId={class_id}"
-        result = self._make_request('GET', endpoint)
+        result, failure = self._request('GET', new_endpoint, timeout=timeout, endpoint_name=endpoint_name)
         
-        # 如果新API失败，尝试旧API路径
-        if not result:
+        # 新API路径确定不可用时（404、响应不是JSON等）尝试旧API路径；暂时性失败已经重试过，换路径只会多一次请求
+        if not result and failure != TRANSIENT:
             print("New API failed, trying old API path...")
-            endpoint = f"/course/stu/{course_id}/directory?classId={class_id}"
-            result = self._make_request('GET', endpoint)
+            result = self._make_request('GET', old_endpoint, timeout=timeout, endpoint_name=endpoint_name)
         
+        if result and cache_key:
+            cache.set(endpoint_name, cache_key, result)
         return result
     
+    def get_course_directory(self, course_id, class_id):
+        """获取课程目录 - 更新API路径"""
+        return self._get_with_fallback(
+            "course_directory",
+            f"{API_PREFIX}/course/{course_id}/directory?classId={class_id}",
+            f"/course/stu/{course_id}/directory?classId={class_id}",
+            {"courseId": course_id, "classId": class_id}
+        )
+    
     def get_course_remaining(self, course_id):
         """获取课程剩余内容 - 新API"""
         endpoint = f"{API_PREFIX}/course/{course_id}/remaining"
-        return self._make_request('GET', endpoint)
+        return self._make_request('GET', endpoint, endpoint_name="course_remaining")
     
     def get_user_info(self):
         """获取用户信息 - 新API"""
         endpoint = f"{API_PREFIX}/user"
-        return self._make_request('GET', endpoint)
+        return self._make_request('GET', endpoint, endpoint_name="user_info")
     
     def get_whole_chapter_page_content(self, node_id):
         """获取章节内容 - 更新API路径"""
-        # 尝试新API路径
-        endpoint = f"{API_PREFIX}/wholepage/chapter/stu/{node_id}"
-        result = self._make_request('GET', endpoint, timeout=20)
-        
-        # 如果新API失败，尝试旧API路径
-        if not result:
-            print("New API failed, trying old API path...")
-            endpoint = f"/wholepage/chapter/stu/{node_id}"
-            result = self._make_request('GET', endpoint, timeout=20)
-        
-        return result
+        return self._get_with_fallback(
+            "chapter_content",
+            f"{API_PREFIX}/wholepage/chapter/stu/{node_id}",
+            f"/wholepage/chapter/stu/{node_id}",
+            {"nodeId": node_id},
+            timeout=20
+        )
     
     def get_question_answer(self, question_id, parent_id):
         """获取题目答案 - 更新API路径"""
-        # 尝试新API路径
-        endpoint = f"{API_PREFIX}/questionAnswer/{question_id}?parentId={parent_id}"
-        result = self._make_request('GET', endpoint, timeout=10)
-        
-        # 如果新API失败，尝试旧API路径
-        if not result:
-            print("New API failed, trying old API path...")
-            endpoint = f"/questionAnswer/{question_id}?parentId={parent_id}"
-            result = self._make_request('GET', endpoint, timeout=10)
-        
-        return result
+        return self._get_with_fallback(
+            "question_answer",
+            f"{API_PREFIX}/questionAnswer/{question_id}?parentId={parent_id}",
+            f"/questionAnswer/{question_id}?parentId={parent_id}",
+            {"questionId": question_id, "parentId": parent_id},
+            timeout=10
+        )
     
     def get_study_record(self, record_id):
         """获取学习记录 - 新API"""
         endpoint = f"{API_PREFIX}/studyrecord/item/{record_id}"
-        return self._make_request('GET', endpoint)
+        return self._make_request('GET', endpoint, endpoint_name="study_record")
     
     def send_study_heartbeat(self, record_id, timestamp):
         """发送学习心跳 - 新API"""
         endpoint = f"{API_PREFIX}/studyrecord/heartbeat/{record_id}/{timestamp}"
-        return self._make_request('GET', endpoint)
+        return self._make_request('GET', endpoint, endpoint_name="study_heartbeat")
     
     def sync_personal_data(self, encrypted_data):
         """同步个人数据 - 新API"""
         endpoint = f"{API_PREFIX}/yws/api/personal/sync"
-        return self._make_request('POST', endpoint, data=encrypted_data)
+        return self._make_request('POST', endpoint, data=encrypted_data, endpoint_name="sync_personal_data")
+
+
+_default_api: Optional[UlearningAPI] = None
+_default_api_lock = threading.Lock()
+
+
+def get_default_api() -> UlearningAPI:
+    """
+    获取全局API客户端，首次调用时创建（导入模块时不创建、不发送请求）
+
+    Returns:
+        UlearningAPI 实例
+    """
+    global _default_api
+    if _default_api is None:
+        with _default_api_lock:
+            if _default_api is None:
+                _default_api = UlearningAPI()
+    return _default_api
+
+
+def set_default_api(api: Optional[UlearningAPI]):
+    """设置全局API客户端，传入 None 时恢复为首次使用时按默认配置创建"""
+    global _default_api
+    _default_api = api
+
+
+def __getattr__(name: str):
+    # 兼容 `from ulearning_api import api`：模块属性改为首次访问时创建
+    if name == "api":
+        return get_default_api()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# 创建全局API实例
-api = UlearningAPI()
 
 # 向后兼容的函数，保持与原代码的接口一致
 def get_course_directory(course_id, class_id):
     """向后兼容的课程目录获取函数"""
-    return api.get_course_directory(course_id, class_id)
+    return get_default_api().get_course_directory(course_id, class_id)
 
 def get_whole_chapter_page_content(node_id):
     """向后兼容的章节内容获取函数"""
-    return api.get_whole_chapter_page_content(node_id)
+    return get_default_api().get_whole_chapter_page_content(node_id)
 
 def get_question_answer(question_id, parent_id):
     """向后兼容的题目答案获取函数"""
-    return api.get_question_answer(question_id, parent_id)
+    return get_default_api().get_question_answer(question_id, parent_id)
 
 # 新增的API函数
 def get_user_info():
     """获取用户信息"""
-    return api.get_user_info()
+    return get_default_api().get_user_info()
 
 def get_course_remaining(course_id):
     """获取课程剩余内容"""
-    return api.get_course_remaining(course_id)
+    return get_default_api().get_course_remaining(course_id)
 
 def get_study_record(record_id):
     """获取学习记录"""
-    return api.get_study_record(record_id)
+    return get_default_api().get_study_record(record_id)
 
 def send_study_heartbeat(record_id, timestamp):
     """发送学习心跳"""
-    return api.send_study_heartbeat(record_id, timestamp)
+    return get_default_api().send_study_heartbeat(record_id, timestamp)
 
 def sync_personal_data(encrypted_data):
     """同步个人数据"""
-    return api.sync_personal_data(encrypted_data)
\ No newline at end of file
+    return get_default_api().sync_personal_data(encrypted_data)
\ No newline at end of file